@@ -0,0 +1,113 @@
+"""Agrégats des ventes tenus à jour à chaque facture enregistrée.
+
+Le stockage met à jour le nombre de factures, le chiffre d'affaires, la
+facture la plus élevée et les totaux par client et par jour dans la même
+écriture que les factures : les statistiques se lisent alors sans
+parcourir l'historique.
+
+Usage : python agregats_ventes.py --verifier | --reconstruire
+"""
+import math
+import sys
+
+# Totaux lus sans les détails par client et par jour
+CLES_RESUME = ('nombre_factures', 'chiffre_affaires_total', 'facture_plus_elevee')
+
+
+def agregats_vides():
+    """Agrégats d'un historique sans facture"""
+    return {
+        'nombre_factures': 0,
+        'chiffre_affaires_total': 0.0,
+        'facture_plus_elevee': 0.0,
+        'par_client': {},
+        'par_jour': {}
+    }
+
+
+def appliquer(agregats, factures):
+    """Ajouter des factures (dict) aux agrégats, sur place"""
+    for facture in factures:
+        total = float(facture['total_ttc'])
+        agregats['nombre_factures'] += 1
+        agregats['chiffre_affaires_total'] += total
+        agregats['facture_plus_elevee'] = max(agregats['facture_plus_elevee'], total)
+        for cle, valeur in (('par_client', str(facture['code_client'])), ('par_jour', str(facture['date_facture']))):
+            detail = agregats[cle].setdefault(valeur, {'nombre': 0, 'total': 0.0})
+            detail['nombre'] += 1
+            detail['total'] += total
+    return agregats
+
+
+def fusionner(agregats, ajout, details=True):
+    """Ajouter aux agrégats ceux d'un lot de factures (`ajout`), sur place ; sans `details`, les totaux seuls.
+
+    Les totaux d'un client ou d'un jour sont remplacés, jamais modifiés :
+    une copie superficielle des dictionnaires par client et par jour suffit
+    à figer des agrégats déjà rendus.
+    """
+    agregats['nombre_factures'] += ajout['nombre_factures']
+    agregats['chiffre_affaires_total'] += ajout['chiffre_affaires_total']
+    agregats['facture_plus_elevee'] = max(agregats['facture_plus_elevee'], ajout['facture_plus_elevee'])
+    if details:
+        for cle in ('par_client', 'par_jour'):
+            for valeur, detail_ajout in ajout[cle].items():
+                detail = agregats[cle].get(valeur, {'nombre': 0, 'total': 0.0})
+                agregats[cle][valeur] = {'nombre': detail['nombre'] + detail_ajout['nombre'],
+                                         'total': detail['total'] + detail_ajout['total']}
+    return agregats
+
+
+def calculer(df_factures):
+    """Agrégats recalculés à partir de tout l'historique des factures"""
+    agregats = agregats_vides()
+    if df_factures.empty:
+        return agregats
+    totaux = df_factures['total_ttc'].astype(float)
+    agregats['nombre_factures'] = len(df_factures)
+    agregats['chiffre_affaires_total'] = float(totaux.sum())
+    agregats['facture_plus_elevee'] = float(totaux.max())
+    for cle, colonne in (('par_client', 'code_client'), ('par_jour', 'date_facture')):
+        groupes = totaux.groupby(df_factures[colonne].astype(str)).agg(['count', 'sum'])
+        agregats[cle] = {
+            valeur: {'nombre': int(nombre), 'total': float(total)}
+            for valeur, nombre, total in zip(groupes.index, groupes['count'], groupes['sum'])
+        }
+    return agregats
+
+
+def comparer(attendus, obtenus, tolerance=1e-6):
+    """Différences entre deux jeux d'agrégats (liste de messages, vide s'ils concordent)"""
+    def egaux(a, b):
+        return math.isclose(a, b, rel_tol=tolerance, abs_tol=tolerance)
+
+    differences = []
+    for cle in CLES_RESUME:
+        if not egaux(attendus[cle], obtenus[cle]):
+            differences.append(f"{cle} : {obtenus[cle]} au lieu de {attendus[cle]}")
+    for cle in ('par_client', 'par_jour'):
+        for valeur in sorted(set(attendus[cle]) | set(obtenus[cle])):
+            attendu = attendus[cle].get(valeur, {'nombre': 0, 'total': 0.0})
+            obtenu = obtenus[cle].get(valeur, {'nombre': 0, 'total': 0.0})
+            if attendu['nombre'] != obtenu['nombre'] or not egaux(attendu['total'], obtenu['total']):
+                differences.append(f"{cle}[{valeur}] : {obtenu} au lieu de {attendu}")
+    return differences
+
+
+if __name__ == "__main__":
+    from data_manager import DataManager
+
+    if len(sys.argv) != 2 or sys.argv[1] not in ('--verifier', '--reconstruire'):
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+    data_manager = DataManager()
+    if sys.argv[1] == '--reconstruire':
+        agregats = data_manager.reconstruire_agregats_ventes()
+        print(f"Agrégats reconstruits : {agregats['nombre_factures']} facture(s)")
+    else:
+        differences = data_manager.verifier_agregats_ventes()
+        for difference in differences:
+            print(f"❌ {difference}")
+        print("✅ Agrégats conformes à l'historique" if not differences else
+              f"{len(differences)} écart(s) : lancer --reconstruire")
+        sys.exit(1 if differences else 0)
@@ -0,0 +1,73 @@
+import pandas as pd
+
+COLONNES_LIGNES = ['numero_facture', 'date_facture', 'code_client', 'code_produit',
+                   'libelle', 'prix_unitaire', 'quantite', 'total_ht']
+
+
+class AnalyseProduits:
+    """Analyses des ventes par produit à partir des lignes de facture.
+
+    Les codes produit et client sont convertis en catégories : les groupby
+    travaillent sur des entiers et restent rapides sur des dizaines de
+    millions de lignes.
+    """
+
+    def __init__(self, df_lignes, debut=None, fin=None):
+        df = df_lignes if not df_lignes.empty else pd.DataFrame(columns=COLONNES_LIGNES)
+        dates = pd.to_datetime(df['date_facture'], errors='coerce')
+        masque = pd.Series(True, index=df.index)
+        if debut is not None:
+            masque &= dates >= pd.Timestamp(debut)
+        if fin is not None:
+            masque &= dates <= pd.Timestamp(fin)
+        self.lignes = pd.DataFrame({
+            'numero_facture': df['numero_facture'][masque],
+            'date': dates[masque],
+            'code_client': df['code_client'][masque].astype('category'),
+            'code_produit': df['code_produit'][masque].astype('category'),
+            'libelle': df['libelle'][masque],
+            'quantite': pd.to_numeric(df['quantite'][masque], errors='coerce').fillna(0).astype('int64'),
+            'total_ht': pd.to_numeric(df['total_ht'][masque], errors='coerce').fillna(0.0)
+        })
+        self.debut = debut
+        self.fin = fin
+
+    def par_produit(self):
+        """Quantités et chiffre d'affaires HT par produit, du plus vendu au moins vendu"""
+        groupes = self.lignes.groupby('code_produit', observed=True, sort=False)
+        df = groupes.agg(
+            quantite=('quantite', 'sum'),
+            total_ht=('total_ht', 'sum'),
+            nombre_lignes=('quantite', 'size'),
+            nombre_clients=('code_client', 'nunique')
+        )
+        # Libellé le plus récent de chaque produit
+        df['libelle'] = groupes['libelle'].last()
+        df = df.reset_index()
+        df['code_produit'] = df['code_produit'].astype(str)
+        df = df[['code_produit', 'libelle', 'quantite', 'total_ht', 'nombre_lignes', 'nombre_clients']]
+        return df.sort_values('total_ht', ascending=False, ignore_index=True)
+
+    def top_produits(self, n=10, critere='total_ht'):
+        """Les `n` produits en tête selon `critere` ('total_ht' ou 'quantite')"""
+        if critere not in ('total_ht', 'quantite'):
+            raise ValueError(f"Critère inconnu : {critere}")
+        return self.par_produit().nlargest(n, critere).reset_index(drop=True)
+
+    def tendance_quantites(self, produits=None):
+        """Quantités vendues par mois (AAAA-MM) : un produit par ligne, un mois par colonne"""
+        lignes = self.lignes
+        if produits is not None:
+            lignes = lignes[lignes['code_produit'].isin(produits)]
+        mois = lignes['date'].dt.strftime('%Y-%m').rename('mois')
+        tableau = lignes['quantite'].groupby([lignes['code_produit'], mois], observed=True).sum().unstack(
+            fill_value=0)
+        tableau.index = tableau.index.astype(str)
+        return tableau.sort_index(axis=1)
+
+    def exporter(self, chemin):
+        """Écrire les analyses dans un classeur Excel, une feuille par analyse"""
+        with pd.ExcelWriter(chemin) as classeur:
+            self.par_produit().to_excel(classeur, sheet_name='Par produit', index=False)
+            self.tendance_quantites().to_excel(classeur, sheet_name='Quantites par mois')
+        return chemin
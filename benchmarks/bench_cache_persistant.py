@@ -0,0 +1,75 @@
+"""Lancement à froid : lecture des classeurs par openpyxl contre copies binaires persistantes.
+
+Un jeu synthétique est généré dans un dossier temporaire, puis les quatre
+classeurs (clients, produits, cartes, factures) sont chargés comme au
+lancement de l'application, le cache du processus étant vidé avant chaque
+mesure : sans copie binaire, au premier lancement (copies écrites) et aux
+lancements suivants (copies relues). Les tables relues depuis les copies
+sont comparées à celles lues dans les classeurs.
+
+Usage : python benchmarks/bench_cache_persistant.py [--factures 100000] [--repetitions 3]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from create_initial_data import generer_donnees
+from stockage import StockageExcel, _cache_tables
+
+TABLES_CLASSEURS = ['clients', 'produits', 'cartes', 'factures']
+
+
+def charger_tout(stockage):
+    """Durée (s) du chargement des classeurs, à froid pour le processus ; tables lues"""
+    _cache_tables.invalider()
+    debut = time.perf_counter()
+    tables = {table: stockage.charger(table) for table in TABLES_CLASSEURS}
+    return time.perf_counter() - debut, tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--factures', type=int, default=100000)
+    parser.add_argument('--clients', type=int, default=20000)
+    parser.add_argument('--produits', type=int, default=5000)
+    parser.add_argument('--repetitions', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        print(f"⏳ Génération de {args.factures} factures...")
+        generer_donnees(args.clients, args.produits, args.factures, dossier, rapport=lambda message: None)
+        shutil.rmtree(os.path.join(dossier, '.cache'), ignore_errors=True)
+
+        sans_copie = StockageExcel(dossier, cache_persistant=False)
+        durees_xlsx = [charger_tout(sans_copie)[0] for _ in range(args.repetitions)]
+        _, reference = charger_tout(sans_copie)
+
+        avec_copie = StockageExcel(dossier)
+        premier, _ = charger_tout(avec_copie)
+        mesures = [charger_tout(avec_copie) for _ in range(args.repetitions)]
+        for table, df in mesures[-1][1].items():
+            pd.testing.assert_frame_equal(df, reference[table])
+        taille_copies = sum(os.path.getsize(os.path.join(dossier, '.cache', nom))
+                            for nom in os.listdir(os.path.join(dossier, '.cache')))
+        _cache_tables.invalider()
+
+    durees_copie = [duree for duree, _ in mesures]
+    print(f"\n{'Lecture':<36} {'durée (ms)':>12}")
+    print("-" * 50)
+    print(f"{'classeurs (openpyxl)':<36} {min(durees_xlsx) * 1000:>12.1f}")
+    print(f"{'premier lancement (copies écrites)':<36} {premier * 1000:>12.1f}")
+    print(f"{'lancements suivants (copies)':<36} {min(durees_copie) * 1000:>12.1f}")
+    print(f"\nCopies binaires : {taille_copies / 1024:.0f} Ko ; "
+          f"accélération x{min(durees_xlsx) / min(durees_copie):.0f}")
+    print("✅ Tables identiques aux classeurs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""Plusieurs caisses sur le même dossier data : débit en parallèle contre caisses l'une après l'autre.
+
+Chaque caisse est un processus qui enchaîne des ventes complètes (un
+nouveau client de temps en temps, trois produits, carte de réduction si
+le montant le justifie, PDF de la facture) par une session de vente. Pour
+chaque nombre de caisses, le même jeu de données est servi d'abord en
+série (une caisse après l'autre, comme aujourd'hui), puis en parallèle.
+Les données sont ensuite contrôlées : aucune facture, ligne, client ou
+carte perdu ni en double. Une vente refusée pour conflit (carte créée
+entre-temps par une autre caisse) est recommencée et comptée.
+
+--verifier contrôle d'abord qu'une vente annulée après l'attribution de
+ses numéros de facture et de carte les rend : la vente suivante les reçoit.
+
+Usage : python benchmarks/bench_concurrence.py [--caisses 1,2,4] [--ventes 30] [--sans-pdf] [--sqlite] [--verifier]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from create_initial_data import code_client, code_produit, generer_donnees
+
+NB_CLIENTS = 300
+NB_PRODUITS = 200
+NB_FACTURES = 1000
+
+
+def vente(dm, generateur, caisse, i, rng):
+    """Une vente complète par session ; retourne le nombre de lignes facturées"""
+    from tarification import calculer_totaux, ligne_facture
+
+    session = dm.session()
+    if i % 5 == 0:
+        code = f"K{caisse}C{i:05d}"
+        session.ajouter_client(code, f"Client caisse {caisse} n°{i}", "90000000", f"{caisse:03d}{i:010d}")
+    else:
+        code = code_client(rng.randrange(NB_CLIENTS))
+    client_info = session.obtenir_client(code)
+    produits = [ligne_facture(dm.obtenir_produit(code_produit(rng.randrange(NB_PRODUITS))), rng.randint(1, 20))
+                for _ in range(3)]
+    carte = session.obtenir_carte_client(code)
+    totaux = calculer_totaux(produits, carte['taux_reduction'] if carte else 0, dm.regles)
+    session.enregistrer_facture(code, totaux['total_ht'], totaux['remise'], totaux['total_ht_remise'],
+                                totaux['tva'], totaux['total_ttc'], produits)
+    if not carte and totaux['total_ttc'] >= dm.regles.seuil_carte:
+        session.creer_carte_reduction(code, totaux['total_ttc'])
+    resultat = session.valider()
+    if generateur is not None:
+        generateur.generer_facture(resultat['numero_facture'], client_info, produits, totaux['total_ht'],
+                                   totaux['remise'], totaux['total_ht_remise'], totaux['tva'], totaux['total_ttc'],
+                                   taux_tva=dm.regles.taux_tva)
+    return len(produits)
+
+
+def caisse(dossier, numero, ventes, pdf, depart):
+    """Processus d'une caisse : attendre `depart` puis enchaîner les ventes"""
+    os.chdir(dossier)
+    sys.path.insert(0, RACINE)
+    from data_manager import DataManager
+    from verrou import statistiques_verrous
+
+    dm = DataManager()
+    generateur = None
+    if pdf:
+        from facture_generator import FactureGenerator
+        generateur = FactureGenerator()
+    rng = random.Random(numero)
+    time.sleep(max(0.0, depart - time.time()))
+    debut = time.time()
+    lignes = conflits = 0
+    for i in range(ventes):
+        while True:
+            try:
+                lignes += vente(dm, generateur, numero, i, rng)
+                break
+            except ValueError:
+                # Clé créée entre-temps par une autre caisse : la vente est reprise
+                conflits += 1
+    return {'debut': debut, 'fin': time.time(), 'lignes': lignes, 'conflits': conflits,
+            'verrous': statistiques_verrous.en_dict()}
+
+
+def preparer(dossier, sqlite):
+    """Générer le jeu de données initial ; retourne son nombre de lignes de facture"""
+    nombres = generer_donnees(NB_CLIENTS, NB_PRODUITS, NB_FACTURES, os.path.join(dossier, 'data'), sqlite=sqlite,
+                              rapport=lambda message: None)
+    os.makedirs(os.path.join(dossier, 'factures'), exist_ok=True)
+    return nombres['lignes_factures']
+
+
+def executer(nb_caisses, ventes, pdf, sqlite, en_parallele):
+    """Débit (ventes/s) de `nb_caisses` caisses, et contrôle des données"""
+    contexte = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as dossier:
+        lignes_initiales = preparer(dossier, sqlite)
+        resultats = []
+        with contexte.Pool(nb_caisses) as pool:
+            if en_parallele:
+                # Départ commun, une fois les processus démarrés
+                depart = time.time() + 3
+                resultats = pool.starmap(caisse, [(dossier, n, ventes, pdf, depart) for n in range(nb_caisses)])
+            else:
+                for n in range(nb_caisses):
+                    resultats.append(pool.apply(caisse, (dossier, n, ventes, pdf, 0)))
+        if en_parallele:
+            duree = max(r['fin'] for r in resultats) - min(r['debut'] for r in resultats)
+        else:
+            duree = sum(r['fin'] - r['debut'] for r in resultats)
+        erreurs = controler(dossier, nb_caisses, ventes, lignes_initiales + sum(r['lignes'] for r in resultats))
+    attentes = sum(r['verrous']['attentes'] for r in resultats)
+    acquisitions = sum(r['verrous']['acquisitions'] for r in resultats)
+    return {
+        'debit': nb_caisses * ventes / duree,
+        'conflits': sum(r['conflits'] for r in resultats),
+        'contention': attentes / acquisitions if acquisitions else 0,
+        'attente_s': sum(r['verrous']['duree_attente_s'] for r in resultats),
+        'erreurs': erreurs
+    }
+
+
+def controler(dossier, nb_caisses, ventes, lignes):
+    """Écarts entre les données écrites et les ventes faites (liste vide si tout est là).
+
+    `lignes` est le nombre de lignes de facture attendu : celles du jeu
+    initial plus celles facturées par les caisses.
+    """
+    from data_manager import DataManager
+    from stockage import _cache_tables
+
+    repertoire = os.getcwd()
+    os.chdir(dossier)
+    try:
+        _cache_tables.invalider()
+        dm = DataManager()
+        factures = dm.charger_factures()
+        clients = dm.charger_clients()
+        cartes = dm.charger_cartes()
+        nb_lignes = len(dm.charger_lignes_factures())
+        if dm.stockage.nom == 'sqlite':
+            dm.stockage.fermer()
+    finally:
+        os.chdir(repertoire)
+        _cache_tables.invalider()
+    erreurs = []
+    if len(factures) != NB_FACTURES + nb_caisses * ventes:
+        erreurs.append(f"{len(factures)} factures au lieu de {NB_FACTURES + nb_caisses * ventes}")
+    if factures['numero_facture'].duplicated().any():
+        erreurs.append("numéros de facture en double")
+    if nb_lignes != lignes:
+        erreurs.append(f"{nb_lignes} lignes de facture au lieu de {lignes}")
+    nouveaux = nb_caisses * len(range(0, ventes, 5))
+    if len(clients) != NB_CLIENTS + nouveaux or clients['code_client'].duplicated().any():
+        erreurs.append(f"{len(clients)} clients au lieu de {NB_CLIENTS + nouveaux}")
+    if cartes['numero_carte'].duplicated().any() or cartes['code_client'].duplicated().any():
+        erreurs.append("cartes en double")
+    return erreurs
+
+
+class RenduEnEchec:
+    """File de rendu dont la préparation de la carte échoue, après l'attribution des numéros"""
+
+    def __init__(self):
+        self.numeros = None
+
+    def preparer_facture(self, numero_facture, *args):
+        self.numeros = [numero_facture]
+        return {'id': numero_facture}
+
+    def preparer_carte(self, client_info, carte_info):
+        self.numeros.append(carte_info['numero_carte'])
+        raise OSError("disque plein")
+
+    def abandonner(self, travaux):
+        pass
+
+
+def verifier_annulation(sqlite):
+    """Écarts si une vente annulée perd ses numéros de facture et de carte (liste vide sinon)"""
+    from data_manager import DataManager
+    from stockage import _cache_tables
+    from tarification import calculer_totaux, ligne_facture
+
+    repertoire = os.getcwd()
+    with tempfile.TemporaryDirectory() as dossier:
+        preparer(dossier, sqlite)
+        os.chdir(dossier)
+        try:
+            _cache_tables.invalider()
+            dm = DataManager()
+            produits = [ligne_facture(dm.obtenir_produit(code_produit(0)), 1000)]
+            totaux = calculer_totaux(produits, 0, dm.regles)
+            numeros = []
+            for file_rendu in (RenduEnEchec(), None):
+                session = dm.session()
+                session.ajouter_client('ANNUL001', "Client annulé", "90000000", "9990000000001")
+                session.enregistrer_facture('ANNUL001', totaux['total_ht'], totaux['remise'],
+                                            totaux['total_ht_remise'], totaux['tva'], totaux['total_ttc'], produits)
+                session.creer_carte_reduction('ANNUL001', totaux['total_ttc'])
+                try:
+                    resultat = session.valider(file_rendu)
+                    numeros.append([resultat['numero_facture'], resultat['carte']['numero_carte']])
+                except OSError:
+                    numeros.append(file_rendu.numeros)
+            if dm.stockage.nom == 'sqlite':
+                dm.stockage.fermer()
+        finally:
+            os.chdir(repertoire)
+            _cache_tables.invalider()
+    if numeros[0] != numeros[1]:
+        return [f"numéros de la vente annulée {numeros[0]} perdus, vente suivante : {numeros[1]}"]
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--caisses', default='1,2,4', help="nombres de caisses, séparés par des virgules")
+    parser.add_argument('--ventes', type=int, default=30, help="ventes par caisse")
+    parser.add_argument('--sans-pdf', action='store_true', help="ne pas rendre le PDF de chaque facture")
+    parser.add_argument('--sqlite', action='store_true', help="stockage SQLite au lieu des classeurs")
+    parser.add_argument('--verifier', action='store_true',
+                        help="contrôler qu'une vente annulée rend ses numéros de facture et de carte")
+    args = parser.parse_args()
+
+    if args.verifier:
+        erreurs = verifier_annulation(args.sqlite)
+        print("Vente annulée : " + ('✅ numéros rendus' if not erreurs else '❌ ' + ' ; '.join(erreurs)))
+        if erreurs:
+            sys.exit(1)
+
+    print(f"{'Caisses':>7} {'Mode':<10} {'ventes/s':>9} {'gain':>6} {'conflits':>9} {'contention':>11} "
+          f"{'attente':>9}  Contrôle")
+    print("-" * 80)
+    echec = False
+    for nb_caisses in [int(n) for n in args.caisses.split(',')]:
+        serie = None
+        for en_parallele in (False, True):
+            r = executer(nb_caisses, args.ventes, not args.sans_pdf, args.sqlite, en_parallele)
+            serie = serie or r['debit']
+            controle = '✅' if not r['erreurs'] else '❌ ' + ' ; '.join(r['erreurs'])
+            echec = echec or bool(r['erreurs'])
+            print(f"{nb_caisses:>7} {'parallèle' if en_parallele else 'série':<10} {r['debit']:>9.1f} "
+                  f"{r['debit'] / serie:>5.1f}x {r['conflits']:>9} {r['contention']:>10.0%} "
+                  f"{r['attente_s']:>8.2f}s  {controle}")
+    sys.exit(1 if echec else 0)
+
+
+if __name__ == "__main__":
+    main()
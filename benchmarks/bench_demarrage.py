@@ -0,0 +1,76 @@
+"""Démarrage de main.py : temps d'import et de construction de l'application jusqu'au menu.
+
+Chaque mesure est faite dans un nouvel interpréteur, dans un dossier
+temporaire contenant les données initiales. Le script échoue si la médiane
+dépasse le budget ou si pandas ou ReportLab ont été importés avant le menu.
+
+Usage : python benchmarks/bench_demarrage.py [--repetitions 10] [--budget-ms 150]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+MODULES_LOURDS = ['pandas', 'numpy', 'openpyxl', 'reportlab']
+
+
+def mesurer(dossier):
+    """Durées (ms) d'un démarrage dans un nouvel interpréteur, modules lourds présents au menu"""
+    # Import de main et construction de l'application, puis premier accès aux données
+    code = f"""
+import json, sys, time
+debut = time.perf_counter()
+sys.path.insert(0, {RACINE!r})
+import main
+app = main.ApplicationFacturation()
+menu = time.perf_counter()
+lourds = [m for m in {MODULES_LOURDS!r} if m in sys.modules]
+app.data_manager.charger_clients()
+print(json.dumps({{'menu_ms': (menu - debut) * 1000,
+                   'premier_usage_ms': (time.perf_counter() - menu) * 1000,
+                   'modules_au_menu': lourds}}))
+"""
+    sortie = subprocess.run([sys.executable, '-c', code], cwd=dossier, capture_output=True, text=True, check=True)
+    return json.loads(sortie.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repetitions', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=150, help="durée maximale (médiane) jusqu'au menu")
+    args = parser.parse_args()
+
+    from create_initial_data import create_initial_files
+
+    with tempfile.TemporaryDirectory() as dossier:
+        repertoire = os.getcwd()
+        os.chdir(dossier)
+        try:
+            create_initial_files()
+        finally:
+            os.chdir(repertoire)
+        # Premier lancement hors mesure : compilation des .pyc
+        mesurer(dossier)
+        resultats = [mesurer(dossier) for _ in range(args.repetitions)]
+
+    menu = statistics.median(r['menu_ms'] for r in resultats)
+    premier_usage = statistics.median(r['premier_usage_ms'] for r in resultats)
+    lourds = sorted({m for r in resultats for m in r['modules_au_menu']})
+    print(f"\nJusqu'au menu         : {menu:8.1f} ms (médiane de {args.repetitions}, budget {args.budget_ms:.0f} ms)")
+    print(f"Premier accès données : {premier_usage:8.1f} ms (import de pandas, lecture de Clients.xlsx)")
+    print(f"Modules lourds au menu : {', '.join(lourds) or 'aucun'}")
+
+    if menu > args.budget_ms or lourds:
+        print("❌ Budget de démarrage dépassé")
+        sys.exit(1)
+    print("✅ Budget de démarrage respecté")
+
+
+if __name__ == "__main__":
+    main()
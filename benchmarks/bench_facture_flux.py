@@ -0,0 +1,88 @@
+"""Rendu des grosses factures : tableau platypus unique contre rendu page par page.
+
+Pour chaque taille, la même facture est rendue par les deux moteurs ; la
+durée est mesurée sans traçage, puis le pic mémoire Python sur un second
+rendu sous tracemalloc.
+
+Usage : python benchmarks/bench_facture_flux.py [--lignes 1000 10000] [--sans-platypus]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.platypus import SimpleDocTemplate
+
+from facture_generator import FactureGenerator
+from tarification import calculer_totaux, ligne_facture
+
+CLIENT = {'code_client': 'CLI001', 'nom': 'Grossiste', 'contact': '97000000', 'IFU': '1234567890123'}
+
+
+def produits_synthetiques(nombre, nb_references=500):
+    """Lignes d'une commande de grossiste (les références du catalogue se répètent)"""
+    return [ligne_facture({'code_produit': f"P{i % nb_references:05d}",
+                           'libelle': f"Article de gros référence {i % nb_references}",
+                           'prix_unitaire': float(10 + i % 97)}, 1 + i % 12)
+            for i in range(nombre)]
+
+
+def rendre_platypus(generateur, chemin, produits, totaux):
+    story = generateur.modele_facture.remplir(
+        'BENCH', CLIENT, produits, totaux['total_ht'], totaux['remise'], totaux['total_ht_remise'],
+        totaux['tva'], totaux['total_ttc'], generateur.nombre_en_lettres(int(totaux['total_ttc'])), "Groupe"
+    )
+    SimpleDocTemplate(chemin, **generateur.modele_facture.mise_en_page).build(story)
+
+
+def rendre_flux(generateur, chemin, produits, totaux):
+    generateur.facture_flux.rendre(
+        chemin, 'BENCH', CLIENT, iter(produits), totaux['total_ht'], totaux['remise'], totaux['total_ht_remise'],
+        totaux['tva'], totaux['total_ttc'], generateur.nombre_en_lettres(int(totaux['total_ttc'])), "Groupe"
+    )
+
+
+def mesurer(rendu, generateur, chemin, produits, totaux):
+    """Durée (s), pic mémoire (Mo) et taille du fichier (Ko) d'un rendu"""
+    debut = time.perf_counter()
+    rendu(generateur, chemin, produits, totaux)
+    duree = time.perf_counter() - debut
+    tracemalloc.start()
+    rendu(generateur, chemin, produits, totaux)
+    pic = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return duree, pic / 1e6, os.path.getsize(chemin) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lignes', type=int, nargs='+', default=[1000, 10000], help="tailles de facture mesurées")
+    parser.add_argument('--sans-platypus', action='store_true', help="ne mesurer que le rendu page par page")
+    args = parser.parse_args()
+
+    generateur = FactureGenerator()
+    moteurs = [("page par page", rendre_flux)]
+    if not args.sans_platypus:
+        moteurs.insert(0, ("platypus", rendre_platypus))
+
+    print(f"{'Lignes':>8} {'Moteur':<15} {'durée (s)':>10} {'lignes/s':>10} {'pic mém.':>10} {'taille':>10}")
+    print("-" * 68)
+    with tempfile.TemporaryDirectory() as temp:
+        chemin = os.path.join(temp, 'facture.pdf')
+        # Premier rendu : chargement des polices hors mesure
+        rendre_flux(generateur, chemin, produits_synthetiques(10), calculer_totaux(produits_synthetiques(10)))
+        for nombre in args.lignes:
+            produits = produits_synthetiques(nombre)
+            totaux = calculer_totaux(produits, 10)
+            for nom, rendu in moteurs:
+                duree, pic, taille = mesurer(rendu, generateur, chemin, produits, totaux)
+                print(f"{nombre:>8} {nom:<15} {duree:>10.2f} {nombre / duree:>10.0f} "
+                      f"{pic:>7.1f} Mo {taille:>7.0f} Ko")
+
+
+if __name__ == "__main__":
+    main()
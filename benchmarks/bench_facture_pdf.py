@@ -0,0 +1,238 @@
+"""Débit de génération des factures PDF : avant / après le modèle précompilé.
+
+Les deux versions rendent les mêmes factures dans un dossier temporaire.
+--verifier les rend une seconde fois avec le même réglage des flux PDF, en
+mode invariant de reportlab, et contrôle que les fichiers sont identiques
+octet par octet ; il contrôle aussi qu'une facture calculée avec un autre
+taux de TVA affiche ce taux, en rendu tableau comme page par page.
+
+Usage : python benchmarks/bench_facture_pdf.py [--factures 300] [--produits 5] [--verifier]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from datetime import datetime
+
+from facture_generator import SEUIL_RENDU_FLUX, FactureGenerator
+from tarification import ReglesTarification, calculer_totaux, libelle_tva
+
+
+def generer_facture_origine(self, numero_facture, client_info, produits_factures, total_ht, remise, total_ht_remise, tva, total_ttc, nom_groupe="Groupe d'Étudiants"):
+    """Implémentation d'origine de FactureGenerator.generer_facture, référence de la mesure"""
+    import copy
+    # Créer le dossier factures s'il n'existe pas
+    if not os.path.exists('factures'):
+        os.makedirs('factures')
+    
+    filename = f"factures/Facture_{numero_facture}.pdf"
+    doc = SimpleDocTemplate(filename, pagesize=A4, topMargin=1*inch, bottomMargin=1*inch, leftMargin=0.5*inch, rightMargin=0.5*inch)
+    story = []
+    
+    # En-tête : nom du groupe à gauche, date à droite
+    header_data = [
+        [Paragraph(f"<b>{nom_groupe}</b>", self.styles['HeaderInfo']), 
+         Paragraph(f"Date d'émission : {datetime.now().strftime('%d/%m/%Y')}", self.styles['HeaderInfo'])]
+    ]
+    header_table = Table(header_data, colWidths=[4*inch, 3*inch])
+    header_table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ]))
+    story.append(header_table)
+    story.append(Spacer(1, 20))
+    # Informations du client
+    client_info_data = [
+        [Paragraph("<b>INFORMATIONS DU CLIENT</b>", self.styles['ClientInfo'])],
+        [Paragraph(f"Code client : {client_info['code_client']}", self.styles['ClientInfo'])],
+        [Paragraph(f"Nom : {client_info['nom']}", self.styles['ClientInfo'])],
+        [Paragraph(f"Contact : {client_info['contact']}", self.styles['ClientInfo'])],
+        [Paragraph(f"IFU : {client_info['IFU']}", self.styles['ClientInfo'])]
+    ]
+    for info in client_info_data:
+        story.append(Paragraph(info[0].text, self.styles['ClientInfo']))
+    story.append(Spacer(1, 30))
+    # Titre centré : FACTURE n° XXXXXX
+    story.append(Paragraph(f"FACTURE n° {numero_facture}", self.styles['CustomTitle']))
+    story.append(Spacer(1, 30))
+    # Tableau des produits avec les colonnes exactes demandées
+    table_data = [['N°', 'Code Produit', 'Libellé', 'P.U.', 'Qté', 'Total HT']]
+    for i, produit in enumerate(produits_factures, 1):
+        table_data.append([
+            str(i),
+            produit['code_produit'],
+            produit['libelle'],
+            f"{produit['prix_unitaire']:.2f}",
+            str(produit['quantite']),
+            f"{produit['total_ht']:.2f}"
+        ])
+    # Ajout de lignes vides pour l'esthétique si moins de 3 produits
+    while len(table_data) < 4:
+        table_data.append(['', '', '', '', '', ''])
+    # Tableau des totaux (collé à droite, même largeur que le tableau des produits)
+    totaux_data = [
+        ['', '', '', '', 'Total HT', f"{total_ht:.2f}"],
+        ['', '', '', '', 'Remise', f"{remise:.2f}"],
+        ['', '', '', '', 'THT remise', f"{total_ht_remise:.2f}"],
+        ['', '', '', '', 'TVA (18%)', f"{tva:.2f}"],
+        ['', '', '', '', 'Total TTC', f"{total_ttc:.2f}"]
+    ]
+    # Fusionner les deux tableaux pour avoir le rendu du modèle
+    full_table_data = copy.deepcopy(table_data) + totaux_data
+    table = Table(full_table_data, colWidths=[0.7*inch, 1.3*inch, 2.7*inch, 1*inch, 0.8*inch, 1.2*inch])
+    table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        # Totaux à droite
+        ('ALIGN', (4, len(table_data)), (4, -1), 'RIGHT'),
+        ('ALIGN', (5, len(table_data)), (5, -1), 'RIGHT'),
+        ('FONTNAME', (4, len(table_data)), (4, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (5, len(table_data)), (5, -1), 'Helvetica'),
+        ('BACKGROUND', (4, -1), (5, -1), colors.lightgrey),
+        ('FONTNAME', (4, -1), (5, -1), 'Helvetica-Bold'),
+    ]))
+    story.append(table)
+    story.append(Spacer(1, 40))
+    # Bas de page : "Arrêtée, la présente facture à la somme de : [Total TTC en lettres]" en italique
+    total_en_lettres = self.nombre_en_lettres(int(total_ttc))
+    story.append(Paragraph(
+        f"<i>Arrêtée, la présente facture à la somme de : {total_en_lettres}</i>", 
+        self.styles['TotalStyle']
+    ))
+    # Générer le PDF
+    doc.build(story)
+    return filename 
+
+
+def factures_synthetiques(nombre, nb_produits):
+    rng = random.Random(42)
+    factures = []
+    for i in range(1, nombre + 1):
+        produits = []
+        for j in range(nb_produits):
+            prix = float(rng.randint(10, 5000))
+            quantite = rng.randint(1, 10)
+            produits.append({'code_produit': f"P{j:05d}", 'libelle': f"Produit {j}", 'prix_unitaire': prix,
+                             'quantite': quantite, 'total_ht': prix * quantite})
+        client = {'code_client': f"CLI{i:05d}", 'nom': f"Client {i}", 'contact': f"9{i:07d}", 'IFU': f"{i:013d}"}
+        factures.append((f"B{i:06d}", client, produits, calculer_totaux(produits, rng.choice([0, 5, 10, 15]))))
+    return factures
+
+
+def texte_pdf(texte):
+    """Texte tel qu'il est écrit dans un flux PDF non compressé (parenthèses échappées)"""
+    return texte.replace('(', '\\(').replace(')', '\\)').encode()
+
+
+def verifier_taux_tva(generateur, taux_tva=0.2):
+    """Nombre de factures (rendu tableau, rendu page par page) dont la ligne de TVA n'affiche pas `taux_tva`"""
+    regles = ReglesTarification(taux_tva)
+    attendu = texte_pdf(libelle_tva(taux_tva))
+    defaut = texte_pdf(libelle_tva(ReglesTarification().taux_tva))
+    client = {'code_client': "CLI00001", 'nom': "Client 1", 'contact': "90000000", 'IFU': "0000000000001"}
+    erreurs = 0
+    compression = rl_config.pageCompression
+    # Flux non compressés : le texte des libellés se retrouve tel quel dans le fichier
+    rl_config.pageCompression = 0
+    try:
+        for nombre in (3, SEUIL_RENDU_FLUX + 1):
+            produits = [{'code_produit': f"P{j:05d}", 'libelle': f"Produit {j}", 'prix_unitaire': 100.0,
+                         'quantite': 1, 'total_ht': 100.0} for j in range(nombre)]
+            t = calculer_totaux(produits, 0, regles)
+            fichier = generateur.generer_facture(f"TVA{nombre}", client, produits, t['total_ht'], t['remise'],
+                                                 t['total_ht_remise'], t['tva'], t['total_ttc'],
+                                                 taux_tva=regles.taux_tva)
+            with open(fichier, 'rb') as pdf:
+                contenu = pdf.read()
+            if attendu not in contenu or defaut in contenu:
+                erreurs += 1
+    finally:
+        rl_config.pageCompression = compression
+    return erreurs
+
+
+def rendre(fonction, generateur, factures):
+    debut = time.perf_counter()
+    fichiers = []
+    for numero, client, produits, t in factures:
+        fichiers.append(fonction(generateur, numero, client, produits, t['total_ht'], t['remise'],
+                                 t['total_ht_remise'], t['tva'], t['total_ttc']))
+    return fichiers, time.perf_counter() - debut
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--factures', type=int, default=300, help="nombre de factures rendues par version")
+    parser.add_argument('--produits', type=int, default=5, help="produits par facture")
+    parser.add_argument('--verifier', action='store_true', help="comparer les PDF des deux versions")
+    args = parser.parse_args()
+
+    factures = factures_synthetiques(args.factures, args.produits)
+    generateur = FactureGenerator()
+    # Réglage des flux PDF du processus : facture_generator ne le change que le temps de ses rendus
+    reglage_processus = rl_config.useA85
+    versions = (("origine", generer_facture_origine, 1),
+                ("modèle précompilé", FactureGenerator.generer_facture, 0))
+    dossier = os.getcwd()
+    with tempfile.TemporaryDirectory() as temp:
+        os.chdir(temp)
+        try:
+            # Un premier rendu charge les polices et les modules avant la mesure
+            rendre(FactureGenerator.generer_facture, generateur, factures[:5])
+            resultats = []
+            for nom, fonction, use_a85 in versions:
+                rl_config.useA85 = use_a85
+                fichiers, duree = rendre(fonction, generateur, factures)
+                taille = sum(os.path.getsize(fichier) for fichier in fichiers) / len(fichiers)
+                resultats.append((nom, len(factures) / duree, taille))
+            ecarts = None
+            if args.verifier:
+                # Le générateur rend sans ASCII85 puis rétablit le réglage du processus
+                rl_config.useA85 = 1
+                fichiers, _ = rendre(FactureGenerator.generer_facture, generateur, factures[:1])
+                with open(fichiers[0], 'rb') as pdf:
+                    reglage_retabli = rl_config.useA85 == 1 and b'ASCII85Decode' not in pdf.read()
+                # Même réglage des flux pour les deux versions : les octets doivent concorder
+                rl_config.useA85 = 0
+                rl_config.invariant = 1
+                contenus = []
+                for nom, fonction, _ in versions:
+                    fichiers, _ = rendre(fonction, generateur, factures)
+                    contenus.append([open(fichier, 'rb').read() for fichier in fichiers])
+                ecarts = sum(1 for a, b in zip(*contenus) if a != b)
+                erreurs_tva = verifier_taux_tva(generateur)
+        finally:
+            rl_config.useA85 = reglage_processus
+            os.chdir(dossier)
+
+    print(f"{'Version':<20} {'factures/s':>12} {'gain':>8} {'taille PDF':>12}")
+    print("-" * 55)
+    for nom, debit, taille in resultats:
+        print(f"{nom:<20} {debit:>12.1f} {debit / resultats[0][1]:>7.2f}x {taille / 1024:>9.1f} Ko")
+    if ecarts is not None:
+        print(f"\n{'✅' if not ecarts else '❌'} {len(factures)} PDF comparés, {ecarts} différent(s)")
+        print(f"{'✅' if not erreurs_tva else '❌'} Autre taux de TVA : "
+              f"{erreurs_tva} facture(s) sur 2 avec un libellé de TVA erroné")
+        print(f"{'✅' if reglage_retabli else '❌'} Réglage ASCII85 de reportlab "
+              f"{'appliqué au seul rendu' if reglage_retabli else 'modifié pour tout le processus'}")
+        if ecarts or erreurs_tva or not reglage_retabli:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Micro-benchmark des recherches par clé de DataManager.
+
+Compare la latence de obtenir_produit / obtenir_client (index de clés) avec
+l'ancien parcours par masque booléen, pour des tables de 10 à 1 000 000 lignes.
+
+Usage : python benchmarks/bench_index.py [--tailles 10,1000,1000000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from data_manager import DataManager
+from stockage import StockageExcel
+
+
+def mesurer(fonction, cles, repetitions):
+    """Latence moyenne en microsecondes d'un appel de `fonction`"""
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        for cle in cles:
+            fonction(cle)
+    return (time.perf_counter() - debut) / (repetitions * len(cles)) * 1e6
+
+
+def preparer(dm, taille):
+    """Placer des tables synthétiques de `taille` lignes dans le cache"""
+    df_produits = pd.DataFrame({
+        'code_produit': [f"{i:06d}" for i in range(taille)],
+        'libelle': [f"Produit {i}" for i in range(taille)],
+        'prix_unitaire': [float(i % 1000 + 1) for i in range(taille)]
+    })
+    df_clients = pd.DataFrame({
+        'code_client': [f"CLI{i:07d}" for i in range(taille)],
+        'nom': [f"Client {i}" for i in range(taille)],
+        'contact': ['90000000'] * taille,
+        'IFU': ['1234567890123'] * taille
+    })
+    # Les fichiers ne servent qu'à fournir une signature : les tables viennent du cache
+    stockage = dm.stockage
+    for table, df in [('produits', df_produits), ('clients', df_clients)]:
+        df.head(0).to_excel(stockage.fichiers[table], index=False)
+        stockage.cache.memoriser(stockage.fichiers[table], df)
+    return df_produits, df_clients
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tailles', default='10,1000,100000,1000000')
+    parser.add_argument('--recherches', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'Lignes':>10} {'index (µs)':>12} {'absent (µs)':>12} {'masque (µs)':>12}")
+    print("-" * 50)
+    with tempfile.TemporaryDirectory() as dossier:
+        os.chdir(dossier)
+        os.makedirs('data')
+        for taille in (int(t) for t in args.tailles.split(',')):
+            dm = DataManager(StockageExcel('data'))
+            df_produits, _ = preparer(dm, taille)
+            codes = random.Random(taille).choices(df_produits['code_produit'].tolist(), k=args.recherches)
+
+            # Premier passage : construction des index, hors mesure
+            for code in codes:
+                dm.obtenir_produit(code)
+            dm.obtenir_client('INCONNU')
+            index = mesurer(dm.obtenir_produit, codes, 5)
+            absent = mesurer(dm.obtenir_client, ['INCONNU'] * len(codes), 5)
+
+            def masque(code):
+                produit = df_produits[df_produits['code_produit'] == code]
+                return None if produit.empty else produit.iloc[0].to_dict()
+            ancien = mesurer(masque, codes[:20], 1)
+
+            print(f"{taille:>10} {index:>12.2f} {absent:>12.2f} {ancien:>12.2f}")
+            dm.stockage.cache.invalider()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Conversion des montants en lettres : contrôle et débit.
+
+--verifier compare montant_lettres.nombre_en_lettres à l'implémentation
+d'origine de FactureGenerator (recopiée ci-dessous) sur tous les montants
+de 0 à --jusqu-a, puis sur des montants tirés au hasard jusqu'à mille
+milliards. Le débit est mesuré sur une colonne de totaux de factures
+réaliste (beaucoup de montants répétés).
+
+Usage : python benchmarks/bench_montant_lettres.py [--verifier] [--jusqu-a 1000000] [--montants 200000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import montant_lettres
+
+
+def nombre_en_lettres_origine(nombre):
+    """Implémentation d'origine (FactureGenerator.nombre_en_lettres), référence du contrôle"""
+    if nombre == 0:
+        return "zéro franc CFA"
+    unite = ["", "un", "deux", "trois", "quatre", "cinq", "six", "sept", "huit", "neuf"]
+    dizaine = ["", "dix", "vingt", "trente", "quarante", "cinquante", "soixante", "soixante-dix", "quatre-vingt", "quatre-vingt-dix"]
+    def convert_hundred(n):
+        if n == 0:
+            return ""
+        elif n < 10:
+            return unite[n]
+        elif n < 20:
+            return ["dix", "onze", "douze", "treize", "quatorze", "quinze", "seize", "dix-sept", "dix-huit", "dix-neuf"][n-10]
+        elif n < 100:
+            d, u = divmod(n, 10)
+            sep = " et " if u == 1 and d not in [8] else "-" if u > 0 else ""
+            if d == 7 or d == 9:
+                return dizaine[d-1] + sep + convert_hundred(10+u)
+            else:
+                return dizaine[d] + (sep + unite[u] if u else "")
+        else:
+            c, r = divmod(n, 100)
+            cent = "cent" if c == 1 else unite[c] + " cent"
+            if r == 0:
+                return cent + ("s" if c > 1 else "")
+            else:
+                return cent + " " + convert_hundred(r)
+    def group(n, singular, plural):
+        if n == 0:
+            return ""
+        elif n == 1:
+            return singular
+        else:
+            return convert_number(n) + " " + plural
+    def convert_number(n):
+        if n < 1000:
+            return convert_hundred(n)
+        elif n < 1000000:
+            mille, r = divmod(n, 1000)
+            prefix = "mille" if mille == 1 else convert_hundred(mille) + " mille"
+            if r == 0:
+                return prefix
+            else:
+                return prefix + " " + convert_hundred(r) if r < 1000 else prefix + " " + convert_number(r)
+        elif n < 1000000000:
+            million, r = divmod(n, 1000000)
+            prefix = group(million, "un million", "millions")
+            if r == 0:
+                return prefix
+            else:
+                return prefix + " " + convert_number(r)
+        else:
+            milliard, r = divmod(n, 1000000000)
+            prefix = group(milliard, "un milliard", "milliards")
+            if r == 0:
+                return prefix
+            else:
+                return prefix + " " + convert_number(r)
+    lettres = convert_number(int(nombre)).strip()
+    if not lettres.endswith("francs CFA"):
+        lettres += " francs CFA"
+    return lettres
+
+
+def verifier(jusqu_a, tirages=200000):
+    """Comparer les deux implémentations ; retourne la liste des écarts"""
+    ecarts = []
+    rng = random.Random(42)
+    montants = list(range(jusqu_a + 1)) + [rng.randrange(10 ** rng.randint(4, 12)) for _ in range(tirages)]
+    for montant in montants:
+        attendu = nombre_en_lettres_origine(montant)
+        obtenu = montant_lettres.nombre_en_lettres(montant)
+        if obtenu != attendu:
+            ecarts.append((montant, attendu, obtenu))
+    lot = montant_lettres.nombres_en_lettres(montants[:10000])
+    ecarts.extend((m, nombre_en_lettres_origine(m), o) for m, o in zip(montants, lot)
+                  if o != nombre_en_lettres_origine(m))
+    return len(montants), ecarts
+
+
+def mesurer(fonction, montants):
+    debut = time.perf_counter()
+    fonction(montants)
+    duree = time.perf_counter() - debut
+    return len(montants) / duree if duree else float('inf')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--verifier', action='store_true', help="contrôler l'égalité avec l'implémentation d'origine")
+    parser.add_argument('--jusqu-a', type=int, default=1000000, help="borne du balayage exhaustif")
+    parser.add_argument('--montants', type=int, default=200000, help="taille de la colonne de totaux mesurée")
+    args = parser.parse_args()
+
+    if args.verifier:
+        debut = time.perf_counter()
+        nombre, ecarts = verifier(args.jusqu_a)
+        for montant, attendu, obtenu in ecarts[:20]:
+            print(f"❌ {montant} : {obtenu!r} au lieu de {attendu!r}")
+        print(f"{'✅' if not ecarts else '❌'} {nombre} montants comparés, {len(ecarts)} écart(s) "
+              f"({time.perf_counter() - debut:.1f} s)")
+        if ecarts:
+            sys.exit(1)
+
+    # Totaux TTC de factures : quelques milliers de montants distincts, souvent répétés
+    rng = random.Random(7)
+    distincts = [int(rng.randint(100, 20000) * 1.18) for _ in range(5000)]
+    montants = [rng.choice(distincts) for _ in range(args.montants)]
+
+    def un_par_un(m):
+        return [montant_lettres.nombre_en_lettres(x) for x in m]
+
+    resultats = [("origine", mesurer(lambda m: [nombre_en_lettres_origine(x) for x in m], montants))]
+    montant_lettres._en_lettres.cache_clear()
+    resultats.append(("module, cache froid", mesurer(un_par_un, montants)))
+    resultats.append(("module, cache chaud", mesurer(un_par_un, montants)))
+    montant_lettres._en_lettres.cache_clear()
+    resultats.append(("module, par lot", mesurer(montant_lettres.nombres_en_lettres, montants)))
+
+    print(f"\n{'Implémentation':<22} {'conversions/s':>15} {'gain':>8}")
+    print("-" * 47)
+    reference = resultats[0][1]
+    for nom, debit in resultats:
+        print(f"{nom:<22} {debit:>15,.0f} {debit / reference:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Consultation des tables : délai de la première page et mémoire, chargement complet contre lecture au fil de l'eau.
+
+Un jeu synthétique (beaucoup de clients) est généré dans un dossier
+temporaire, en classeurs puis migré en SQLite. Pour chaque façon
+d'obtenir la première page de 20 clients, le cache du processus est vidé
+puis on mesure le délai, et à un second passage le pic de mémoire Python
+(tracemalloc, qui ralentit trop la lecture pour en mesurer le délai) :
+chargement de toute la table comme l'ancien affichage, parcours dans
+l'ordre du classeur, tri par nom et filtre sur le début du nom.
+
+--verifier contrôle d'abord, sur une petite table, que chaque façon de
+parcourir rend toutes les lignes une fois, avec toutes les colonnes, y
+compris quand des cellules (ou la colonne de tri) sont vides.
+
+Usage : python benchmarks/bench_pagination.py [--clients 100000] [--verifier]
+"""
+import argparse
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from itertools import islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from create_initial_data import generer_donnees
+from stockage import TABLES, TAILLE_PAQUET, StockageExcel, _cache_tables
+from stockage_sqlite import StockageSQLite, migrer_excel_vers_sqlite
+
+TAILLE_PAGE = 20
+
+
+def mesurer(operation, avant):
+    """Délai (ms) puis pic de mémoire (Mo, second passage sous tracemalloc) de operation()"""
+    avant()
+    # Les tables lues par les mesures précédentes ne sont pas ramassées pendant celle-ci
+    gc.collect()
+    debut = time.perf_counter()
+    page = operation()
+    duree = time.perf_counter() - debut
+    avant()
+    tracemalloc.start()
+    operation()
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duree * 1000, pic / 1e6, page
+
+
+def premiere_page(stockage, *options):
+    return lambda: list(islice(stockage.parcourir('clients', *options), TAILLE_PAGE))
+
+
+def verifier(dossier):
+    """Nombre d'erreurs de parcours d'une table de clients dont le nom ou l'IFU manque"""
+    colonnes = TABLES['clients']['colonnes']
+    # IFU vide : Excel n'écrit pas les cellules de fin de ligne ; noms vides au-delà d'un paquet
+    clients = [{'code_client': f"CLV{i:05d}", 'nom': None if i % 2 == 0 else f"Client {i}",
+                'contact': "90000000", 'IFU': None if i % 3 == 0 else f"{i:013d}"}
+               for i in range(3 * TAILLE_PAQUET)]
+    excel = StockageExcel(os.path.join(dossier, 'verification'), cache_persistant=False)
+    os.makedirs(excel.data_folder)
+    excel.creer('clients')
+    excel.ajouter('clients', clients)
+    sqlite = StockageSQLite(os.path.join(dossier, 'verification', 'facturation.db'))
+    sqlite.ajouter('clients', clients)
+    _cache_tables.invalider()
+    parcours = [
+        # Au fil du classeur : la table n'est pas en mémoire
+        ("Excel au fil du classeur", excel, ()),
+        ("Excel tri par nom", excel, ('nom',)),
+        ("SQLite ordre d'enregistrement", sqlite, ()),
+        ("SQLite tri par nom", sqlite, ('nom',)),
+        ("SQLite tri par nom décroissant", sqlite, ('nom', None, True)),
+    ]
+    erreurs = 0
+    for nom, stockage, options in parcours:
+        lignes = list(stockage.parcourir('clients', *options))
+        codes = [ligne['code_client'] for ligne in lignes]
+        if (len(lignes) != len(clients) or len(set(codes)) != len(clients)
+                or any(list(ligne) != colonnes for ligne in lignes)):
+            print(f"❌ {nom} : {len(set(codes))} client(s) distinct(s) sur {len(clients)}, "
+                  f"{len(lignes)} ligne(s)")
+            erreurs += 1
+    sqlite.fermer()
+    _cache_tables.invalider()
+    return erreurs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=100000)
+    parser.add_argument('--verifier', action='store_true', help="contrôler le parcours de cellules vides")
+    args = parser.parse_args()
+
+    if args.verifier:
+        with tempfile.TemporaryDirectory() as dossier:
+            erreurs = verifier(dossier)
+        print(f"{'✅' if not erreurs else '❌'} Parcours des cellules vides : {erreurs} erreur(s)\n")
+        if erreurs:
+            sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as dossier:
+        donnees = os.path.join(dossier, 'data')
+        generer_donnees(args.clients, 100, 100, donnees, rapport=lambda message: None)
+        dossier_sqlite = os.path.join(dossier, 'sqlite')
+        shutil.copytree(donnees, dossier_sqlite)
+        migrer_excel_vers_sqlite(dossier_sqlite)
+
+        sans_copie = StockageExcel(donnees, cache_persistant=False)
+        excel = StockageExcel(donnees)
+        sqlite = StockageSQLite(os.path.join(dossier_sqlite, 'facturation.db'))
+        # Copie binaire du classeur écrite une fois, comme après un premier lancement
+        excel.charger('clients')
+
+        def ancien_affichage(stockage):
+            def operation():
+                df = stockage.charger('clients')
+                return [ligne for _, ligne in islice(df.iterrows(), TAILLE_PAGE)]
+            return operation
+
+        mesures = [
+            ("Excel : table entière (openpyxl)", ancien_affichage(sans_copie)),
+            ("Excel : table entière (copie binaire)", ancien_affichage(excel)),
+            ("Excel : au fil du classeur", premiere_page(excel)),
+            ("Excel : tri par nom", premiere_page(excel, 'nom')),
+            ("Excel : filtre « Groupe A »", premiere_page(excel, 'nom', 'Groupe A')),
+            ("SQLite : table entière", ancien_affichage(sqlite)),
+            ("SQLite : ordre d'enregistrement", premiere_page(sqlite)),
+            ("SQLite : tri par nom décroissant", premiere_page(sqlite, 'nom', None, True)),
+            ("SQLite : filtre « Groupe A »", premiere_page(sqlite, 'nom', 'Groupe A')),
+        ]
+        print(f"📊 Première page de {TAILLE_PAGE} clients sur {args.clients}\n")
+        print(f"{'Lecture':<40} {'délai ms':>10} {'mémoire Mo':>11} {'lignes':>7}")
+        print("-" * 72)
+        for nom, operation in mesures:
+            # Rien en cache : la consultation commence à froid pour le processus
+            avant = sqlite._cache.clear if nom.startswith('SQLite') else _cache_tables.invalider
+            duree, pic, page = mesurer(operation, avant)
+            print(f"{nom:<40} {duree:>10.1f} {pic:>11.1f} {len(page):>7}")
+        sqlite.fermer()
+        _cache_tables.invalider()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Recherche de produits dans un grand catalogue : construction de l'index et latence par frappe.
+
+Un catalogue synthétique est indexé, puis des libellés tirés au hasard
+sont « tapés » caractère par caractère : chaque préfixe est une recherche,
+comme à chaque saisie de la caisse. S'y ajoutent des libellés complets
+sans accents, avec fautes de frappe et des codes, dont on vérifie que le
+produit visé figure parmi les dix résultats. La recherche est comparée au filtrage
+du DataFrame (str.contains) que ferait la caisse sans index.
+
+Usage : python benchmarks/bench_recherche_produits.py [--produits 40000] [--saisies 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from create_initial_data import produits_synthetiques
+from recherche_produits import IndexProduits, normaliser
+
+
+def centiles(durees):
+    durees = sorted(durees)
+    return (durees[len(durees) // 2] * 1000,
+            durees[min(len(durees) - 1, int(len(durees) * 0.99))] * 1000)
+
+
+def chronometrer(index, requetes):
+    """Durées des recherches, et part de celles dont le produit attendu est parmi les résultats"""
+    durees = []
+    trouves = 0
+    for requete, attendu in requetes:
+        debut = time.perf_counter()
+        resultats = index.rechercher(requete)
+        durees.append(time.perf_counter() - debut)
+        if attendu is None:
+            trouves += bool(resultats)
+        else:
+            trouves += any(produit['code_produit'] == attendu for produit in resultats)
+    return durees, trouves
+
+
+def faute(mot, rng):
+    """Le mot avec une lettre supprimée ou deux lettres inversées (les nombres sont gardés)"""
+    if len(mot) < 4 or not mot.isalpha():
+        return mot
+    i = rng.randrange(1, len(mot) - 2)
+    if rng.random() < 0.5:
+        return mot[:i] + mot[i + 1:]
+    return mot[:i] + mot[i + 1] + mot[i] + mot[i + 2:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--produits', type=int, default=40000)
+    parser.add_argument('--saisies', type=int, default=200, help="libellés tapés caractère par caractère")
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    catalogue = pd.DataFrame(list(produits_synthetiques(args.produits, rng)))
+    libelles = catalogue['libelle'].tolist()
+
+    debut = time.perf_counter()
+    index = IndexProduits(catalogue)
+    construction = time.perf_counter() - debut
+    print(f"📦 {len(index)} produits indexés en {construction * 1000:.0f} ms "
+          f"({len(index.index_mots)} mots distincts)")
+
+    frappes = []
+    for _ in range(args.saisies):
+        libelle = normaliser(rng.choice(libelles))
+        frappes.extend((libelle[:n], None) for n in range(2, len(libelle) + 1))
+    tires = [catalogue.iloc[rng.randrange(args.produits)] for _ in range(args.saisies)]
+    series = [
+        ("Frappe caractère par caractère", frappes),
+        ("Sans accents", [(normaliser(p['libelle']), p['code_produit']) for p in tires]),
+        ("Fautes de frappe", [(' '.join(faute(mot, rng) for mot in normaliser(p['libelle']).split()),
+                               p['code_produit']) for p in tires]),
+        ("Code exact", [(p['code_produit'], p['code_produit']) for p in tires]),
+    ]
+
+    print(f"\n{'Saisie':<32} {'requêtes':>9} {'p50 ms':>8} {'p99 ms':>8} {'trouvées':>9}")
+    print("-" * 70)
+    for nom, requetes in series:
+        durees, trouves = chronometrer(index, requetes)
+        p50, p99 = centiles(durees)
+        print(f"{nom:<32} {len(requetes):>9} {p50:>8.3f} {p99:>8.3f} {trouves / len(requetes):>8.0%}")
+
+    # Sans index : filtrage du DataFrame à chaque saisie
+    libelles_normalises = catalogue['libelle'].map(normaliser)
+    durees = []
+    for requete, _ in frappes[:200]:
+        debut = time.perf_counter()
+        libelles_normalises[libelles_normalises.str.contains(requete, regex=False)].head(10)
+        durees.append(time.perf_counter() - debut)
+    p50, p99 = centiles(durees)
+    print(f"{'Sans index (str.contains)':<32} {len(durees):>9} {p50:>8.3f} {p99:>8.3f}")
+
+    nouveaux = [{'code_produit': f"N{i:05d}", 'libelle': f"Nouveau produit {i}", 'prix_unitaire': 10.0}
+                for i in range(100)]
+    debut = time.perf_counter()
+    for produit in nouveaux:
+        index.ajouter([produit])
+    ajout = (time.perf_counter() - debut) / len(nouveaux)
+    print(f"\n➕ Ajout d'un produit à l'index : {ajout * 1e6:.0f} µs "
+          f"(retrouvé : {'✅' if index.rechercher('nouveau produit 42') else '❌'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Test de charge du service HTTP de facturation : requêtes par seconde et latence p99.
+
+Le service est lancé dans ce processus sur un port libre, avec un jeu
+synthétique dans un dossier temporaire. Des clients HTTP (un thread et
+une connexion persistante chacun) envoient pendant la durée choisie un
+mélange de recherches de clients et de produits, de créations de factures
+et de statistiques. Les réponses 503 (contre-pression) sont comptées à part.
+
+Usage : python benchmarks/bench_service.py [--clients 8] [--duree 10] [--part-factures 0.2]
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from create_initial_data import code_client, code_produit, generer_donnees
+
+NB_CLIENTS = 2000
+NB_PRODUITS = 500
+NB_FACTURES = 10000
+
+
+def client_charge(port, graine, fin, part_factures, resultats):
+    """Envoyer des requêtes jusqu'à `fin` ; ajoute (route, statut, durée) à `resultats`"""
+    rng = random.Random(graine)
+    connexion = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    mesures = []
+    while time.perf_counter() < fin:
+        tirage = rng.random()
+        if tirage < part_factures:
+            route, methode = 'POST /factures', 'POST'
+            chemin = '/factures'
+            corps = json.dumps({'code_client': code_client(rng.randrange(NB_CLIENTS)), 'produits': [
+                {'code_produit': code_produit(rng.randrange(NB_PRODUITS)), 'quantite': rng.randint(1, 5)}
+                for _ in range(rng.randint(1, 4))]}).encode('utf-8')
+        elif tirage < part_factures + 0.05:
+            route, methode, chemin, corps = 'GET /statistiques', 'GET', '/statistiques', None
+        elif tirage < 0.6:
+            route, methode, corps = 'GET /clients/<code>', 'GET', None
+            chemin = f"/clients/{code_client(rng.randrange(NB_CLIENTS))}"
+        else:
+            route, methode, corps = 'GET /produits/<code>', 'GET', None
+            chemin = f"/produits/{code_produit(rng.randrange(NB_PRODUITS))}"
+        debut = time.perf_counter()
+        connexion.request(methode, chemin, body=corps, headers={'Content-Type': 'application/json'})
+        reponse = connexion.getresponse()
+        reponse.read()
+        mesures.append((route, reponse.status, time.perf_counter() - debut))
+    connexion.close()
+    resultats.extend(mesures)
+
+
+def centile(durees, q):
+    return durees[min(len(durees) - 1, int(len(durees) * q))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8, help="clients HTTP simultanés")
+    parser.add_argument('--duree', type=float, default=10, help="durée de la charge (s)")
+    parser.add_argument('--part-factures', type=float, default=0.2, help="part des requêtes qui créent une facture")
+    parser.add_argument('--requetes-max', type=int, default=32)
+    parser.add_argument('--file-max', type=int, default=100)
+    args = parser.parse_args()
+
+    from file_rendu import FileRendu
+    from service_http import ServiceFacturation, creer_serveur
+    from stockage import _cache_tables
+
+    repertoire = os.getcwd()
+    with tempfile.TemporaryDirectory() as dossier:
+        generer_donnees(NB_CLIENTS, NB_PRODUITS, NB_FACTURES, os.path.join(dossier, 'data'),
+                        rapport=lambda message: None)
+        os.chdir(dossier)
+        try:
+            service = ServiceFacturation(file_rendu=FileRendu(taille_max=args.file_max, ouvrir=False),
+                                         requetes_max=args.requetes_max)
+            service.demarrer()
+            serveur = creer_serveur(service, port=0)
+            threading.Thread(target=serveur.serve_forever, daemon=True).start()
+            port = serveur.server_address[1]
+
+            resultats = []
+            fin = time.perf_counter() + args.duree
+            clients = [threading.Thread(target=client_charge,
+                                        args=(port, graine, fin, args.part_factures, resultats))
+                       for graine in range(args.clients)]
+            debut = time.perf_counter()
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            duree = time.perf_counter() - debut
+
+            serveur.shutdown()
+            serveur.server_close()
+            attente = service.file_rendu.en_attente()
+            service.arreter()
+        finally:
+            os.chdir(repertoire)
+            _cache_tables.invalider()
+
+    print(f"\n{'Route':<24} {'requêtes':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'503':>6} {'erreurs':>8}")
+    print("-" * 76)
+    routes = sorted({route for route, _, _ in resultats})
+    for route in routes + ['Total']:
+        lignes = [r for r in resultats if route in ('Total', r[0])]
+        durees = sorted(d for _, statut, d in lignes if statut < 500)
+        refus = sum(1 for _, statut, _ in lignes if statut == 503)
+        erreurs = sum(1 for _, statut, _ in lignes if statut >= 500 and statut != 503)
+        if route == 'Total':
+            print("-" * 76)
+        print(f"{route:<24} {len(lignes):>9} {len(lignes) / duree:>8.1f} "
+              f"{centile(durees, 0.5) if durees else 0:>8.1f} {centile(durees, 0.99) if durees else 0:>8.1f} "
+              f"{refus:>6} {erreurs:>8}")
+    print(f"\nPDF encore en file à la fin de la charge : {attente}")
+
+
+if __name__ == "__main__":
+    main()
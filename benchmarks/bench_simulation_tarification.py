@@ -0,0 +1,113 @@
+"""Simulation de règles de tarification sur tout l'historique : passe vectorisée contre rejeu facture par facture.
+
+Un historique synthétique est généré avec les règles en vigueur
+(create_initial_data.historique_synthetique), puis dupliqué pour d'autres
+clients jusqu'au nombre de factures voulu. On vérifie d'abord que la
+simulation des règles en vigueur retrouve les montants enregistrés, puis
+que celle de règles modifiées donne, facture par facture, les mêmes
+montants qu'un rejeu en Python ; enfin on mesure le délai de chaque
+méthode (le rejeu sur l'historique de base seulement).
+
+Usage : python benchmarks/bench_simulation_tarification.py [--factures 2000000] [--base 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from create_initial_data import historique_synthetique, produits_synthetiques
+from simulation_tarification import SimulationTarification
+from tarification import ReglesTarification
+
+REGLES_MODIFIEES = ReglesTarification(0.18, [(1500, 5), (4000, 10), (8000, 12), (15000, 20)])
+
+
+def historique(nb_factures, nb_clients, graine=42):
+    """Factures et cartes d'un historique synthétique"""
+    rng = random.Random(graine)
+    catalogue = [(p['libelle'], p['prix_unitaire']) for p in produits_synthetiques(200, rng)]
+    tables = {'factures': [], 'cartes': []}
+    for table, ligne in historique_synthetique(nb_factures, nb_clients, catalogue, rng):
+        if table in tables:
+            tables[table].append(ligne)
+    return pd.DataFrame(tables['factures']), pd.DataFrame(tables['cartes'])
+
+
+def dupliquer(df, copies):
+    """`copies` exemplaires de la table, chacun pour d'autres clients (même historique, clients distincts)"""
+    exemplaires = [df.assign(code_client=df['code_client'] + f"-{k}") for k in range(copies)]
+    return pd.concat(exemplaires, ignore_index=True)
+
+
+def rejouer(df_factures, regles):
+    """Montants TTC des factures recalculés un à un, comme à la caisse"""
+    taux_clients = {}
+    totaux = []
+    for code, total_ht in zip(df_factures['code_client'], df_factures['total_ht']):
+        taux = taux_clients.get(code, 0)
+        remise = total_ht * (taux / 100) if taux else 0
+        total_ht_remise = total_ht - remise
+        total_ttc = total_ht_remise + total_ht_remise * regles.taux_tva
+        totaux.append(total_ttc)
+        if not taux:
+            taux = regles.taux_reduction_pour(total_ttc)
+            if taux:
+                taux_clients[code] = taux
+    return np.array(totaux)
+
+
+def chronometrer(fonction, *arguments):
+    debut = time.perf_counter()
+    resultat = fonction(*arguments)
+    return resultat, time.perf_counter() - debut
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--factures', type=int, default=2000000)
+    parser.add_argument('--base', type=int, default=100000, help="factures de l'historique généré")
+    args = parser.parse_args()
+
+    base = min(args.base, args.factures)
+    print(f"Génération de {base} factures...")
+    factures, cartes = historique(base, max(1, base // 20))
+    copies = max(1, args.factures // base)
+
+    print("\n🔍 Vérifications (historique de base)")
+    simulation = SimulationTarification(factures, ReglesTarification(), df_cartes=cartes)
+    resume = simulation.resume()
+    print(f"  Règles en vigueur : écart TTC {resume['ecart_ttc']:.6f} FCFA, "
+          f"écart remise {resume['ecart_remise']:.6f} FCFA, "
+          f"cartes {resume['cartes_simulees']} simulées / {resume['cartes_reelles']} réelles")
+    ecart = np.abs(SimulationTarification(factures, REGLES_MODIFIEES).ttc_simule
+                   - rejouer(factures, REGLES_MODIFIEES)).max()
+    print(f"  Règles modifiées : écart maximal avec le rejeu {ecart:.6f} FCFA par facture")
+
+    print(f"\n⏱️ Délais ({REGLES_MODIFIEES})")
+    _, duree_rejeu = chronometrer(rejouer, factures, REGLES_MODIFIEES)
+    _, duree_base = chronometrer(SimulationTarification, factures, REGLES_MODIFIEES)
+    print(f"  {len(factures):>9} factures   rejeu Python {duree_rejeu * 1000:8.0f} ms   "
+          f"vectorisé {duree_base * 1000:6.0f} ms")
+
+    tout = dupliquer(factures, copies)
+    simulation, duree = chronometrer(SimulationTarification, tout, REGLES_MODIFIEES)
+    (_, duree_clients), (_, duree_mois) = chronometrer(simulation.par_client), chronometrer(simulation.par_mois)
+    print(f"  {len(tout):>9} factures   rejeu Python ~{duree_rejeu * copies:7.1f} s    "
+          f"vectorisé {duree * 1000:6.0f} ms (+ {duree_clients * 1000:.0f} ms par client, "
+          f"{duree_mois * 1000:.0f} ms par mois)")
+    _, duree_scenario = chronometrer(simulation.avec_regles, ReglesTarification(0.19))
+    print(f"  {'':>9}            scénario suivant sur les mêmes factures (avec_regles) "
+          f"{duree_scenario * 1000:.0f} ms")
+    resume = simulation.resume()
+    print(f"\n  Écart de chiffre d'affaires : {resume['ecart_ttc']:+,.0f} FCFA ({resume['ecart_ttc_pct']:+.2f} %), "
+          f"écart de remise : {resume['ecart_remise']:+,.0f} FCFA, cartes : {resume['cartes_simulees']}")
+
+
+if __name__ == "__main__":
+    main()
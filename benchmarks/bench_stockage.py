@@ -0,0 +1,97 @@
+"""Comparaison de la latence par opération entre les stockages Excel et SQLite.
+
+Les deux stockages sont remplis avec le même jeu synthétique (100 000
+factures par défaut, générées par create_initial_data.py avec la même
+graine), puis chaque opération de DataManager est chronométrée.
+
+Usage : python benchmarks/bench_stockage.py [--factures 100000] [--repetitions 50]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from create_initial_data import code_client, code_produit, generer_donnees
+from data_manager import DataManager
+from stockage import FICHIER_SQLITE, StockageExcel, _cache_tables
+from stockage_sqlite import StockageSQLite
+
+
+def chronometrer(fonction, repetitions):
+    """Latence moyenne en millisecondes"""
+    debut = time.perf_counter()
+    for i in range(repetitions):
+        fonction(i)
+    return (time.perf_counter() - debut) / repetitions * 1000
+
+
+def mesurer(nom, dm, recharger, repetitions):
+    """Mesurer chaque opération de DataManager pour un stockage"""
+    resultats = {}
+    rng = random.Random(7)
+    clients = [code_client(rng.randrange(1000)) for _ in range(repetitions)]
+    produits = [code_produit(rng.randrange(1000)) for _ in range(repetitions)]
+
+    debut = time.perf_counter()
+    recharger()
+    dm.charger_factures()
+    resultats['charger_factures (à froid)'] = (time.perf_counter() - debut) * 1000
+    resultats['charger_factures'] = chronometrer(lambda i: dm.charger_factures(), repetitions)
+    resultats['obtenir_client'] = chronometrer(lambda i: dm.obtenir_client(clients[i]), repetitions)
+    resultats['obtenir_produit'] = chronometrer(lambda i: dm.obtenir_produit(produits[i]), repetitions)
+    resultats['obtenir_carte_client'] = chronometrer(lambda i: dm.obtenir_carte_client(clients[i]), repetitions)
+    resultats['enregistrer_facture'] = chronometrer(
+        lambda i: dm.enregistrer_facture(f"BENCH{nom}{i:06d}", clients[i], 1000.0, 0.0, 1000.0, 180.0, 1180.0),
+        repetitions)
+    resultats['facture + carte (transaction)'] = chronometrer(lambda i: _vente_avec_carte(dm, nom, i), repetitions)
+    resultats['obtenir_prochain_numero_facture'] = chronometrer(
+        lambda i: dm.obtenir_prochain_numero_facture(), max(1, repetitions // 10))
+    resultats['obtenir_statistiques_ventes'] = chronometrer(
+        lambda i: dm.obtenir_statistiques_ventes(), max(1, repetitions // 10))
+    return resultats
+
+
+def _vente_avec_carte(dm, nom, i):
+    """Vente d'un nouveau client qui déclenche la création d'une carte"""
+    code_client = f"NEW{nom}{i:05d}"
+    with dm.transaction():
+        dm.enregistrer_facture(f"BENCHC{nom}{i:06d}", code_client, 5000.0, 0.0, 5000.0, 900.0, 5900.0)
+        dm.creer_carte_reduction(code_client, 5900.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--factures', type=int, default=100000)
+    parser.add_argument('--repetitions', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        print(f"Préparation de {args.factures} factures...")
+        dossier_excel = os.path.join(dossier, 'excel')
+        generer_donnees(1000, 1000, args.factures, dossier_excel, rapport=lambda message: None)
+        excel = StockageExcel(dossier_excel)
+
+        generer_donnees(1000, 1000, args.factures, dossier, sqlite=True, rapport=lambda message: None)
+        sqlite = StockageSQLite(os.path.join(dossier, FICHIER_SQLITE))
+
+        def recharger_sqlite():
+            sqlite._cache.clear()
+
+        resultats = {
+            'excel': mesurer('X', DataManager(excel), _cache_tables.invalider, args.repetitions),
+            'sqlite': mesurer('S', DataManager(sqlite), recharger_sqlite, args.repetitions)
+        }
+        sqlite.fermer()
+
+    print(f"\n{'Opération (ms)':<36} {'Excel':>12} {'SQLite':>12}")
+    print("-" * 62)
+    for operation in resultats['excel']:
+        print(f"{operation:<36} {resultats['excel'][operation]:>12.3f} {resultats['sqlite'][operation]:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Suite de benchmarks : opérations de DataManager et génération des PDF.
+
+Pour chaque taille (nombre de clients, de produits et de factures) et
+chaque stockage, un jeu synthétique est préparé dans un dossier
+temporaire puis chaque opération est chronométrée appel par appel. Les
+résultats sont écrits en JSON ; avec --reference, ils sont comparés à un
+fichier précédent et le script échoue si une opération a ralenti au-delà
+du seuil.
+
+Usage : python benchmarks/suite.py [--tailles 1000,100000] [--stockages excel,sqlite]
+                                   [--sortie resultats.json] [--reference precedent.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from create_initial_data import LIGNES_MAX_EXCEL, code_client, code_produit, generer_donnees
+from data_manager import DataManager
+from stockage import FICHIER_SQLITE, StockageExcel, _cache_tables
+from stockage_sqlite import StockageSQLite
+from tarification import calculer_totaux, ligne_facture
+
+
+def chronometrer(fonction, repetitions):
+    """Statistiques (ms) de `repetitions` appels de fonction(i)"""
+    durees = []
+    for i in range(repetitions):
+        debut = time.perf_counter()
+        fonction(i)
+        durees.append((time.perf_counter() - debut) * 1000)
+    durees.sort()
+    return {
+        'repetitions': repetitions,
+        'moyenne_ms': statistics.fmean(durees),
+        'p50_ms': durees[len(durees) // 2],
+        'p95_ms': durees[min(len(durees) - 1, int(len(durees) * 0.95))],
+        'min_ms': durees[0],
+        'max_ms': durees[-1]
+    }
+
+
+def preparer(type_stockage, dossier, taille):
+    """Stockage rempli avec le jeu synthétique (graine fixe), et sa fonction de vidage du cache"""
+    generer_donnees(taille, taille, taille, dossier, sqlite=type_stockage == 'sqlite', rapport=lambda message: None)
+    if type_stockage == 'excel':
+        return StockageExcel(dossier), _cache_tables.invalider
+    stockage = StockageSQLite(os.path.join(dossier, FICHIER_SQLITE))
+    return stockage, stockage._cache.clear
+
+
+def mesurer_data_manager(dm, vider_cache, taille, repetitions, repetitions_ecriture):
+    """Chronométrer chaque opération de DataManager ; retourne {opération: statistiques}"""
+    rng = random.Random(7)
+    clients = [code_client(rng.randrange(taille)) for _ in range(repetitions)]
+    produits = [code_produit(rng.randrange(taille)) for _ in range(repetitions)]
+    recherches = ['sou', 'clav meca', 'cable hd', 'ecran', 'imprimnte laser', produits[0][:4]]
+    produit = dm.obtenir_produit(produits[0])
+    lignes = [ligne_facture(produit, 2)]
+    totaux = calculer_totaux(lignes)
+
+    def a_froid(charger):
+        def operation(i):
+            vider_cache()
+            charger()
+        return operation
+
+    operations = [
+        ('charger_clients (à froid)', a_froid(dm.charger_clients), repetitions_ecriture),
+        ('charger_produits (à froid)', a_froid(dm.charger_produits), repetitions_ecriture),
+        ('charger_cartes (à froid)', a_froid(dm.charger_cartes), repetitions_ecriture),
+        ('charger_factures (à froid)', a_froid(dm.charger_factures), repetitions_ecriture),
+        ('charger_clients', lambda i: dm.charger_clients(), repetitions),
+        ('charger_produits', lambda i: dm.charger_produits(), repetitions),
+        ('charger_cartes', lambda i: dm.charger_cartes(), repetitions),
+        ('charger_factures', lambda i: dm.charger_factures(), repetitions),
+        ('obtenir_client', lambda i: dm.obtenir_client(clients[i]), repetitions),
+        ('obtenir_produit', lambda i: dm.obtenir_produit(produits[i]), repetitions),
+        ('rechercher_produits', lambda i: dm.rechercher_produits(recherches[i % len(recherches)]), repetitions),
+        ('obtenir_carte_client', lambda i: dm.obtenir_carte_client(clients[i]), repetitions),
+        ('ajouter_client', lambda i: dm.ajouter_client(f"BCL{i:06d}", f"Client bench {i}", "90000000",
+                                                       f"{i:013d}"), repetitions_ecriture),
+        ('ajouter_produit', lambda i: dm.ajouter_produit(f"B{i:05d}", f"Produit bench {i}", 100.0),
+         repetitions_ecriture),
+        ('enregistrer_facture', lambda i: dm.enregistrer_facture(
+            f"BENCH{i:06d}", clients[i], totaux['total_ht'], totaux['remise'], totaux['total_ht_remise'],
+            totaux['tva'], totaux['total_ttc'], lignes), repetitions),
+        ('obtenir_prochain_numero_facture', lambda i: dm.obtenir_prochain_numero_facture(), repetitions),
+        ('obtenir_statistiques_ventes', lambda i: dm.obtenir_statistiques_ventes(), repetitions),
+    ]
+    return {nom: chronometrer(fonction, nombre) for nom, fonction, nombre in operations}
+
+
+def mesurer_pdf(repetitions):
+    """Chronométrer la génération d'une facture et d'une carte (indépendante des volumes)"""
+    from facture_generator import FactureGenerator
+
+    generateur = FactureGenerator()
+    client = {'code_client': 'CLI00001', 'nom': 'Client 1', 'contact': '90000001', 'IFU': '0000000000001'}
+    lignes = [ligne_facture({'code_produit': f"P{i:05d}", 'libelle': f"Produit {i}",
+                             'prix_unitaire': 100.0 + i}, 1 + i) for i in range(5)]
+    totaux = calculer_totaux(lignes, 10)
+    carte = {'numero_carte': 'CARTE0001', 'taux_reduction': 10}
+    dossier = os.getcwd()
+    with tempfile.TemporaryDirectory() as temp:
+        os.chdir(temp)
+        try:
+            # Premier rendu hors mesure : chargement des polices
+            generateur.generer_carte_reduction(client, carte)
+            return {
+                'generer_facture': chronometrer(lambda i: generateur.generer_facture(
+                    f"B{i:06d}", client, lignes, totaux['total_ht'], totaux['remise'], totaux['total_ht_remise'],
+                    totaux['tva'], totaux['total_ttc']), repetitions),
+                'generer_carte_reduction': chronometrer(
+                    lambda i: generateur.generer_carte_reduction(client, carte), repetitions)
+            }
+        finally:
+            os.chdir(dossier)
+
+
+def comparer(resultats, reference, seuil, plancher):
+    """Opérations plus lentes que dans `reference` de plus de `seuil` (fraction).
+
+    Les opérations sous `plancher` ms, trop bruitées, sont ignorées.
+    """
+    anciens = {(r['stockage'], r['taille'], r['operation']): r for r in reference['resultats']}
+    regressions = []
+    for r in resultats:
+        ancien = anciens.get((r['stockage'], r['taille'], r['operation']))
+        if not ancien or max(ancien['p50_ms'], r['p50_ms']) < plancher:
+            continue
+        if r['p50_ms'] > ancien['p50_ms'] * (1 + seuil):
+            regressions.append((r, ancien))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tailles', default='1000,100000',
+                        help="nombres de clients, produits et factures, séparés par des virgules")
+    parser.add_argument('--stockages', default='excel,sqlite')
+    parser.add_argument('--repetitions', type=int, default=200, help="appels par opération de lecture")
+    parser.add_argument('--repetitions-ecriture', type=int, default=5,
+                        help="appels par opération coûteuse (chargement à froid, ajout de client ou produit)")
+    parser.add_argument('--repetitions-pdf', type=int, default=50)
+    parser.add_argument('--sortie', default='resultats_benchmarks.json')
+    parser.add_argument('--reference', help="résultats précédents à comparer")
+    parser.add_argument('--seuil', type=float, default=0.2, help="ralentissement toléré (0.2 = +20 %%)")
+    parser.add_argument('--plancher', type=float, default=0.05,
+                        help="durée (ms) sous laquelle une opération n'est pas comparée")
+    args = parser.parse_args()
+
+    resultats = []
+    for taille in [int(t) for t in args.tailles.split(',')]:
+        for type_stockage in args.stockages.split(','):
+            if type_stockage == 'excel' and taille > LIGNES_MAX_EXCEL:
+                print(f"⏭️  excel, {taille} lignes : au-delà de la limite d'une feuille Excel")
+                continue
+            with tempfile.TemporaryDirectory() as dossier:
+                print(f"⏱️  {type_stockage}, {taille} lignes par table...")
+                debut = time.perf_counter()
+                stockage, vider_cache = preparer(type_stockage, dossier, taille)
+                print(f"   préparé en {time.perf_counter() - debut:.1f} s")
+                dm = DataManager(stockage)
+                mesures = mesurer_data_manager(dm, vider_cache, taille, args.repetitions,
+                                               args.repetitions_ecriture)
+                if type_stockage == 'sqlite':
+                    stockage.fermer()
+                _cache_tables.invalider()
+            resultats.extend(dict(statistiques, stockage=type_stockage, taille=taille, operation=operation)
+                             for operation, statistiques in mesures.items())
+    resultats.extend(dict(statistiques, stockage=None, taille=None, operation=operation)
+                     for operation, statistiques in mesurer_pdf(args.repetitions_pdf).items())
+
+    rapport = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plateforme': platform.platform(),
+        'parametres': vars(args),
+        'resultats': resultats
+    }
+    with open(args.sortie, 'w', encoding='utf-8') as fichier:
+        json.dump(rapport, fichier, ensure_ascii=False, indent=1)
+
+    print(f"\n{'Stockage':<8} {'Taille':>8} {'Opération':<34} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    print("-" * 74)
+    for r in resultats:
+        print(f"{r['stockage'] or 'pdf':<8} {r['taille'] or '':>8} {r['operation']:<34} "
+              f"{r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f}")
+    print(f"\n✅ Résultats écrits dans {args.sortie}")
+
+    if args.reference:
+        with open(args.reference, 'r', encoding='utf-8') as fichier:
+            regressions = comparer(resultats, json.load(fichier), args.seuil, args.plancher)
+        for r, ancien in regressions:
+            print(f"❌ {r['stockage'] or 'pdf'} {r['taille'] or ''} {r['operation']} : "
+                  f"{r['p50_ms']:.3f} ms au lieu de {ancien['p50_ms']:.3f} ms")
+        print(f"{len(regressions)} régression(s) au-delà de +{args.seuil:.0%}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import hashlib
+import os
+import pickle
+import threading
+
+import pandas as pd
+
+# À incrémenter quand le contenu des fichiers de cache change de forme
+VERSION_CACHE = 1
+
+
+def empreinte_fichier(chemin, taille_bloc=1 << 20):
+    """Empreinte BLAKE2 du contenu d'un fichier"""
+    empreinte = hashlib.blake2b(digest_size=16)
+    with open(chemin, 'rb') as fichier:
+        for bloc in iter(lambda: fichier.read(taille_bloc), b''):
+            empreinte.update(bloc)
+    return empreinte.hexdigest()
+
+
+class CachePersistant:
+    """Copies binaires (pickle) des classeurs Excel, conservées d'un lancement à l'autre.
+
+    Chaque classeur lu ou écrit est doublé d'un fichier `<dossier>/<nom>.pkl`
+    qui garde le DataFrame avec le chemin, le mtime et l'empreinte du
+    classeur. Au lancement suivant, la table est relue depuis cette copie
+    si le classeur n'a pas changé, sans passer par openpyxl. Une copie
+    périmée, d'une autre version du cache ou de pandas, ou illisible est
+    ignorée et le classeur est relu.
+    """
+
+    def __init__(self, dossier):
+        self.dossier = dossier
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _chemin_copie(self, chemin):
+        return os.path.join(self.dossier, os.path.basename(chemin) + '.pkl')
+
+    @staticmethod
+    def _cle(chemin, empreinte=None):
+        """Clé d'un classeur : version, chemin, mtime et empreinte du contenu"""
+        return {
+            'version': VERSION_CACHE,
+            'pandas': pd.__version__,
+            'chemin': os.path.abspath(chemin),
+            'mtime_ns': os.stat(chemin).st_mtime_ns,
+            'empreinte': empreinte or empreinte_fichier(chemin)
+        }
+
+    def lire(self, chemin, lecteur):
+        """Table du classeur `chemin`, depuis sa copie si elle est à jour, sinon via `lecteur`"""
+        cle = self._cle(chemin)
+        try:
+            with open(self._chemin_copie(chemin), 'rb') as fichier:
+                copie = pickle.load(fichier)
+            if copie['cle'] == cle:
+                with self._verrou:
+                    self.hits += 1
+                return copie['df']
+        except (OSError, pickle.PickleError, EOFError, AttributeError, ImportError, KeyError, TypeError):
+            pass
+        with self._verrou:
+            self.misses += 1
+        df = lecteur(chemin)
+        self.enregistrer(chemin, df, cle['empreinte'])
+        return df
+
+    def enregistrer(self, chemin, df, empreinte=None):
+        """Écrire la copie d'un classeur qui vient d'être lu ou écrit"""
+        try:
+            os.makedirs(self.dossier, exist_ok=True)
+            copie = self._chemin_copie(chemin)
+            fichier_temporaire = f"{copie}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(fichier_temporaire, 'wb') as fichier:
+                pickle.dump({'cle': self._cle(chemin, empreinte), 'df': df}, fichier,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(fichier_temporaire, copie)
+        except OSError:
+            # Le cache n'est qu'une accélération : le classeur reste la référence
+            pass
+
+    def statistiques(self):
+        with self._verrou:
+            return {'disque_hits': self.hits, 'disque_misses': self.misses}
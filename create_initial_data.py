@@ -1,5 +1,43 @@
-import pandas as pd
+"""Données de départ de l'application et jeux de données synthétiques.
+
+Sans argument, crée les fichiers Excel initiaux (2 clients, 10 produits).
+Avec des volumes, génère un historique complet et reproductible (même
+graine, mêmes données) :
+
+    python create_initial_data.py --clients 1000000 --produits 20000 --factures 2000000 [--sqlite] [--graine 42]
+"""
+import argparse
+import csv
 import os
+import random
+import sys
+from datetime import date, timedelta
+
+import pandas as pd
+from openpyxl import Workbook
+
+from tables import FICHIER_SQLITE, TABLES
+from tarification import REGLES_DEFAUT, calculer_totaux, charger_regles, ligne_facture
+
+# Nombre de lignes préparées avant chaque écriture : la mémoire ne dépend pas des volumes
+TAILLE_PAQUET = 10000
+
+# Nombre maximal de lignes de données d'une feuille Excel
+LIGNES_MAX_EXCEL = 1048575
+
+NOMS = ["Adjovi", "Agossou", "Ahouansou", "Akplogan", "Dossou", "Gbaguidi", "Houngbo", "Hounkpatin",
+        "Kpadonou", "Sossa", "Tchibozo", "Zinsou", "Amoussou", "Bio", "Chabi", "Dansou", "Fagla",
+        "Glele", "Hounsa", "Kiki", "Lawani", "Mensah", "Oloukoi", "Quenum", "Sagbo", "Yessoufou"]
+FORMES = ["Établissements", "Société", "Entreprise", "Groupe", "Cabinet", "Boutique", "Atelier", "Comptoir"]
+SUFFIXES = ["", " SARL", " SA", " & Fils", " et Frères", " Services", " Distribution"]
+
+# Familles de produits : (libellé, prix de base en FCFA)
+FAMILLES = [("Ordinateur portable", 800.0), ("Souris sans fil", 25.0), ("Clavier mécanique", 120.0),
+            ("Écran 24\"", 180.0), ("Imprimante laser", 350.0), ("Scanner", 150.0), ("Webcam HD", 80.0),
+            ("Casque audio", 95.0), ("Disque dur externe", 120.0), ("Clé USB 32GB", 15.0),
+            ("Routeur Wi-Fi", 70.0), ("Onduleur", 220.0), ("Tablette", 300.0), ("Câble HDMI", 10.0),
+            ("Cartouche d'encre", 35.0), ("Station d'accueil", 160.0)]
+GAMMES = ["Standard", "Pro", "Eco", "Plus", "Max", "Mini", "Premium", "Lite"]
 
 def create_initial_files():
     """Créer les fichiers Excel initiaux avec les données de base"""
@@ -48,5 +86,204 @@ def create_initial_files():
     print("- Produits.xlsx : 10 produits")
     print("- CartesReduction.xlsx : vide (sera rempli automatiquement)")
 
+def code_client(indice):
+    """Code du client n° `indice` d'un jeu synthétique"""
+    return f"CLI{indice + 1:07d}"
+
+
+def code_produit(indice):
+    """Code (6 caractères) du produit n° `indice` d'un jeu synthétique"""
+    chiffres = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    code = ''
+    for _ in range(5):
+        indice, reste = divmod(indice, 36)
+        code = chiffres[reste] + code
+    return 'P' + code
+
+
+def clients_synthetiques(nombre, rng):
+    """Clients réalistes : contact Gmail ou numéro de 8 chiffres, IFU de 13 chiffres"""
+    for i in range(nombre):
+        nom_famille = rng.choice(NOMS)
+        if rng.random() < 0.5:
+            contact = f"{nom_famille.lower()}.{i + 1}@gmail.com"
+        else:
+            contact = f"{rng.choice('4569')}{rng.randrange(10 ** 7):07d}"
+        yield {
+            'code_client': code_client(i),
+            'nom': f"{rng.choice(FORMES)} {nom_famille}{rng.choice(SUFFIXES)}",
+            'contact': contact,
+            'IFU': f"{rng.choice('1236')}{rng.randrange(10 ** 12):012d}"
+        }
+
+
+def produits_synthetiques(nombre, rng):
+    """Produits du catalogue, déclinés en gammes autour d'un prix de base"""
+    for i in range(nombre):
+        libelle, prix = FAMILLES[i % len(FAMILLES)]
+        yield {
+            'code_produit': code_produit(i),
+            'libelle': f"{libelle} {rng.choice(GAMMES)} {i // len(FAMILLES) + 1}",
+            'prix_unitaire': round(prix * rng.uniform(0.5, 2.0), 2)
+        }
+
+
+def historique_synthetique(nb_factures, nb_clients, catalogue, rng, debut=date(2024, 1, 1), jours=730,
+                           lignes_max=5, regles=REGLES_DEFAUT):
+    """Factures, lignes et cartes dans l'ordre chronologique, avec les règles de tarification.
+
+    Un client reçoit une carte à sa première facture au-dessus du seuil, et
+    la remise de sa carte s'applique aux factures suivantes. Produit des
+    couples (table, ligne) ; `catalogue` contient le (libellé, prix) de chaque produit.
+    """
+    taux_clients = bytearray(nb_clients)
+    nb_cartes = 0
+    for i in range(nb_factures):
+        client = rng.randrange(nb_clients)
+        jour = (debut + timedelta(days=i * jours // nb_factures)).strftime('%Y-%m-%d')
+        numero_facture = f"FACT{i + 1:03d}"
+        lignes = []
+        for indice in rng.sample(range(len(catalogue)), min(len(catalogue), rng.randint(1, lignes_max))):
+            libelle, prix = catalogue[indice]
+            produit = {'code_produit': code_produit(indice), 'libelle': libelle, 'prix_unitaire': prix}
+            lignes.append(ligne_facture(produit, rng.randint(1, 10)))
+        totaux = calculer_totaux(lignes, taux_clients[client], regles)
+        yield 'factures', dict(totaux, numero_facture=numero_facture, code_client=code_client(client),
+                               date_facture=jour)
+        for ligne in lignes:
+            yield 'lignes_factures', dict(ligne, numero_facture=numero_facture, date_facture=jour,
+                                          code_client=code_client(client))
+        if not taux_clients[client]:
+            taux = regles.taux_reduction_pour(totaux['total_ttc'])
+            if taux:
+                taux_clients[client] = taux
+                nb_cartes += 1
+                yield 'cartes', {'numero_carte': f"CARTE{nb_cartes:04d}", 'code_client': code_client(client),
+                                 'taux_reduction': taux}
+
+
+class EcrivainExcel:
+    """Écriture en flux des tables dans le dossier de données (classeurs write_only, CSV des lignes)"""
+
+    def __init__(self, dossier):
+        self.dossier = dossier
+        self._classeurs = {}
+        self._fichiers_csv = {}
+
+    def ecrire(self, table, lignes):
+        colonnes = TABLES[table]['colonnes']
+        chemin = os.path.join(self.dossier, TABLES[table]['fichier'])
+        if chemin.endswith('.csv'):
+            if table not in self._fichiers_csv:
+                fichier = open(chemin, 'w', encoding='utf-8', newline='')
+                self._fichiers_csv[table] = (fichier, csv.writer(fichier))
+                self._fichiers_csv[table][1].writerow(colonnes)
+            self._fichiers_csv[table][1].writerows([ligne[colonne] for colonne in colonnes] for ligne in lignes)
+            return
+        if table not in self._classeurs:
+            classeur = Workbook(write_only=True)
+            feuille = classeur.create_sheet()
+            feuille.append(colonnes)
+            self._classeurs[table] = (classeur, feuille, chemin)
+        feuille = self._classeurs[table][1]
+        for ligne in lignes:
+            feuille.append([ligne[colonne] for colonne in colonnes])
+
+    def fermer(self):
+        for classeur, _, chemin in self._classeurs.values():
+            classeur.save(chemin)
+        for fichier, _ in self._fichiers_csv.values():
+            fichier.close()
+
+
+class EcrivainSQLite:
+    """Écriture des tables dans la base SQLite, un paquet par transaction"""
+
+    def __init__(self, chemin):
+        from stockage_sqlite import StockageSQLite
+        self.stockage = StockageSQLite(chemin)
+
+    def ecrire(self, table, lignes):
+        self.stockage.ajouter(table, lignes)
+
+    def fermer(self):
+        self.stockage.fermer()
+
+
+def generer_donnees(nb_clients, nb_produits, nb_factures, dossier='data', sqlite=False, graine=42,
+                    lignes_max=5, rapport=print):
+    """Générer un jeu de données complet et reproductible ; retourne le nombre de lignes par table"""
+    if not sqlite and max(nb_clients, nb_produits, nb_factures) > LIGNES_MAX_EXCEL:
+        raise ValueError(f"Plus de {LIGNES_MAX_EXCEL} lignes ne tiennent pas dans un classeur : utiliser --sqlite")
+    if not os.path.exists(dossier):
+        os.makedirs(dossier)
+    cibles = [os.path.join(dossier, FICHIER_SQLITE)] if sqlite else \
+        [os.path.join(dossier, definition['fichier']) for definition in TABLES.values()]
+    for cible in cibles:
+        if os.path.exists(cible):
+            raise FileExistsError(f"{cible} existe déjà : choisir un dossier vide")
+
+    rng = random.Random(graine)
+    ecrivain = EcrivainSQLite(cibles[0]) if sqlite else EcrivainExcel(dossier)
+    nombres = {table: 0 for table in TABLES}
+    paquets = {table: [] for table in TABLES}
+
+    def ajouter(table, ligne):
+        paquets[table].append(ligne)
+        if len(paquets[table]) >= TAILLE_PAQUET:
+            vider(table)
+
+    def vider(table):
+        ecrivain.ecrire(table, paquets[table])
+        nombres[table] += len(paquets[table])
+        paquets[table] = []
+
+    try:
+        for ligne in clients_synthetiques(nb_clients, rng):
+            ajouter('clients', ligne)
+        catalogue = []
+        for ligne in produits_synthetiques(nb_produits, rng):
+            catalogue.append((ligne['libelle'], ligne['prix_unitaire']))
+            ajouter('produits', ligne)
+        factures = 0
+        for table, ligne in historique_synthetique(nb_factures, nb_clients, catalogue, rng, lignes_max=lignes_max,
+                                                   regles=charger_regles(dossier)):
+            ajouter(table, ligne)
+            if table == 'factures':
+                factures += 1
+                if factures % 100000 == 0:
+                    rapport(f"   {factures}/{nb_factures} factures")
+        for table in TABLES:
+            vider(table)
+    finally:
+        ecrivain.fermer()
+    return nombres
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Créer les données de départ ou un jeu synthétique")
+    parser.add_argument('--clients', type=int, help="nombre de clients à générer")
+    parser.add_argument('--produits', type=int, default=1000)
+    parser.add_argument('--factures', type=int, default=0)
+    parser.add_argument('--lignes-max', type=int, default=5, help="produits au plus par facture")
+    parser.add_argument('--graine', type=int, default=42)
+    parser.add_argument('--dossier', default='data')
+    parser.add_argument('--sqlite', action='store_true', help="écrire dans data/facturation.db au lieu des classeurs")
+    args = parser.parse_args()
+
+    if args.clients is None:
+        create_initial_files()
+        return
+    print(f"🚀 Génération de {args.clients} clients, {args.produits} produits et {args.factures} factures...")
+    try:
+        nombres = generer_donnees(args.clients, args.produits, args.factures, args.dossier, args.sqlite,
+                                  args.graine, args.lignes_max)
+    except (ValueError, FileExistsError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    for table, nombre in nombres.items():
+        print(f"- {TABLES[table]['fichier'] if not args.sqlite else table} : {nombre} ligne(s)")
+
+
 if __name__ == "__main__":
-    create_initial_files() 
\ No newline at end of file
+    main() 
\ No newline at end of file
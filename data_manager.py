@@ -1,38 +1,51 @@
+import re
 import pandas as pd
-import os
+import agregats_ventes
 from datetime import datetime
+from stockage import ouvrir_stockage
+from numerotation import NumeroteurFactures
+from rapports import RapportVentes
+from analyse_produits import AnalyseProduits
+from session_vente import SessionVente
+from recherche_produits import IndexProduits
+from tarification import charger_regles
 
 class DataManager:
-    def __init__(self):
+    def __init__(self, stockage=None, numeroteur=None):
         self.data_folder = 'data'
-        self.clients_file = os.path.join(self.data_folder, 'Clients.xlsx')
-        self.produits_file = os.path.join(self.data_folder, 'Produits.xlsx')
-        self.cartes_file = os.path.join(self.data_folder, 'CartesReduction.xlsx')
-        self.factures_file = os.path.join(self.data_folder, 'Factures.xlsx')
+        # Classeurs Excel par défaut, base SQLite si elle a été migrée (voir stockage.py)
+        self.stockage = stockage if stockage is not None else ouvrir_stockage(self.data_folder)
+        self.numeroteur = numeroteur if numeroteur is not None else NumeroteurFactures(self.stockage)
+        # Taux de TVA et paliers des cartes du dossier du stockage (voir tarification.py), passés
+        # explicitement aux calculs : deux gestionnaires d'un même processus gardent chacun les leurs
+        self.regles = charger_regles(self.stockage.data_folder)
+        # Index de recherche des produits, construit à la première recherche
+        self._index_produits = None
+        self._produits_indexes = None
         
         # Créer le fichier des factures s'il n'existe pas
         self.init_factures_file()
     
     def init_factures_file(self):
         """Initialiser le fichier des factures s'il n'existe pas"""
-        if not os.path.exists(self.factures_file):
-            factures_data = {
-                'numero_facture': [],
-                'code_client': [],
-                'date_facture': [],
-                'total_ht': [],
-                'remise': [],
-                'total_ht_remise': [],
-                'tva': [],
-                'total_ttc': []
-            }
-            df_factures = pd.DataFrame(factures_data)
-            df_factures.to_excel(self.factures_file, index=False)
+        self.stockage.initialiser()
+    
+    def transaction(self):
+        """Regrouper des écritures (facture, carte, client) validées ensemble"""
+        return self.stockage.transaction()
+    
+    def session(self):
+        """Session de vente : client, facture et carte préparés puis enregistrés ensemble (voir session_vente.py)"""
+        return SessionVente(self)
+    
+    def statistiques_cache(self):
+        """Obtenir les compteurs du cache des tables"""
+        return self.stockage.statistiques_cache()
     
     def charger_clients(self):
         """Charger les données des clients"""
         try:
-            return pd.read_excel(self.clients_file)
+            return self.stockage.charger('clients')
         except FileNotFoundError:
             print("Erreur: Fichier Clients.xlsx non trouvé")
             return pd.DataFrame()
@@ -40,7 +53,7 @@ class DataManager:
     def charger_produits(self):
         """Charger les données des produits"""
         try:
-            return pd.read_excel(self.produits_file)
+            return self.stockage.charger('produits')
         except FileNotFoundError:
             print("Erreur: Fichier Produits.xlsx non trouvé")
             return pd.DataFrame()
@@ -48,37 +61,66 @@ class DataManager:
     def charger_cartes(self):
         """Charger les données des cartes de réduction"""
         try:
-            return pd.read_excel(self.cartes_file)
+            return self.stockage.charger('cartes')
         except FileNotFoundError:
             # Créer le fichier s'il n'existe pas
-            cartes_data = {
-                'numero_carte': [],
-                'code_client': [],
-                'taux_reduction': []
-            }
-            df_cartes = pd.DataFrame(cartes_data)
-            df_cartes.to_excel(self.cartes_file, index=False)
-            return df_cartes
+            self.stockage.creer('cartes')
+            return self.stockage.charger('cartes')
     
     def charger_factures(self):
         """Charger les données des factures"""
         try:
-            return pd.read_excel(self.factures_file)
+            return self.stockage.charger('factures')
         except FileNotFoundError:
             return pd.DataFrame()
     
-    def ajouter_client(self, code_client, nom, contact, ifu):
-        """Ajouter un nouveau client"""
-        df_clients = self.charger_clients()
-        
+    def charger_lignes_factures(self):
+        """Charger les lignes (produits) de toutes les factures"""
+        try:
+            return self.stockage.charger('lignes_factures')
+        except FileNotFoundError:
+            return pd.DataFrame()
+    
+    def parcourir(self, table, tri=None, prefixe=None, decroissant=False):
+        """Lignes d'une table une à une, pour un affichage page par page (voir Stockage.parcourir)"""
+        return self.stockage.parcourir(table, tri, prefixe, decroissant)
+    
+    def compacter_factures(self):
+        """Replier les journaux des tables (factures, clients, produits, cartes) dans leurs classeurs (sans effet en SQLite)"""
+        return self.stockage.compacter()
+    
+    def verifier_contact(self, contact):
+        """Vérifier le contact saisi au clavier (email Gmail ou numéro) ; retourne (succès, message).
+
+        Règle de la saisie interactive seulement : les clients existants, l'import
+        et le service HTTP gardent tout contact (par exemple contact@abc.com).
+        """
+        if '@' in contact:
+            # Vérification email stricte : uniquement gmail.com
+            if not re.match(r"^[a-zA-Z0-9_.+-]+@gmail\.com$", contact):
+                return False, "L'email doit être au format nom@gmail.com (Gmail uniquement)"
+        elif not (contact.isdigit() and len(contact) >= 8):
+            return False, "Le numéro doit contenir uniquement des chiffres (au moins 8)"
+        return True, ""
+    
+    def verifier_client(self, code_client, ifu):
+        """Vérifier qu'un nouveau client peut être ajouté ; retourne (succès, message)"""
         # Vérifier si le code client existe déjà
-        if code_client in df_clients['code_client'].values:
+        if self.stockage.existe('clients', code_client):
             return False, "Ce code client existe déjà"
         
         # Vérifier la longueur de l'IFU
         if len(ifu) != 13:
             return False, "L'IFU doit contenir exactement 13 caractères"
         
+        return True, ""
+    
+    def ajouter_client(self, code_client, nom, contact, ifu):
+        """Ajouter un nouveau client"""
+        valide, message = self.verifier_client(code_client, ifu)
+        if not valide:
+            return False, message
+        
         # Ajouter le nouveau client
         nouveau_client = {
             'code_client': code_client,
@@ -87,17 +129,14 @@ class DataManager:
             'IFU': ifu
         }
         
-        df_clients = pd.concat([df_clients, pd.DataFrame([nouveau_client])], ignore_index=True)
-        df_clients.to_excel(self.clients_file, index=False)
+        self.stockage.ajouter('clients', [nouveau_client])
         
         return True, "Client ajouté avec succès"
     
     def ajouter_produit(self, code_produit, libelle, prix_unitaire):
         """Ajouter un nouveau produit"""
-        df_produits = self.charger_produits()
-        
         # Vérifier si le code produit existe déjà
-        if code_produit in df_produits['code_produit'].values:
+        if self.stockage.existe('produits', code_produit):
             return False, "Ce code produit existe déjà"
         
         # Vérifier la longueur du code produit
@@ -119,116 +158,150 @@ class DataManager:
             'prix_unitaire': prix
         }
         
-        df_produits = pd.concat([df_produits, pd.DataFrame([nouveau_produit])], ignore_index=True)
-        df_produits.to_excel(self.produits_file, index=False)
+        self.stockage.ajouter('produits', [nouveau_produit])
+        if self._index_produits is not None:
+            self._index_produits.ajouter([nouveau_produit])
         
         return True, "Produit ajouté avec succès"
     
     def obtenir_client(self, code_client):
         """Obtenir les informations d'un client"""
-        df_clients = self.charger_clients()
-        client = df_clients[df_clients['code_client'] == code_client]
-        
-        if client.empty:
-            return None
-        
-        return client.iloc[0].to_dict()
+        return self.stockage.obtenir('clients', code_client)
     
     def obtenir_produit(self, code_produit):
         """Obtenir les informations d'un produit"""
-        df_produits = self.charger_produits()
-        produit = df_produits[df_produits['code_produit'] == code_produit]
-        
-        if produit.empty:
-            return None
-        
-        return produit.iloc[0].to_dict()
+        return self.stockage.obtenir('produits', code_produit)
+    
+    def rechercher_produits(self, requete, nombre=10):
+        """Produits les plus proches d'une saisie partielle (code ou mots du libellé, accents ignorés)"""
+        produits = self.charger_produits()
+        if produits is not self._produits_indexes:
+            # Table rechargée : les produits sont ajoutés en fin de table, seuls les nouveaux sont indexés
+            deja_lus = len(self._produits_indexes) if self._produits_indexes is not None else 0
+            if self._index_produits is None or len(produits) < deja_lus:
+                self._index_produits = IndexProduits(produits)
+            else:
+                self._index_produits.ajouter(produits.iloc[deja_lus:])
+            self._produits_indexes = produits
+        return self._index_produits.rechercher(requete, nombre)
     
     def obtenir_carte_client(self, code_client):
         """Obtenir la carte de réduction d'un client"""
-        df_cartes = self.charger_cartes()
-        carte = df_cartes[df_cartes['code_client'] == code_client]
-        
-        if carte.empty:
-            return None
-        
-        return carte.iloc[0].to_dict()
+        # Le fichier des cartes est créé par init_factures_file : simple lecture d'index
+        return self.stockage.obtenir('cartes', code_client)
     
     def creer_carte_reduction(self, code_client, total_facture):
         """Créer une carte de réduction basée sur le montant de la facture"""
-        df_cartes = self.charger_cartes()
-        
-        # Vérifier si le client a déjà une carte
-        if code_client in df_cartes['code_client'].values:
-            return None
-        
-        # Définir les plages de réduction
-        if total_facture >= 10000:
-            taux_reduction = 15
-        elif total_facture >= 5000:
-            taux_reduction = 10
-        elif total_facture >= 2000:
-            taux_reduction = 5
-        else:
-            return None  # Pas de carte pour les petites factures
-        
-        # Générer un numéro de carte unique
-        numero_carte = f"CARTE{len(df_cartes) + 1:04d}"
-        
-        # Ajouter la nouvelle carte
-        nouvelle_carte = {
-            'numero_carte': numero_carte,
-            'code_client': code_client,
-            'taux_reduction': taux_reduction
-        }
-        
-        df_cartes = pd.concat([df_cartes, pd.DataFrame([nouvelle_carte])], ignore_index=True)
-        df_cartes.to_excel(self.cartes_file, index=False)
-        
-        return nouvelle_carte
+        return self.creer_cartes_reduction([(code_client, total_facture)])[0]
     
-    def enregistrer_facture(self, numero_facture, code_client, total_ht, remise, total_ht_remise, tva, total_ttc):
-        """Enregistrer une nouvelle facture"""
-        df_factures = self.charger_factures()
-        
-        nouvelle_facture = pd.DataFrame([{
+    def creer_cartes_reduction(self, demandes):
+        """Créer les cartes dues pour des couples (code client, montant TTC) ; None pour chaque carte non due.
+        
+        Les numéros sont réservés en un bloc et les cartes ajoutées en une fois.
+        """
+        dues = {}
+        for i, (code_client, total_facture) in enumerate(demandes):
+            # Définir les plages de réduction (voir tarification.py)
+            taux_reduction = self.regles.taux_reduction_pour(total_facture)
+            # Pas de carte pour les petites factures ni pour un client qui en a déjà une
+            if taux_reduction is None or code_client in dues or self.stockage.existe('cartes', code_client):
+                continue
+            dues[code_client] = (i, taux_reduction)
+        
+        cartes = [None] * len(demandes)
+        if not dues:
+            return cartes
+        # Numéros de carte uniques, tirés d'une séquence partagée par les terminaux
+        numeros = self.allouer_numeros_cartes(len(dues))
+        for numero_carte, (code_client, (i, taux_reduction)) in zip(numeros, dues.items()):
+            cartes[i] = {
+                'numero_carte': numero_carte,
+                'code_client': code_client,
+                'taux_reduction': taux_reduction
+            }
+        self.stockage.ajouter('cartes', [carte for carte in cartes if carte is not None])
+        return cartes
+    
+    def allouer_numeros_cartes(self, nombre):
+        """Réserver d'un coup `nombre` numéros de carte consécutifs"""
+        premier = self.stockage.incrementer_sequence('cartes', nombre, lambda: self.stockage.compter('cartes'))
+        return [f"CARTE{numero:04d}" for numero in range(premier, premier + nombre)]
+    
+    def enregistrer_facture(self, numero_facture, code_client, total_ht, remise, total_ht_remise, tva, total_ttc,
+                            produits_factures=None):
+        """Enregistrer une nouvelle facture et, si elles sont fournies, ses lignes"""
+        nouvelle_facture = {
             'numero_facture': numero_facture,
             'code_client': code_client,
             'date_facture': datetime.now().strftime('%Y-%m-%d'),
-            'total_ht': total_ht,
-            'remise': remise,
-            'total_ht_remise': total_ht_remise,
-            'tva': tva,
-            'total_ttc': total_ttc
-        }])
-        
-        df_factures = pd.concat([df_factures, nouvelle_facture], ignore_index=True)
-        df_factures.to_excel(self.factures_file, index=False)
+            'total_ht': float(total_ht),
+            'remise': float(remise),
+            'total_ht_remise': float(total_ht_remise),
+            'tva': float(tva),
+            'total_ttc': float(total_ttc)
+        }
+        if not produits_factures:
+            self.stockage.ajouter('factures', [nouvelle_facture])
+            return
+        lignes = [{
+            'numero_facture': numero_facture,
+            'date_facture': nouvelle_facture['date_facture'],
+            'code_client': code_client,
+            'code_produit': produit['code_produit'],
+            'libelle': produit['libelle'],
+            'prix_unitaire': float(produit['prix_unitaire']),
+            'quantite': int(produit['quantite']),
+            'total_ht': float(produit['total_ht'])
+        } for produit in produits_factures]
+        with self.stockage.transaction():
+            self.stockage.ajouter('factures', [nouvelle_facture])
+            self.stockage.ajouter('lignes_factures', lignes)
     
     def obtenir_prochain_numero_facture(self):
-        """Obtenir le prochain numéro de facture"""
-        df_factures = self.charger_factures()
-        
-        if df_factures.empty:
-            return "FACT001"
-        
-        # Extraire les numéros existants
-        numeros_existants = df_factures['numero_facture'].tolist()
-        
-        # Trouver le prochain numéro
-        for i in range(1, 1000):
-            numero_candidat = f"FACT{i:03d}"
-            if numero_candidat not in numeros_existants:
-                return numero_candidat
-        
-        return f"FACT{len(numeros_existants) + 1:03d}"
+        """Obtenir le prochain numéro de facture (réservé, il ne sera pas réattribué)"""
+        return self.numeroteur.allouer()[0]
+    
+    def allouer_numeros_factures(self, nombre):
+        """Réserver d'un coup `nombre` numéros de facture consécutifs"""
+        return self.numeroteur.allouer(nombre)
+    
+    def rapport_ventes(self, debut=None, fin=None):
+        """Rapports de chiffre d'affaires (par client, mois, remise) sur une période"""
+        return RapportVentes(self.charger_factures(), self.charger_clients(), debut, fin)
+    
+    def analyse_produits(self, debut=None, fin=None):
+        """Analyses par produit (top produits, chiffre d'affaires, tendance des quantités) sur une période"""
+        return AnalyseProduits(self.charger_lignes_factures(), debut, fin)
+    
+    def simuler_tarification(self, regles):
+        """Tout l'historique des factures recalculé avec d'autres règles (voir simulation_tarification.py)"""
+        from simulation_tarification import SimulationTarification
+
+        return SimulationTarification(self.charger_factures(), regles, self.charger_clients(), self.charger_cartes())
+    
+    def obtenir_agregats_ventes(self, details=True):
+        """Obtenir les agrégats des ventes (totaux globaux, par client et par jour)"""
+        agregats = self.stockage.lire_agregats(details)
+        if agregats is None:
+            # Première utilisation : calcul unique depuis l'historique
+            agregats = self.reconstruire_agregats_ventes()
+        return agregats
+    
+    def reconstruire_agregats_ventes(self):
+        """Recalculer les agrégats des ventes depuis tout l'historique des factures"""
+        return self.stockage.reconstruire_agregats()
+    
+    def verifier_agregats_ventes(self):
+        """Comparer les agrégats tenus à jour avec un recalcul complet (liste des écarts)"""
+        attendus = agregats_ventes.calculer(self.charger_factures())
+        return agregats_ventes.comparer(attendus, self.obtenir_agregats_ventes())
     
     def obtenir_statistiques_ventes(self):
         """Obtenir des statistiques sur les ventes"""
-        df_factures = self.charger_factures()
-        df_produits = self.charger_produits()
+        agregats = self.obtenir_agregats_ventes(details=False)
+        nombre = agregats['nombre_factures']
         
-        if df_factures.empty:
+        if nombre == 0:
             return {
                 'total_factures': 0,
                 'chiffre_affaires_total': 0,
@@ -237,10 +310,10 @@ class DataManager:
             }
         
         stats = {
-            'total_factures': len(df_factures),
-            'chiffre_affaires_total': df_factures['total_ttc'].sum(),
-            'moyenne_facture': df_factures['total_ttc'].mean(),
-            'facture_plus_elevee': df_factures['total_ttc'].max()
+            'total_factures': nombre,
+            'chiffre_affaires_total': agregats['chiffre_affaires_total'],
+            'moyenne_facture': agregats['chiffre_affaires_total'] / nombre,
+            'facture_plus_elevee': agregats['facture_plus_elevee']
         }
         
-        return stats 
\ No newline at end of file
+        return stats
@@ -0,0 +1,329 @@
+"""Facturation par lot, sans saisie, à partir d'un fichier de commandes.
+
+Formats acceptés :
+- CSV (séparateur , ; ou tabulation) avec les colonnes code_client,
+  code_produit, quantite et, en option, commande. Les lignes d'une même
+  commande (ou, sans colonne commande, d'un même client) forment une facture.
+- JSONL : une commande par ligne,
+  {"commande": "...", "code_client": "...", "produits": [{"code_produit": "...", "quantite": 2}]}
+
+Usage : python facturation_lot.py commandes.csv [--processus 4] [--sans-pdf] [--recueil 500]
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from data_manager import DataManager
+from file_rendu import FileRendu
+from instrumentation import activer, activer_si_demande, mesures
+from tarification import calculer_totaux, ligne_facture
+
+# Générateur PDF propre à chaque processus de rendu
+_generateur = None
+
+
+def _initialiser_processus():
+    """Créer le générateur PDF une seule fois par processus de rendu"""
+    global _generateur
+    from facture_generator import FactureGenerator
+    _generateur = FactureGenerator()
+
+
+def _rendre(tache):
+    """Rendre la facture d'une commande et, le cas échéant, la carte créée ; retourne (fichiers, erreur)"""
+    try:
+        fichiers = [_generateur.generer_facture(
+            tache['numero_facture'], tache['client'], tache['produits'],
+            tache['total_ht'], tache['remise'], tache['total_ht_remise'], tache['tva'], tache['total_ttc'],
+            taux_tva=tache['taux_tva']
+        )]
+        if tache['carte']:
+            fichiers.append(_generateur.generer_carte_reduction(tache['client'], tache['carte']))
+    except Exception as e:
+        return [], str(e)
+    return fichiers, None
+
+
+def _rendre_recueil(travail):
+    """Rendre une tranche de factures dans un seul PDF (ou les cartes du lot) ; retourne (fichiers, erreur)"""
+    nom, type_travail, taches = travail
+    try:
+        if type_travail == 'cartes':
+            index = _generateur.generer_recueil_cartes([(tache['client'], tache['carte']) for tache in taches], nom)
+        else:
+            index = _generateur.generer_recueil_factures([dict(
+                tache, client_info=tache['client'], produits_factures=tache['produits']
+            ) for tache in taches], nom)
+    except Exception as e:
+        return [], str(e)
+    return sorted({entree['fichier'] for entree in index.values()}), None
+
+
+def lire_commandes(chemin):
+    """Lire un fichier de commandes CSV ou JSONL (selon l'extension)"""
+    if chemin.lower().endswith(('.jsonl', '.json')):
+        commandes = []
+        with open(chemin, 'r', encoding='utf-8') as fichier:
+            for numero_ligne, ligne in enumerate(fichier, 1):
+                if not ligne.strip():
+                    continue
+                commande = json.loads(ligne)
+                commandes.append({
+                    'commande': str(commande.get('commande', numero_ligne)),
+                    'code_client': commande['code_client'],
+                    'lignes': [(p['code_produit'], p['quantite']) for p in commande['produits']]
+                })
+        return commandes
+
+    commandes = {}
+    with open(chemin, 'r', encoding='utf-8-sig', newline='') as fichier:
+        dialecte = csv.Sniffer().sniff(fichier.read(4096), delimiters=',;\t')
+        fichier.seek(0)
+        for ligne in csv.DictReader(fichier, dialect=dialecte):
+            cle = ligne.get('commande') or ligne['code_client']
+            commande = commandes.setdefault(cle, {
+                'commande': cle,
+                'code_client': ligne['code_client'],
+                'lignes': []
+            })
+            commande['lignes'].append((ligne['code_produit'], ligne['quantite']))
+    return list(commandes.values())
+
+
+class FacturationLot:
+    """Facturation d'une liste de commandes avec les règles de la saisie interactive.
+
+    Les commandes invalides (client ou produit inconnu, quantité incorrecte)
+    sont écartées et signalées. Les numéros de factures et de cartes sont
+    réservés en un bloc, et les factures et cartes sont écrites en une
+    seule transaction. Les PDF sont ensuite rendus par un pool de
+    processus, hors transaction : le stockage n'est pas bloqué pendant le
+    rendu. Un PDF qui n'a pas pu être rendu est signalé et confié à la file
+    de rendu (data/rendus_en_attente), qui le reprend au prochain lancement
+    de l'application. Avec `taille_recueil`, les factures sont rassemblées
+    par tranches dans des PDF uniques (avec index des pages) au lieu d'un
+    fichier par facture.
+    """
+
+    def __init__(self, data_manager=None, processus=None, rendre_pdf=True, taille_recueil=None):
+        self.data_manager = data_manager if data_manager is not None else DataManager()
+        self.processus = processus or os.cpu_count() or 1
+        self.rendre_pdf = rendre_pdf
+        self.taille_recueil = taille_recueil
+
+    def valider(self, commandes):
+        """Séparer les commandes facturables des commandes rejetées"""
+        valides = []
+        rejets = []
+        for commande in commandes:
+            client = self.data_manager.obtenir_client(commande['code_client'])
+            if not client:
+                rejets.append((commande['commande'], f"client inconnu : {commande['code_client']}"))
+                continue
+            produits_factures = []
+            for code_produit, quantite in commande['lignes']:
+                produit = self.data_manager.obtenir_produit(str(code_produit).strip().upper())
+                if not produit:
+                    rejets.append((commande['commande'], f"produit inconnu : {code_produit}"))
+                    break
+                try:
+                    quantite = int(quantite)
+                except (TypeError, ValueError):
+                    quantite = 0
+                if quantite <= 0:
+                    rejets.append((commande['commande'], f"quantité invalide pour {code_produit}"))
+                    break
+                produits_factures.append(ligne_facture(produit, quantite))
+            else:
+                if produits_factures:
+                    valides.append((commande, client, produits_factures))
+                else:
+                    rejets.append((commande['commande'], "aucun produit"))
+        return valides, rejets
+
+    def executer(self, commandes, rapport=print):
+        """Facturer les commandes et retourner un résumé de l'exécution"""
+        debut = time.perf_counter()
+        valides, rejets = self.valider(commandes)
+        for commande, motif in rejets:
+            rapport(f"❌ Commande {commande} rejetée : {motif}")
+        numeros = self.data_manager.allouer_numeros_factures(len(valides)) if valides else []
+
+        taches = []
+        # Taux des cartes dues à des factures du lot : elles s'appliquent aux factures suivantes
+        cartes_lot = {}
+        with self.data_manager.transaction():
+            for (commande, client, produits_factures), numero_facture in zip(valides, numeros):
+                taches.append(self._facturer(numero_facture, client, produits_factures, cartes_lot))
+            # Cartes du lot créées en une fois (numéros réservés en un bloc)
+            avec_carte = [tache for tache in taches if tache['carte']]
+            cartes = self.data_manager.creer_cartes_reduction(
+                [(tache['client']['code_client'], tache['total_ttc']) for tache in avec_carte])
+            for tache, carte in zip(avec_carte, cartes):
+                tache['carte'] = carte
+            fin_preparation = time.perf_counter()
+        fin_ecriture = time.perf_counter()
+        rapport(f"📋 {len(taches)} facture(s) enregistrée(s) en {fin_ecriture - debut:.2f} s")
+
+        # Rendu après l'écriture : aucune transaction ni verrou du stockage n'est tenu pendant le rendu
+        fichiers = []
+        echecs = []
+        if self.rendre_pdf and taches and self.taille_recueil:
+            fichiers, echecs = self._rendre_recueils(taches, rapport)
+        elif self.rendre_pdf and taches:
+            fichiers, echecs = self._rendre_tout(taches, rapport)
+        if echecs:
+            self._reporter_rendus(echecs, rapport)
+        fin = time.perf_counter()
+
+        resume = {
+            'factures': len(taches),
+            'rejets': len(rejets),
+            'cartes_creees': sum(1 for tache in taches if tache['carte']),
+            'chiffre_affaires': sum(tache['total_ttc'] for tache in taches),
+            'fichiers_pdf': len(fichiers),
+            'rendus_reportes': len(echecs),
+            'duree_preparation': fin_preparation - debut,
+            'duree_ecriture': fin_ecriture - fin_preparation,
+            'duree_rendu': fin - fin_ecriture,
+            'duree_totale': fin - debut
+        }
+        resume['factures_par_seconde'] = len(taches) / resume['duree_totale'] if resume['duree_totale'] else 0
+        return resume
+
+    def _facturer(self, numero_facture, client, produits_factures, cartes_lot):
+        """Enregistrer une facture (en attente dans la transaction) et préparer son rendu.
+
+        'carte' vaut True dans la tâche retournée si la facture doit créer
+        une carte : executer() les crée ensuite toutes ensemble.
+        """
+        regles = self.data_manager.regles
+        code_client = client['code_client']
+        # Les cartes dues plus tôt dans le lot sont vues ici, comme en saisie interactive
+        taux_carte = cartes_lot.get(code_client)
+        if taux_carte is None:
+            carte_client = self.data_manager.obtenir_carte_client(code_client)
+            taux_carte = carte_client['taux_reduction'] if carte_client else 0
+        totaux = calculer_totaux(produits_factures, taux_carte, regles)
+        self.data_manager.enregistrer_facture(
+            numero_facture, code_client, totaux['total_ht'], totaux['remise'],
+            totaux['total_ht_remise'], totaux['tva'], totaux['total_ttc'], produits_factures
+        )
+        carte_due = not taux_carte and totaux['total_ttc'] >= regles.seuil_carte
+        if carte_due:
+            cartes_lot[code_client] = regles.taux_reduction_pour(totaux['total_ttc'])
+        return dict(totaux, numero_facture=numero_facture, client=client, produits=produits_factures,
+                    carte=carte_due, taux_tva=regles.taux_tva)
+
+    def _reporter_rendus(self, travaux, rapport):
+        """Confier à la file de rendu les PDF ('facture' ou 'carte', tâche) qui n'ont pas pu être rendus.
+
+        Ils sont repris au prochain lancement de l'application.
+        """
+        file_rendu = FileRendu(os.path.join(self.data_manager.stockage.data_folder, 'rendus_en_attente'))
+        os.makedirs(file_rendu.dossier_travaux, exist_ok=True)
+        for type_travail, tache in travaux:
+            if type_travail == 'facture':
+                file_rendu.preparer_facture(tache['numero_facture'], tache['client'], tache['produits'],
+                                            tache['total_ht'], tache['remise'], tache['total_ht_remise'],
+                                            tache['tva'], tache['total_ttc'], tache['taux_tva'])
+            else:
+                file_rendu.preparer_carte(tache['client'], tache['carte'])
+        rapport(f"⚠️ {len(travaux)} PDF non rendu(s) : reportés dans {file_rendu.dossier_travaux}")
+
+    def _rendre_tout(self, taches, rapport):
+        """Rendre les PDF dans un pool de processus en affichant la progression ; retourne (fichiers, échecs)"""
+        fichiers = []
+        echecs = []
+        debut = time.perf_counter()
+        pas = max(1, len(taches) // 20)
+        taille_paquet = max(1, len(taches) // (self.processus * 8))
+        with ProcessPoolExecutor(max_workers=self.processus, initializer=_initialiser_processus) as pool:
+            for fait, (tache, (fichiers_tache, erreur)) in enumerate(
+                    zip(taches, pool.map(_rendre, taches, chunksize=taille_paquet)), 1):
+                fichiers.extend(fichiers_tache)
+                if erreur is not None:
+                    rapport(f"❌ Facture {tache['numero_facture']} : {erreur}")
+                    echecs.append(('facture', tache))
+                    if tache['carte']:
+                        echecs.append(('carte', tache))
+                if fait % pas == 0 or fait == len(taches):
+                    ecoule = time.perf_counter() - debut
+                    rapport(f"🖨️  {fait}/{len(taches)} PDF rendus ({fait / ecoule:.1f} factures/s)")
+        return fichiers, echecs
+
+    def _rendre_recueils(self, taches, rapport):
+        """Rendre les factures par tranches de `taille_recueil`, une tranche par processus ; retourne (fichiers, échecs)"""
+        nom = f"Lot_{time.strftime('%Y%m%d_%H%M%S')}"
+        travaux = [(f"{nom}_{debut // self.taille_recueil + 1:03d}", 'factures',
+                    taches[debut:debut + self.taille_recueil])
+                   for debut in range(0, len(taches), self.taille_recueil)]
+        cartes = [tache for tache in taches if tache['carte']]
+        if cartes:
+            travaux.append((f"{nom}_cartes", 'cartes', cartes))
+        fichiers = []
+        echecs = []
+        fait = 0
+        debut = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.processus, initializer=_initialiser_processus) as pool:
+            for (nom_recueil, type_travail, taches_recueil), (fichiers_recueil, erreur) in zip(
+                    travaux, pool.map(_rendre_recueil, travaux)):
+                fichiers.extend(fichiers_recueil)
+                if erreur is not None:
+                    rapport(f"❌ Recueil {nom_recueil} : {erreur}")
+                    # Factures (ou cartes) de la tranche reprises une à une par la file de rendu
+                    echecs.extend(('facture' if type_travail == 'factures' else 'carte', tache)
+                                  for tache in taches_recueil)
+                if type_travail == 'factures':
+                    fait += len(taches_recueil)
+                    ecoule = time.perf_counter() - debut
+                    rapport(f"🖨️  {fait}/{len(taches)} factures rassemblées ({fait / ecoule:.1f} factures/s)")
+        return fichiers, echecs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Facturation par lot à partir d'un fichier de commandes")
+    parser.add_argument('fichier', help="commandes au format CSV ou JSONL")
+    parser.add_argument('--processus', type=int, default=None, help="nombre de processus de rendu PDF")
+    parser.add_argument('--sans-pdf', action='store_true', help="enregistrer les factures sans rendre les PDF")
+    parser.add_argument('--recueil', type=int, default=None, metavar='N',
+                        help="rassembler les factures dans des PDF de N factures au lieu d'un PDF par facture")
+    parser.add_argument('--mesures', metavar='FICHIER',
+                        help="écrire les mesures de performance (JSON, ou Prometheus si .prom) ; "
+                             "les processus de rendu ne sont pas mesurés")
+    args = parser.parse_args()
+    if args.mesures:
+        activer()
+    else:
+        activer_si_demande()
+
+    commandes = lire_commandes(args.fichier)
+    print(f"🚀 Facturation de {len(commandes)} commande(s)...")
+    lot = FacturationLot(processus=args.processus, rendre_pdf=not args.sans_pdf, taille_recueil=args.recueil)
+    resume = lot.executer(commandes)
+
+    print("\n" + "=" * 50)
+    print(f"Factures créées : {resume['factures']}")
+    print(f"Commandes rejetées : {resume['rejets']}")
+    print(f"Cartes de réduction créées : {resume['cartes_creees']}")
+    print(f"Chiffre d'affaires : {resume['chiffre_affaires']:.2f} FCFA")
+    print(f"Préparation : {resume['duree_preparation']:.2f} s")
+    print(f"Écriture : {resume['duree_ecriture']:.2f} s")
+    print(f"Rendu PDF : {resume['duree_rendu']:.2f} s ({resume['fichiers_pdf']} fichier(s))")
+    if resume['rendus_reportes']:
+        print(f"Rendus reportés : {resume['rendus_reportes']} PDF, repris au prochain lancement")
+    print(f"Débit : {resume['factures_par_seconde']:.1f} factures/s")
+    print("=" * 50)
+    if args.mesures:
+        if args.mesures.endswith('.prom'):
+            mesures.exporter_prometheus(args.mesures)
+        else:
+            mesures.exporter_json(args.mesures)
+        print(f"📊 Mesures écrites dans {args.mesures}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,350 @@
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Flowable
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab import rl_config
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas as pdf_canvas
+import functools
+import json
 import os
+import threading
 from datetime import datetime
+from itertools import islice
+from montant_lettres import nombre_en_lettres
+from tarification import TAUX_TVA, libelle_tva
+from verrou import ecrire_atomiquement
+
+
+class SansAscii85:
+    """Flux PDF compressés sans encodage ASCII85, le temps des rendus de ce module seulement.
+
+    rl_config.useA85 est un réglage global de reportlab : il est mis à 0 à
+    l'entrée du premier rendu en cours puis rétabli à la sortie du dernier
+    (les workers de rendu en parallèle partagent le compteur), sans toucher
+    aux PDF produits ailleurs dans le processus.
+    """
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._en_cours = 0
+        self._reglage = None
+
+    def __enter__(self):
+        with self._verrou:
+            if self._en_cours == 0:
+                self._reglage = rl_config.useA85
+                rl_config.useA85 = 0
+            self._en_cours += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._verrou:
+            self._en_cours -= 1
+            if self._en_cours == 0:
+                rl_config.useA85 = self._reglage
+
+
+# Flux PDF compressés sans encodage ASCII85 : fichiers 10 % plus petits et rendu plus rapide
+sans_ascii85 = SansAscii85()
+
+
+def _rendu_sans_ascii85(methode):
+    """Rendre un document sous sans_ascii85"""
+    @functools.wraps(methode)
+    def rendre(*args, **kwargs):
+        with sans_ascii85:
+            return methode(*args, **kwargs)
+    return rendre
+
+# Colonnes du tableau des produits et lignes des totaux qui le terminent
+EN_TETE_PRODUITS = ['N°', 'Code Produit', 'Libellé', 'P.U.', 'Qté', 'Total HT']
+LARGEURS_PRODUITS = [0.7*inch, 1.3*inch, 2.7*inch, 1*inch, 0.8*inch, 1.2*inch]
+NB_LIGNES_TOTAUX = 5
+LIGNES_MINIMUM = 3
+
+# Format carte bancaire : 85.6mm x 53.98mm en points (1mm = 2.83465 points)
+FORMAT_CARTE = (85.6 * 2.83465, 53.98 * 2.83465)
+
+# Au-delà de ce nombre de lignes, la facture est rendue page par page (FactureFlux)
+SEUIL_RENDU_FLUX = 300
+
+
+def libelles_totaux(taux_tva):
+    """Libellés des lignes de totaux, avec le taux de TVA appliqué à la facture"""
+    return ['Total HT', 'Remise', 'THT remise', libelle_tva(taux_tva), 'Total TTC']
+
+
+class ModeleFacture:
+    """Partie fixe d'une facture PDF, construite une seule fois par générateur.
+
+    Styles des tableaux, largeurs de colonnes et mise en page sont préparés
+    à la création ; remplir() n'ajoute que les données de la facture. Les
+    lignes des totaux sont repérées depuis la fin du tableau (indices
+    négatifs) : le même style sert quel que soit le nombre de produits.
+    Les éléments fixes (en-tête du jour, intertitres) sont réutilisés d'une
+    facture à l'autre : un modèle ne doit servir qu'à un thread à la fois.
+    """
+
+    def __init__(self, styles):
+        self.style_entete = styles['HeaderInfo']
+        self.style_client = styles['ClientInfo']
+        self.style_titre = styles['CustomTitle']
+        self.style_total = styles['TotalStyle']
+        self.mise_en_page = dict(pagesize=A4, topMargin=1*inch, bottomMargin=1*inch,
+                                 leftMargin=0.5*inch, rightMargin=0.5*inch)
+        self.largeurs_entete = [4*inch, 3*inch]
+        self.table_style_entete = TableStyle([
+            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ])
+        debut_totaux = -NB_LIGNES_TOTAUX
+        self.table_style_produits = TableStyle([
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            # Totaux à droite
+            ('ALIGN', (4, debut_totaux), (5, -1), 'RIGHT'),
+            ('FONTNAME', (4, debut_totaux), (4, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (5, debut_totaux), (5, -1), 'Helvetica'),
+            ('BACKGROUND', (4, -1), (5, -1), colors.lightgrey),
+            ('FONTNAME', (4, -1), (5, -1), 'Helvetica-Bold'),
+        ])
+        self.ligne_vide = ['', '', '', '', '', '']
+        self.titre_client = Paragraph("<b>INFORMATIONS DU CLIENT</b>", self.style_client)
+        self._entete = (None, None)
+
+    def entete(self, nom_groupe):
+        """En-tête (nom du groupe à gauche, date à droite), reconstruit seulement si le groupe ou le jour change"""
+        cle = (nom_groupe, datetime.now().strftime('%d/%m/%Y'))
+        if self._entete[0] != cle:
+            entete = Table([[Paragraph(f"<b>{cle[0]}</b>", self.style_entete),
+                             Paragraph(f"Date d'émission : {cle[1]}", self.style_entete)]],
+                           colWidths=self.largeurs_entete)
+            entete.setStyle(self.table_style_entete)
+            self._entete = (cle, entete)
+        return self._entete[1]
+
+    def remplir(self, numero_facture, client_info, produits_factures, total_ht, remise, total_ht_remise,
+                tva, total_ttc, total_en_lettres, nom_groupe, taux_tva=TAUX_TVA):
+        """Story (liste de flowables) d'une facture"""
+        story = [
+            self.entete(nom_groupe),
+            Spacer(1, 20),
+            # Informations du client
+            self.titre_client,
+            Paragraph(f"Code client : {client_info['code_client']}", self.style_client),
+            Paragraph(f"Nom : {client_info['nom']}", self.style_client),
+            Paragraph(f"Contact : {client_info['contact']}", self.style_client),
+            Paragraph(f"IFU : {client_info['IFU']}", self.style_client),
+            Spacer(1, 30),
+            # Titre centré : FACTURE n° XXXXXX
+            Paragraph(f"FACTURE n° {numero_facture}", self.style_titre),
+            Spacer(1, 30)
+        ]
+        # Tableau des produits suivi des totaux (collés à droite, même largeur)
+        lignes = [EN_TETE_PRODUITS]
+        lignes.extend([str(i), produit['code_produit'], produit['libelle'], f"{produit['prix_unitaire']:.2f}",
+                       str(produit['quantite']), f"{produit['total_ht']:.2f}"]
+                      for i, produit in enumerate(produits_factures, 1))
+        # Ajout de lignes vides pour l'esthétique si moins de 3 produits
+        lignes.extend([self.ligne_vide] * (LIGNES_MINIMUM - len(produits_factures)))
+        for libelle, montant in zip(libelles_totaux(taux_tva), (total_ht, remise, total_ht_remise, tva, total_ttc)):
+            lignes.append(['', '', '', '', libelle, f"{montant:.2f}"])
+        tableau = Table(lignes, colWidths=LARGEURS_PRODUITS)
+        tableau.setStyle(self.table_style_produits)
+        story.append(tableau)
+        story.append(Spacer(1, 40))
+        # Bas de page : "Arrêtée, la présente facture à la somme de : [Total TTC en lettres]" en italique
+        story.append(Paragraph(
+            f"<i>Arrêtée, la présente facture à la somme de : {total_en_lettres}</i>",
+            self.style_total
+        ))
+        return story
+
+
+class FactureFlux:
+    """Rendu page par page des factures de plusieurs milliers de lignes.
+
+    Les lignes sont dessinées directement sur le canevas au fil de
+    l'itération de `produits_factures` (une liste ou un générateur) : ni
+    story ni tableau géant en mémoire. Chaque page répète l'en-tête du
+    tableau, se termine par le sous-total à reporter et la suivante
+    commence par ce report. Le rendu reprend les polices, largeurs et
+    couleurs du tableau de ModeleFacture. Comme lui, il ne doit servir qu'à
+    un thread à la fois.
+    """
+
+    hauteur_ligne = 18
+    police = ('Helvetica', 10)
+    marge_cellule = 6
+
+    def __init__(self, styles):
+        self.style_total = styles['TotalStyle']
+        self.largeur_page, self.hauteur_page = A4
+        self.haut = self.hauteur_page - 1*inch
+        self.bas = 1*inch
+        # Tableau centré sur la page, comme dans le rendu platypus
+        self.x0 = (self.largeur_page - sum(LARGEURS_PRODUITS)) / 2
+        self.colonnes = [self.x0]
+        for largeur in LARGEURS_PRODUITS:
+            self.colonnes.append(self.colonnes[-1] + largeur)
+        self._libelles_ajustes = {}
+
+    def rendre(self, filename, numero_facture, client_info, produits_factures, total_ht, remise,
+               total_ht_remise, tva, total_ttc, total_en_lettres, nom_groupe, taux_tva=TAUX_TVA):
+        """Écrire le PDF de la facture dans `filename`"""
+        c = pdf_canvas.Canvas(filename, pagesize=A4)
+        self.page = 1
+        y = self.premiere_page(c, numero_facture, client_info, nom_groupe)
+        y = self.ouvrir_tableau(c, y)
+        sous_total = 0.0
+        nombre = 0
+        for nombre, produit in enumerate(produits_factures, 1):
+            # Place pour la ligne et le sous-total à reporter
+            if y - 2 * self.hauteur_ligne < self.bas:
+                y = self.changer_page(c, y, numero_facture, sous_total)
+            self.ligne(y, (str(nombre), produit['code_produit'], self.ajuster(produit['libelle']),
+                           f"{produit['prix_unitaire']:.2f}", str(produit['quantite']),
+                           f"{produit['total_ht']:.2f}"))
+            sous_total += produit['total_ht']
+            y -= self.hauteur_ligne
+        for _ in range(LIGNES_MINIMUM - nombre):
+            self.ligne(y, ())
+            y -= self.hauteur_ligne
+        # Totaux et montant en lettres : sur une nouvelle page s'ils ne tiennent plus
+        paragraphe = Paragraph(f"<i>Arrêtée, la présente facture à la somme de : {total_en_lettres}</i>",
+                               self.style_total)
+        _, hauteur_lettres = paragraphe.wrap(self.largeur_page - 1*inch, self.hauteur_page)
+        if y - NB_LIGNES_TOTAUX * self.hauteur_ligne - 40 - hauteur_lettres < self.bas:
+            y = self.changer_page(c, y, numero_facture, sous_total)
+        montants = (total_ht, remise, total_ht_remise, tva, total_ttc)
+        for i, (libelle, montant) in enumerate(zip(libelles_totaux(taux_tva), montants), 1):
+            self.ligne_total(c, y, libelle, f"{montant:.2f}", derniere=i == NB_LIGNES_TOTAUX)
+            y -= self.hauteur_ligne
+        self.fermer_tableau(c, y)
+        paragraphe.drawOn(c, 0.5*inch, y - 40 - hauteur_lettres)
+        c.save()
+        return filename
+
+    def premiere_page(self, c, numero_facture, client_info, nom_groupe):
+        """En-tête, informations du client et titre ; retourne l'ordonnée du tableau"""
+        y = self.haut
+        c.setFont('Helvetica-Bold', 10)
+        c.drawString(0.5*inch, y - 10, nom_groupe)
+        c.setFont('Helvetica', 10)
+        c.drawRightString(self.largeur_page - 0.5*inch, y - 10,
+                          f"Date d'émission : {datetime.now().strftime('%d/%m/%Y')}")
+        y -= 40
+        c.setFont('Helvetica-Bold', 11)
+        c.drawString(0.5*inch, y - 11, "INFORMATIONS DU CLIENT")
+        c.setFont('Helvetica', 11)
+        for ligne in ("Code client : {code_client}", "Nom : {nom}", "Contact : {contact}", "IFU : {IFU}"):
+            y -= 21
+            c.drawString(0.5*inch, y - 11, ligne.format(**client_info))
+        y -= 60
+        c.setFont('Helvetica-Bold', 18)
+        c.drawCentredString(self.largeur_page / 2, y - 18, f"FACTURE n° {numero_facture}")
+        return y - 60
+
+    def changer_page(self, c, y, numero_facture, sous_total):
+        """Clore la page sur le sous-total, ouvrir la suivante sur le report"""
+        self.ligne_total(c, y, "À reporter", f"{sous_total:.2f}")
+        self.fermer_tableau(c, y - self.hauteur_ligne)
+        c.showPage()
+        self.page += 1
+        c.setFont('Helvetica-Bold', 11)
+        c.drawString(0.5*inch, self.haut - 11, f"FACTURE n° {numero_facture} (suite)")
+        y = self.ouvrir_tableau(c, self.haut - 30)
+        self.ligne_total(c, y, "Report", f"{sous_total:.2f}")
+        return y - self.hauteur_ligne
+
+    def ouvrir_tableau(self, c, y):
+        """Dessiner l'en-tête du tableau et préparer le texte de la page ; retourne l'ordonnée suivante"""
+        c.setFillColor(colors.grey)
+        c.rect(self.x0, y - self.hauteur_ligne, self.colonnes[-1] - self.x0, self.hauteur_ligne, stroke=0, fill=1)
+        c.setFillColor(colors.whitesmoke)
+        c.setFont('Helvetica-Bold', 11)
+        for gauche, droite, texte in zip(self.colonnes, self.colonnes[1:], EN_TETE_PRODUITS):
+            c.drawCentredString((gauche + droite) / 2, y - 13, texte)
+        c.setFillColor(colors.black)
+        # Texte et bordures des lignes sont cumulés puis écrits une fois par page
+        self._haut_tableau = y
+        self._traits = [y]
+        self._bordures_totaux = []
+        self._texte = c.beginText()
+        self._texte.setFont(*self.police)
+        return y - self.hauteur_ligne
+
+    def fermer_tableau(self, c, y):
+        """Écrire le texte et les bordures de la page, jusqu'à l'ordonnée `y`"""
+        c.drawText(self._texte)
+        self._traits.append(y)
+        c.setLineWidth(1)
+        gauche, droite = self.x0, self.colonnes[-1]
+        traits = [(gauche, t, droite, t) for t in self._traits]
+        # Colonnes sur toute la hauteur des lignes de produits, puis sur les lignes de totaux
+        fin_produits = self._bordures_totaux[0] if self._bordures_totaux else y
+        traits.extend((x, self._haut_tableau, x, fin_produits) for x in self.colonnes)
+        for haut in self._bordures_totaux:
+            traits.extend((x, haut, x, haut - self.hauteur_ligne) for x in self.colonnes)
+        c.lines(traits)
+        c.setFont('Helvetica', 8)
+        c.drawCentredString(self.largeur_page / 2, 0.5*inch, f"Page {self.page}")
+
+    def ligne(self, y, cellules):
+        """Ligne de produit, textes alignés à gauche"""
+        texte = self._texte
+        for gauche, cellule in zip(self.colonnes, cellules):
+            texte.setTextOrigin(gauche + self.marge_cellule, y - 13)
+            texte.textOut(cellule)
+        self._traits.append(y - self.hauteur_ligne)
+
+    def ligne_total(self, c, y, libelle, montant, derniere=False):
+        """Ligne des totaux : libellé et montant à droite dans les deux dernières colonnes"""
+        if derniere:
+            gauche = self.colonnes[4]
+            c.setFillColor(colors.lightgrey)
+            c.rect(gauche, y - self.hauteur_ligne, self.colonnes[-1] - gauche, self.hauteur_ligne, stroke=0, fill=1)
+            c.setFillColor(colors.black)
+        texte = self._texte
+        for droite, valeur, police in ((self.colonnes[5], libelle, 'Helvetica-Bold'),
+                                       (self.colonnes[6], montant, 'Helvetica-Bold' if derniere else 'Helvetica')):
+            texte.setFont(police, 10)
+            texte.setTextOrigin(droite - self.marge_cellule - stringWidth(valeur, police, 10), y - 13)
+            texte.textOut(valeur)
+        texte.setFont(*self.police)
+        self._traits.append(y - self.hauteur_ligne)
+        self._bordures_totaux.append(y)
+
+    def ajuster(self, libelle):
+        """Libellé tronqué à la largeur de sa colonne (mémorisé : les libellés se répètent)"""
+        texte = self._libelles_ajustes.get(libelle)
+        if texte is None:
+            largeur = LARGEURS_PRODUITS[2] - 2 * self.marge_cellule
+            texte = libelle
+            if stringWidth(texte, *self.police) > largeur:
+                while texte and stringWidth(texte + '…', *self.police) > largeur:
+                    texte = texte[:-1]
+                texte += '…'
+            if len(self._libelles_ajustes) < 100000:
+                self._libelles_ajustes[libelle] = texte
+        return texte
+
 
 class FactureGenerator:
     def __init__(self):
         self.styles = getSampleStyleSheet()
         self.setup_custom_styles()
+        self.modele_facture = ModeleFacture(self.styles)
+        self.facture_flux = FactureFlux(self.styles)
     
     def setup_custom_styles(self):
         """Configuration des styles personnalisés"""
@@ -47,169 +381,46 @@ class FactureGenerator:
     
     def nombre_en_lettres(self, nombre):
         """Convertit un nombre entier en lettres (français, jusqu'à plusieurs milliards)"""
-        if nombre == 0:
-            return "zéro franc CFA"
-        unite = ["", "un", "deux", "trois", "quatre", "cinq", "six", "sept", "huit", "neuf"]
-        dizaine = ["", "dix", "vingt", "trente", "quarante", "cinquante", "soixante", "soixante-dix", "quatre-vingt", "quatre-vingt-dix"]
-        def convert_hundred(n):
-            if n == 0:
-                return ""
-            elif n < 10:
-                return unite[n]
-            elif n < 20:
-                return ["dix", "onze", "douze", "treize", "quatorze", "quinze", "seize", "dix-sept", "dix-huit", "dix-neuf"][n-10]
-            elif n < 100:
-                d, u = divmod(n, 10)
-                sep = " et " if u == 1 and d not in [8] else "-" if u > 0 else ""
-                if d == 7 or d == 9:
-                    return dizaine[d-1] + sep + convert_hundred(10+u)
-                else:
-                    return dizaine[d] + (sep + unite[u] if u else "")
-            else:
-                c, r = divmod(n, 100)
-                cent = "cent" if c == 1 else unite[c] + " cent"
-                if r == 0:
-                    return cent + ("s" if c > 1 else "")
-                else:
-                    return cent + " " + convert_hundred(r)
-        def group(n, singular, plural):
-            if n == 0:
-                return ""
-            elif n == 1:
-                return singular
-            else:
-                return convert_number(n) + " " + plural
-        def convert_number(n):
-            if n < 1000:
-                return convert_hundred(n)
-            elif n < 1000000:
-                mille, r = divmod(n, 1000)
-                prefix = "mille" if mille == 1 else convert_hundred(mille) + " mille"
-                if r == 0:
-                    return prefix
-                else:
-                    return prefix + " " + convert_hundred(r) if r < 1000 else prefix + " " + convert_number(r)
-            elif n < 1000000000:
-                million, r = divmod(n, 1000000)
-                prefix = group(million, "un million", "millions")
-                if r == 0:
-                    return prefix
-                else:
-                    return prefix + " " + convert_number(r)
-            else:
-                milliard, r = divmod(n, 1000000000)
-                prefix = group(milliard, "un milliard", "milliards")
-                if r == 0:
-                    return prefix
-                else:
-                    return prefix + " " + convert_number(r)
-        lettres = convert_number(int(nombre)).strip()
-        if not lettres.endswith("francs CFA"):
-            lettres += " francs CFA"
-        return lettres
+        return nombre_en_lettres(nombre)
     
-    def generer_facture(self, numero_facture, client_info, produits_factures, total_ht, remise, total_ht_remise, tva, total_ttc, nom_groupe="Groupe d'Étudiants"):
-        """Générer une facture en PDF selon le format demandé"""
-        import copy
+    @_rendu_sans_ascii85
+    def generer_facture(self, numero_facture, client_info, produits_factures, total_ht, remise, total_ht_remise, tva, total_ttc, nom_groupe="Groupe d'Étudiants",
+                        taux_tva=TAUX_TVA):
+        """Générer une facture en PDF selon le format demandé (`taux_tva` : celui des règles appliquées)"""
         # Créer le dossier factures s'il n'existe pas
         if not os.path.exists('factures'):
             os.makedirs('factures')
         
         filename = f"factures/Facture_{numero_facture}.pdf"
-        doc = SimpleDocTemplate(filename, pagesize=A4, topMargin=1*inch, bottomMargin=1*inch, leftMargin=0.5*inch, rightMargin=0.5*inch)
-        story = []
-        
-        # En-tête : nom du groupe à gauche, date à droite
-        header_data = [
-            [Paragraph(f"<b>{nom_groupe}</b>", self.styles['HeaderInfo']), 
-             Paragraph(f"Date d'émission : {datetime.now().strftime('%d/%m/%Y')}", self.styles['HeaderInfo'])]
-        ]
-        header_table = Table(header_data, colWidths=[4*inch, 3*inch])
-        header_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ]))
-        story.append(header_table)
-        story.append(Spacer(1, 20))
-        # Informations du client
-        client_info_data = [
-            [Paragraph("<b>INFORMATIONS DU CLIENT</b>", self.styles['ClientInfo'])],
-            [Paragraph(f"Code client : {client_info['code_client']}", self.styles['ClientInfo'])],
-            [Paragraph(f"Nom : {client_info['nom']}", self.styles['ClientInfo'])],
-            [Paragraph(f"Contact : {client_info['contact']}", self.styles['ClientInfo'])],
-            [Paragraph(f"IFU : {client_info['IFU']}", self.styles['ClientInfo'])]
-        ]
-        for info in client_info_data:
-            story.append(Paragraph(info[0].text, self.styles['ClientInfo']))
-        story.append(Spacer(1, 30))
-        # Titre centré : FACTURE n° XXXXXX
-        story.append(Paragraph(f"FACTURE n° {numero_facture}", self.styles['CustomTitle']))
-        story.append(Spacer(1, 30))
-        # Tableau des produits avec les colonnes exactes demandées
-        table_data = [['N°', 'Code Produit', 'Libellé', 'P.U.', 'Qté', 'Total HT']]
-        for i, produit in enumerate(produits_factures, 1):
-            table_data.append([
-                str(i),
-                produit['code_produit'],
-                produit['libelle'],
-                f"{produit['prix_unitaire']:.2f}",
-                str(produit['quantite']),
-                f"{produit['total_ht']:.2f}"
-            ])
-        # Ajout de lignes vides pour l'esthétique si moins de 3 produits
-        while len(table_data) < 4:
-            table_data.append(['', '', '', '', '', ''])
-        # Tableau des totaux (collé à droite, même largeur que le tableau des produits)
-        totaux_data = [
-            ['', '', '', '', 'Total HT', f"{total_ht:.2f}"],
-            ['', '', '', '', 'Remise', f"{remise:.2f}"],
-            ['', '', '', '', 'THT remise', f"{total_ht_remise:.2f}"],
-            ['', '', '', '', 'TVA (18%)', f"{tva:.2f}"],
-            ['', '', '', '', 'Total TTC', f"{total_ttc:.2f}"]
-        ]
-        # Fusionner les deux tableaux pour avoir le rendu du modèle
-        full_table_data = copy.deepcopy(table_data) + totaux_data
-        table = Table(full_table_data, colWidths=[0.7*inch, 1.3*inch, 2.7*inch, 1*inch, 0.8*inch, 1.2*inch])
-        table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            # Totaux à droite
-            ('ALIGN', (4, len(table_data)), (4, -1), 'RIGHT'),
-            ('ALIGN', (5, len(table_data)), (5, -1), 'RIGHT'),
-            ('FONTNAME', (4, len(table_data)), (4, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (5, len(table_data)), (5, -1), 'Helvetica'),
-            ('BACKGROUND', (4, -1), (5, -1), colors.lightgrey),
-            ('FONTNAME', (4, -1), (5, -1), 'Helvetica-Bold'),
-        ]))
-        story.append(table)
-        story.append(Spacer(1, 40))
-        # Bas de page : "Arrêtée, la présente facture à la somme de : [Total TTC en lettres]" en italique
-        total_en_lettres = self.nombre_en_lettres(int(total_ttc))
-        story.append(Paragraph(
-            f"<i>Arrêtée, la présente facture à la somme de : {total_en_lettres}</i>", 
-            self.styles['TotalStyle']
-        ))
+        if not hasattr(produits_factures, '__len__') or len(produits_factures) > SEUIL_RENDU_FLUX:
+            # Grosses factures : rendu page par page, sans tableau en mémoire
+            return self.facture_flux.rendre(
+                filename, numero_facture, client_info, produits_factures, total_ht, remise, total_ht_remise,
+                tva, total_ttc, self.nombre_en_lettres(int(total_ttc)), nom_groupe, taux_tva
+            )
+        story = self.modele_facture.remplir(
+            numero_facture, client_info, produits_factures, total_ht, remise, total_ht_remise, tva, total_ttc,
+            self.nombre_en_lettres(int(total_ttc)), nom_groupe, taux_tva
+        )
         # Générer le PDF
-        doc.build(story)
+        SimpleDocTemplate(filename, **self.modele_facture.mise_en_page).build(story)
         return filename 
 
+    @_rendu_sans_ascii85
     def generer_carte_reduction(self, client_info, carte_info, nom_groupe="Groupe d'Étudiants"):
         """Générer une carte de réduction en PDF pour le client"""
-        from reportlab.pdfgen import canvas
-        from datetime import datetime
-        # Format carte bancaire : 85.6mm x 53.98mm en points (1mm = 2.83465 points)
-        width, height = 85.6 * 2.83465, 53.98 * 2.83465
         # Créer le dossier cartes s'il n'existe pas
         if not os.path.exists('cartes'):
             os.makedirs('cartes')
         filename = f"cartes/Carte_{carte_info['numero_carte']}.pdf"
-        c = canvas.Canvas(filename, pagesize=(width, height))
+        c = pdf_canvas.Canvas(filename, pagesize=FORMAT_CARTE)
+        self.dessiner_carte(c, client_info, carte_info, nom_groupe)
+        c.save()
+        return filename
+
+    def dessiner_carte(self, c, client_info, carte_info, nom_groupe):
+        """Dessiner une carte de réduction sur la page courante du canevas"""
+        width, height = FORMAT_CARTE
         # Fond
         c.setFillColorRGB(0.95, 0.95, 1)
         c.rect(0, 0, width, height, fill=1, stroke=0)
@@ -231,5 +442,101 @@ class FactureGenerator:
         c.setFont("Helvetica-Oblique", 7)
         c.setFillColorRGB(0.3, 0.3, 0.3)
         c.drawString(10, 10, "Valable sur toutes les prochaines factures, non cumulable.")
-        c.save()
-        return filename 
\ No newline at end of file
+
+    @_rendu_sans_ascii85
+    def generer_recueil_factures(self, factures, nom='Recueil_factures', par_fichier=None,
+                                 nom_groupe="Groupe d'Étudiants"):
+        """Rassembler des factures dans un PDF (ou un PDF par tranche de `par_fichier` factures).
+
+        `factures` contient des dict avec les arguments de generer_facture. Chaque
+        facture commence sur une nouvelle page ; retourne l'index
+        {numero_facture: {'fichier', 'page', 'pages'}}, aussi écrit dans
+        factures/<nom>.index.json.
+        """
+        if not os.path.exists('factures'):
+            os.makedirs('factures')
+        index = {}
+        for numero_lot, lot in enumerate(_tranches(factures, par_fichier), 1):
+            filename = _nom_recueil('factures', nom, numero_lot, par_fichier)
+            story = []
+            reperes = []
+            for facture in lot:
+                if story:
+                    story.append(PageBreak())
+                reperes.append(RepereFacture(facture['numero_facture']))
+                story.append(reperes[-1])
+                story.extend(self.modele_facture.remplir(
+                    facture['numero_facture'], facture['client_info'], facture['produits_factures'],
+                    facture['total_ht'], facture['remise'], facture['total_ht_remise'], facture['tva'],
+                    facture['total_ttc'], self.nombre_en_lettres(int(facture['total_ttc'])), nom_groupe,
+                    facture.get('taux_tva', TAUX_TVA)
+                ))
+            doc = SimpleDocTemplate(filename, **self.modele_facture.mise_en_page)
+            doc.build(story)
+            # Une facture s'étend jusqu'au début de la suivante (ou la dernière page du fichier)
+            fins = [repere.page - 1 for repere in reperes[1:]] + [doc.page]
+            for repere, fin in zip(reperes, fins):
+                index[repere.numero_facture] = {'fichier': filename, 'page': repere.page,
+                                                'pages': fin - repere.page + 1}
+        _ecrire_index(os.path.join('factures', f"{nom}.index.json"), index)
+        return index
+
+    @_rendu_sans_ascii85
+    def generer_recueil_cartes(self, cartes, nom='Recueil_cartes', par_fichier=None,
+                               nom_groupe="Groupe d'Étudiants"):
+        """Rassembler des cartes de réduction, une par page, dans un ou plusieurs PDF.
+
+        `cartes` contient des couples (client_info, carte_info) ; retourne l'index
+        {numero_carte: {'fichier', 'page', 'pages'}}, aussi écrit dans
+        cartes/<nom>.index.json.
+        """
+        if not os.path.exists('cartes'):
+            os.makedirs('cartes')
+        index = {}
+        for numero_lot, lot in enumerate(_tranches(cartes, par_fichier), 1):
+            filename = _nom_recueil('cartes', nom, numero_lot, par_fichier)
+            c = pdf_canvas.Canvas(filename, pagesize=FORMAT_CARTE)
+            for client_info, carte_info in lot:
+                self.dessiner_carte(c, client_info, carte_info, nom_groupe)
+                index[carte_info['numero_carte']] = {'fichier': filename, 'page': c.getPageNumber(), 'pages': 1}
+                c.showPage()
+            c.save()
+        _ecrire_index(os.path.join('cartes', f"{nom}.index.json"), index)
+        return index
+
+
+class RepereFacture(Flowable):
+    """Élément invisible placé en tête d'une facture d'un recueil : retient sa page"""
+
+    def __init__(self, numero_facture):
+        super().__init__()
+        self.numero_facture = numero_facture
+        self.page = None
+
+    def wrap(self, largeur, hauteur):
+        return 0, 0
+
+    def draw(self):
+        self.page = self.canv.getPageNumber()
+
+
+def _tranches(elements, taille):
+    """Découper un itérable en listes de `taille` éléments (une seule liste si taille est None)"""
+    elements = iter(elements)
+    while True:
+        tranche = list(islice(elements, taille)) if taille else list(elements)
+        if not tranche:
+            return
+        yield tranche
+        if not taille:
+            return
+
+
+def _nom_recueil(dossier, nom, numero_lot, par_fichier):
+    if par_fichier:
+        return f"{dossier}/{nom}_{numero_lot:03d}.pdf"
+    return f"{dossier}/{nom}.pdf"
+
+
+def _ecrire_index(chemin, index):
+    ecrire_atomiquement(chemin, json.dumps(index, ensure_ascii=False, indent=1))
@@ -0,0 +1,322 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+import webbrowser
+
+from tarification import TAUX_TVA
+from verrou import VerrouFichier, ecrire_atomiquement
+
+
+class FilePleine(Exception):
+    """La file de rendu a atteint sa capacité"""
+
+
+def valeur_json(valeur):
+    """Convertir les scalaires numpy/pandas pour json.dumps"""
+    if hasattr(valeur, 'item'):
+        return valeur.item()
+    return str(valeur)
+
+
+class FileRendu:
+    """Rendu des PDF (factures, cartes) en arrière-plan.
+
+    Chaque travail est d'abord enregistré dans `dossier_travaux`, puis placé
+    dans une file bornée traitée par un pool de threads. Le fichier du
+    travail n'est supprimé qu'une fois le PDF écrit : les travaux laissés
+    en plan par un arrêt brutal sont repris au démarrage suivant. Un rendu
+    qui échoue est retenté `tentatives` fois avant d'être marqué en échec.
+
+    Le dossier est partagé par les caisses : une fois démarrée, chaque file
+    range ses travaux dans son propre sous-dossier, verrouillé tant qu'elle
+    tourne. Au démarrage, elle s'approprie par renommage les travaux sans
+    propriétaire (déposés à la racine, par exemple par la facturation par
+    lot) et ceux des caisses arrêtées ; une caisse en service ne rend donc
+    jamais les travaux d'une autre.
+    """
+
+    def __init__(self, dossier_travaux=os.path.join('data', 'rendus_en_attente'), nb_workers=2,
+                 taille_max=100, tentatives=3, ouvrir=True, fabrique_generateur=None):
+        self.dossier_travaux = dossier_travaux
+        # Créé d'emblée : un travail peut être préparé avant demarrer() (il est alors déposé à la racine)
+        os.makedirs(dossier_travaux, exist_ok=True)
+        self.nb_workers = nb_workers
+        self.tentatives = tentatives
+        self.ouvrir = ouvrir
+        self.fabrique_generateur = fabrique_generateur
+        self._file = queue.Queue(maxsize=taille_max)
+        self._travaux = {}
+        self._verrou = threading.Lock()
+        self._workers = []
+        # Sous-dossier propre à cette file et son verrou, pris par demarrer()
+        self._dossier_propre = None
+        self._verrou_dossier = None
+
+    def demarrer(self):
+        """Lancer les workers et reprendre les travaux restés en attente (ceux d'aucune caisse en service)"""
+        dossier_propre = os.path.join(self.dossier_travaux, f"caisse_{os.getpid()}_{uuid.uuid4().hex[:8]}")
+        # Verrou pris avant de créer le sous-dossier : une autre caisse ne le croit jamais abandonné
+        self._verrou_dossier = VerrouFichier(dossier_propre)
+        self._verrou_dossier.acquerir()
+        os.makedirs(dossier_propre)
+        self._dossier_propre = dossier_propre
+        for _ in range(self.nb_workers):
+            worker = threading.Thread(target=self._travailler, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        repris = 0
+        for nom in self._reprendre_travaux():
+            with open(os.path.join(dossier_propre, nom), 'r', encoding='utf-8') as fichier:
+                travail = json.load(fichier)
+            self._enfiler(travail, bloquer=True)
+            repris += 1
+        return repris
+
+    def _reprendre_travaux(self):
+        """Déplacer dans le sous-dossier propre les travaux sans caisse en service ; retourne leurs noms"""
+        repris = self._deplacer_travaux(self.dossier_travaux)
+        for nom in os.listdir(self.dossier_travaux):
+            dossier = os.path.join(self.dossier_travaux, nom)
+            if dossier == self._dossier_propre or not os.path.isdir(dossier):
+                continue
+            verrou = VerrouFichier(dossier)
+            # Verrou libre : la caisse propriétaire est arrêtée
+            if not verrou.essayer():
+                continue
+            try:
+                repris += self._deplacer_travaux(dossier)
+                try:
+                    os.rmdir(dossier)
+                except OSError:
+                    pass
+            finally:
+                # Le fichier .lock reste en place (comme dans verrou.py) : le supprimer laisserait
+                # une autre caisse verrouiller un nouveau fichier pendant qu'on tient encore l'ancien
+                verrou.liberer()
+        return sorted(repris)
+
+    def _deplacer_travaux(self, dossier):
+        """Renommer les travaux de `dossier` dans le sous-dossier propre ; un travail pris entre-temps est ignoré"""
+        deplaces = []
+        try:
+            noms = os.listdir(dossier)
+        except FileNotFoundError:
+            return deplaces
+        for nom in noms:
+            if not nom.endswith('.json'):
+                continue
+            try:
+                os.rename(os.path.join(dossier, nom), os.path.join(self._dossier_propre, nom))
+            except FileNotFoundError:
+                continue
+            deplaces.append(nom)
+        return deplaces
+
+    def soumettre_facture(self, numero_facture, client_info, produits_factures,
+                          total_ht, remise, total_ht_remise, tva, total_ttc, taux_tva=TAUX_TVA):
+        """Demander le rendu d'une facture"""
+        travail = self.preparer_facture(numero_facture, client_info, produits_factures,
+                                        total_ht, remise, total_ht_remise, tva, total_ttc, taux_tva)
+        self.lancer([travail])
+        return travail['id']
+
+    def soumettre_carte(self, client_info, carte_info):
+        """Demander le rendu d'une carte de réduction"""
+        travail = self.preparer_carte(client_info, carte_info)
+        self.lancer([travail])
+        return travail['id']
+
+    def preparer_facture(self, numero_facture, client_info, produits_factures,
+                         total_ht, remise, total_ht_remise, tva, total_ttc, taux_tva=TAUX_TVA):
+        """Enregistrer sur disque le rendu d'une facture, sans le lancer (voir lancer/abandonner)"""
+        return self._preparer(f"facture_{numero_facture}", 'facture', {
+            'numero_facture': numero_facture,
+            'client_info': client_info,
+            'produits_factures': produits_factures,
+            'total_ht': total_ht,
+            'remise': remise,
+            'total_ht_remise': total_ht_remise,
+            'tva': tva,
+            'total_ttc': total_ttc,
+            'taux_tva': taux_tva
+        })
+
+    def preparer_carte(self, client_info, carte_info):
+        """Enregistrer sur disque le rendu d'une carte, sans le lancer"""
+        return self._preparer(f"carte_{carte_info['numero_carte']}", 'carte', {
+            'client_info': client_info,
+            'carte_info': carte_info
+        })
+
+    def _preparer(self, identifiant, type_travail, donnees):
+        """Enregistrer le travail sur disque ; retourne le travail tel qu'il sera relu"""
+        travail = {'id': identifiant, 'type': type_travail, 'donnees': donnees}
+        contenu = json.dumps(travail, ensure_ascii=False, default=valeur_json)
+        ecrire_atomiquement(self._chemin(identifiant), contenu)
+        return json.loads(contenu)
+
+    def lancer(self, travaux):
+        """Placer des travaux préparés dans la file ; FilePleine si l'un d'eux n'a pas pu y entrer"""
+        erreur = None
+        for travail in travaux:
+            try:
+                self._enfiler(travail, bloquer=False)
+            except FilePleine as e:
+                erreur = e
+        if erreur is not None:
+            raise erreur
+
+    def abandonner(self, travaux):
+        """Supprimer des travaux préparés qui ne seront pas lancés"""
+        for travail in travaux:
+            try:
+                os.remove(self._chemin(travail['id']))
+            except FileNotFoundError:
+                pass
+
+    def _enfiler(self, travail, bloquer):
+        """Placer un travail dans la file ; FilePleine si elle est saturée"""
+        with self._verrou:
+            self._travaux[travail['id']] = {
+                'id': travail['id'],
+                'type': travail['type'],
+                'statut': 'en attente',
+                'tentatives': 0,
+                'erreur': None,
+                'fichier': None
+            }
+        try:
+            self._file.put(travail, block=bloquer, timeout=None if bloquer else 0)
+        except queue.Full:
+            # Le travail reste sur disque : il sera repris au prochain démarrage
+            self._mettre_a_jour(travail['id'], statut='reporté')
+            raise FilePleine(f"File de rendu pleine ({self._file.maxsize} travaux)")
+
+    def _chemin(self, identifiant):
+        # Avant demarrer(), les travaux sont déposés à la racine, sans propriétaire
+        return os.path.join(self._dossier_propre or self.dossier_travaux, f"{identifiant}.json")
+
+    def _mettre_a_jour(self, identifiant, **champs):
+        with self._verrou:
+            self._travaux[identifiant].update(champs)
+
+    def _creer_generateur(self):
+        if self.fabrique_generateur is not None:
+            return self.fabrique_generateur()
+        from facture_generator import FactureGenerator
+        return FactureGenerator()
+
+    def _travailler(self):
+        """Boucle d'un worker : rendre les travaux de la file jusqu'à l'arrêt"""
+        # Générateur (et ReportLab) créé au premier travail seulement
+        generateur = None
+        while True:
+            travail = self._file.get()
+            if travail is None:
+                self._file.task_done()
+                return
+            try:
+                if generateur is None:
+                    try:
+                        generateur = self._creer_generateur()
+                    except Exception as e:
+                        # Générateur indisponible (ReportLab absent, police illisible...) : le worker continue,
+                        # le travail reste sur disque pour relancer()
+                        self._mettre_a_jour(travail['id'], statut='échec', erreur=str(e))
+                        continue
+                self._rendre(generateur, travail)
+            finally:
+                self._file.task_done()
+
+    def _rendre(self, generateur, travail):
+        """Rendre un travail avec reprise sur échec"""
+        identifiant = travail['id']
+        donnees = travail['donnees']
+        for tentative in range(1, self.tentatives + 1):
+            self._mettre_a_jour(identifiant, statut='en cours', tentatives=tentative)
+            try:
+                if travail['type'] == 'facture':
+                    fichier = generateur.generer_facture(
+                        donnees['numero_facture'], donnees['client_info'], donnees['produits_factures'],
+                        donnees['total_ht'], donnees['remise'], donnees['total_ht_remise'],
+                        donnees['tva'], donnees['total_ttc'],
+                        # Travaux enregistrés avant que le taux ne soit conservé : taux par défaut
+                        taux_tva=donnees.get('taux_tva', TAUX_TVA)
+                    )
+                else:
+                    fichier = generateur.generer_carte_reduction(donnees['client_info'], donnees['carte_info'])
+            except Exception as e:
+                self._mettre_a_jour(identifiant, erreur=str(e))
+                if tentative < self.tentatives:
+                    time.sleep(0.5 * tentative)
+                continue
+            try:
+                os.remove(self._chemin(identifiant))
+            except FileNotFoundError:
+                pass
+            self._mettre_a_jour(identifiant, statut='terminé', erreur=None, fichier=fichier)
+            if self.ouvrir:
+                try:
+                    webbrowser.open(f'file:///{os.path.abspath(fichier)}')
+                except Exception:
+                    pass
+            return
+        self._mettre_a_jour(identifiant, statut='échec')
+
+    def relancer(self):
+        """Remettre en file les travaux en échec ou reportés ; retourne leur nombre"""
+        with self._verrou:
+            a_relancer = [t['id'] for t in self._travaux.values() if t['statut'] in ('échec', 'reporté')]
+        relances = 0
+        for identifiant in a_relancer:
+            try:
+                with open(self._chemin(identifiant), 'r', encoding='utf-8') as fichier:
+                    travail = json.load(fichier)
+            except FileNotFoundError:
+                continue
+            try:
+                self._enfiler(travail, bloquer=False)
+            except FilePleine:
+                break
+            relances += 1
+        return relances
+
+    def etat(self):
+        """Liste des travaux connus, du plus ancien au plus récent"""
+        with self._verrou:
+            return [dict(travail) for travail in self._travaux.values()]
+
+    def travail(self, identifiant):
+        """État d'un travail connu, ou None"""
+        with self._verrou:
+            travail = self._travaux.get(identifiant)
+            return dict(travail) if travail is not None else None
+
+    def est_pleine(self):
+        """Vérifier si la file a atteint sa capacité (un nouveau travail serait reporté)"""
+        return self._file.full()
+
+    def en_attente(self):
+        """Nombre de travaux pas encore rendus"""
+        with self._verrou:
+            return sum(1 for travail in self._travaux.values() if travail['statut'] in ('en attente', 'en cours'))
+
+    def arreter(self):
+        """Attendre la fin des travaux en file puis arrêter les workers"""
+        for _ in self._workers:
+            self._file.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        if self._verrou_dossier is not None:
+            # Les travaux restants (en échec, reportés) seront repris par la prochaine caisse démarrée
+            self._verrou_dossier.liberer()
+            try:
+                os.rmdir(self._dossier_propre)
+            except OSError:
+                pass
+            self._verrou_dossier = None
+            self._dossier_propre = None
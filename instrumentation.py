@@ -0,0 +1,261 @@
+"""Mesures de l'application : durées par opération, lignes et octets lus ou écrits, taille des PDF.
+
+Désactivées par défaut : rien n'est enveloppé et le coût est nul. Avec la
+variable d'environnement FACTURATION_MESURES=1, activer_si_demande()
+enveloppe les méthodes de DataManager et de FactureGenerator ainsi que les
+lectures et écritures de fichiers du stockage. Les mesures se consultent
+dans le menu caché « m » et s'exportent en JSON ou au format texte de
+Prometheus.
+"""
+import functools
+import json
+import os
+import threading
+import time
+
+from verrou import ecrire_atomiquement, statistiques_verrous
+
+VARIABLE_ACTIVATION = 'FACTURATION_MESURES'
+
+# Bornes des histogrammes : durées en secondes, tailles de PDF en octets
+BORNES_DUREES = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+BORNES_OCTETS = [1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072, 262144, 1048576, 4194304]
+
+# Méthodes qui ne sont pas des opérations (gestionnaires de contexte, configuration)
+NON_MESUREES = {'transaction', 'setup_custom_styles'}
+
+
+class Histogramme:
+    """Répartition cumulée des valeurs observées, à la manière de Prometheus"""
+
+    def __init__(self, bornes):
+        self.bornes = bornes
+        self.compteurs = [0] * (len(bornes) + 1)
+        self.somme = 0.0
+        self.nombre = 0
+        self.maximum = 0.0
+
+    def observer(self, valeur):
+        position = 0
+        while position < len(self.bornes) and valeur > self.bornes[position]:
+            position += 1
+        self.compteurs[position] += 1
+        self.somme += valeur
+        self.nombre += 1
+        self.maximum = max(self.maximum, valeur)
+
+    def quantile(self, q):
+        """Borne supérieure du seau contenant le quantile `q` (le maximum pour le dernier seau)"""
+        rang = q * self.nombre
+        cumul = 0
+        for borne, compteur in zip(self.bornes, self.compteurs):
+            cumul += compteur
+            if cumul >= rang:
+                return min(borne, self.maximum)
+        return self.maximum
+
+    def en_dict(self):
+        return {
+            'nombre': self.nombre,
+            'somme': self.somme,
+            'moyenne': self.somme / self.nombre if self.nombre else 0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'maximum': self.maximum,
+            'seaux': dict(zip([str(b) for b in self.bornes] + ['+Inf'], self.compteurs))
+        }
+
+
+class Mesures:
+    """Histogrammes et compteurs du processus, étiquetés (nom, étiquette)"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self.histogrammes = {}
+        self.compteurs = {}
+        self.active = False
+
+    def observer(self, nom, etiquette, valeur, bornes=BORNES_DUREES):
+        with self._verrou:
+            histogramme = self.histogrammes.get((nom, etiquette))
+            if histogramme is None:
+                histogramme = self.histogrammes[(nom, etiquette)] = Histogramme(bornes)
+            histogramme.observer(valeur)
+
+    def incrementer(self, nom, etiquette, valeur=1):
+        with self._verrou:
+            self.compteurs[(nom, etiquette)] = self.compteurs.get((nom, etiquette), 0) + valeur
+
+    def vider(self):
+        with self._verrou:
+            self.histogrammes.clear()
+            self.compteurs.clear()
+
+    def instantane(self):
+        """Toutes les mesures sous forme de dict (JSON)"""
+        with self._verrou:
+            return {
+                'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'histogrammes': {f"{nom}{{{etiquette}}}": histogramme.en_dict()
+                                 for (nom, etiquette), histogramme in sorted(self.histogrammes.items())},
+                'compteurs': {f"{nom}{{{etiquette}}}": valeur
+                              for (nom, etiquette), valeur in sorted(self.compteurs.items())},
+                'verrous': statistiques_verrous.en_dict()
+            }
+
+    def exporter_json(self, chemin):
+        ecrire_atomiquement(chemin, json.dumps(self.instantane(), ensure_ascii=False, indent=1))
+        return chemin
+
+    def exporter_prometheus(self, chemin):
+        """Écrire les mesures au format texte d'exposition de Prometheus"""
+        lignes = []
+        with self._verrou:
+            noms = sorted({nom for nom, _ in self.histogrammes})
+            for nom in noms:
+                lignes.append(f"# TYPE facturation_{nom} histogram")
+                for (nom_h, etiquette), h in sorted(self.histogrammes.items()):
+                    if nom_h != nom:
+                        continue
+                    cumul = 0
+                    for borne, compteur in zip([str(b) for b in h.bornes] + ['+Inf'], h.compteurs):
+                        cumul += compteur
+                        lignes.append(f'facturation_{nom}_bucket{{operation="{etiquette}",le="{borne}"}} {cumul}')
+                    lignes.append(f'facturation_{nom}_sum{{operation="{etiquette}"}} {h.somme}')
+                    lignes.append(f'facturation_{nom}_count{{operation="{etiquette}"}} {h.nombre}')
+            for nom in sorted({nom for nom, _ in self.compteurs}):
+                lignes.append(f"# TYPE facturation_{nom}_total counter")
+                for (nom_c, etiquette), valeur in sorted(self.compteurs.items()):
+                    if nom_c == nom:
+                        lignes.append(f'facturation_{nom}_total{{type="{etiquette}"}} {valeur}')
+        verrous = statistiques_verrous.en_dict()
+        for nom, cle in (('verrous_acquisitions', 'acquisitions'), ('verrous_attentes', 'attentes'),
+                         ('verrous_attente_secondes', 'duree_attente_s')):
+            lignes.append(f"# TYPE facturation_{nom}_total counter")
+            lignes.append(f"facturation_{nom}_total {verrous[cle]}")
+        ecrire_atomiquement(chemin, '\n'.join(lignes) + '\n')
+        return chemin
+
+
+# Mesures uniques pour le processus
+mesures = Mesures()
+
+
+def _format(chemin):
+    """Format d'un fichier lu ou écrit, pour l'étiquette des compteurs"""
+    extension = os.path.splitext(chemin)[1].lower()
+    return {'.xlsx': 'excel', '.csv': 'csv', '.jsonl': 'journal', '.json': 'json'}.get(extension, extension)
+
+
+def _taille(chemin):
+    try:
+        return os.path.getsize(chemin)
+    except OSError:
+        return 0
+
+
+def _chronometrer(fonction, operation):
+    @functools.wraps(fonction)
+    def enveloppe(*args, **kwargs):
+        debut = time.perf_counter()
+        try:
+            return fonction(*args, **kwargs)
+        finally:
+            mesures.observer('operation_secondes', operation, time.perf_counter() - debut)
+    return enveloppe
+
+
+def envelopper_methodes(classe, prefixe):
+    """Chronométrer chaque méthode publique de `classe` sous le nom `prefixe.méthode`"""
+    for nom, attribut in list(vars(classe).items()):
+        if nom.startswith('_') or nom in NON_MESUREES or not callable(attribut):
+            continue
+        setattr(classe, nom, _chronometrer(attribut, f"{prefixe}.{nom}"))
+
+
+def _mesurer_pdf(fonction, type_pdf):
+    """Compter les PDF produits et leur taille (fichier retourné, ou fichiers d'un index de recueil)"""
+    @functools.wraps(fonction)
+    def enveloppe(*args, **kwargs):
+        resultat = fonction(*args, **kwargs)
+        fichiers = {resultat} if isinstance(resultat, str) else {e['fichier'] for e in resultat.values()}
+        for fichier in fichiers:
+            taille = _taille(fichier)
+            mesures.observer('pdf_octets', type_pdf, taille, BORNES_OCTETS)
+            mesures.incrementer('pdf_generes', type_pdf)
+            mesures.incrementer('pdf_octets_ecrits', type_pdf, taille)
+        return resultat
+    return enveloppe
+
+
+def _mesurer_lecteur(lecteur):
+    """Lecteur de table qui compte les lignes et octets lus et chronomètre l'analyse du fichier"""
+    @functools.wraps(lecteur)
+    def lire(chemin):
+        debut = time.perf_counter()
+        df = lecteur(chemin)
+        format_fichier = _format(chemin)
+        mesures.observer('operation_secondes', f"lecture.{format_fichier}", time.perf_counter() - debut)
+        mesures.incrementer('lignes_lues', format_fichier, len(df))
+        mesures.incrementer('octets_lus', format_fichier, _taille(chemin))
+        return df
+    return lire
+
+
+def _mesurer_ecriture(fonction, chemin_de, lignes_de, operation):
+    """Chronométrer une écriture de fichier et compter les lignes et octets ajoutés"""
+    @functools.wraps(fonction)
+    def enveloppe(self, *args, **kwargs):
+        chemin = chemin_de(self, *args)
+        avant = _taille(chemin)
+        debut = time.perf_counter()
+        resultat = fonction(self, *args, **kwargs)
+        format_fichier = _format(chemin)
+        mesures.observer('operation_secondes', f"{operation}.{format_fichier}", time.perf_counter() - debut)
+        mesures.incrementer('lignes_ecrites', format_fichier, lignes_de(*args))
+        apres = _taille(chemin)
+        # Un classeur est réécrit en entier ; un journal ou un CSV ne reçoit que l'ajout
+        mesures.incrementer('octets_ecrits', format_fichier, apres if operation == 'ecriture' else apres - avant)
+        return resultat
+    return enveloppe
+
+
+def activer():
+    """Envelopper les classes de l'application (sans effet si c'est déjà fait)"""
+    if mesures.active:
+        return
+    from data_manager import DataManager
+    from facture_generator import FactureGenerator
+    from journal_ajouts import JournalAjouts
+    from stockage import CacheTables, StockageExcel
+
+    envelopper_methodes(DataManager, 'data_manager')
+    envelopper_methodes(FactureGenerator, 'facture_generator')
+    for nom, type_pdf in (('generer_facture', 'facture'), ('generer_carte_reduction', 'carte'),
+                          ('generer_recueil_factures', 'recueil_factures'),
+                          ('generer_recueil_cartes', 'recueil_cartes')):
+        setattr(FactureGenerator, nom, _mesurer_pdf(getattr(FactureGenerator, nom), type_pdf))
+
+    entree = CacheTables.entree
+
+    @functools.wraps(entree)
+    def entree_mesuree(self, chemin, lecteur, dependances=()):
+        return entree(self, chemin, _mesurer_lecteur(lecteur), dependances)
+    CacheTables.entree = entree_mesuree
+
+    StockageExcel._ecrire_table = _mesurer_ecriture(
+        StockageExcel._ecrire_table, lambda self, chemin, df, *_: chemin, lambda chemin, df, *_: len(df), 'ecriture')
+    StockageExcel._ajouter_csv = _mesurer_ecriture(
+        StockageExcel._ajouter_csv, lambda self, table, lignes: self.fichiers[table],
+        lambda table, lignes: len(lignes), 'ajout')
+    JournalAjouts.ajouter = _mesurer_ecriture(
+        JournalAjouts.ajouter, lambda self, enregistrements: self.chemin,
+        lambda enregistrements: len(enregistrements), 'ajout')
+    mesures.active = True
+
+
+def activer_si_demande():
+    """Activer les mesures si la variable d'environnement le demande ; retourne l'état"""
+    if os.environ.get(VARIABLE_ACTIVATION, '') not in ('', '0'):
+        activer()
+    return mesures.active
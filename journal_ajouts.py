@@ -0,0 +1,88 @@
+import json
+import os
+
+
+class JournalAjouts:
+    """Journal en ajout seul d'enregistrements JSON (factures, agrégats des ventes).
+
+    Chaque enregistrement est écrit sur une ligne JSON à la fin du fichier,
+    puis le fichier est synchronisé sur disque (fsync) avant de rendre la
+    main. Le fichier de référence (Factures.xlsx, agregats_ventes.json)
+    n'est plus réécrit à chaque vente : il sert d'instantané, et le journal
+    est replié dedans lors de la compaction.
+    """
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+
+    def initialiser(self):
+        """Créer le journal vide s'il n'existe pas"""
+        if not os.path.exists(self.chemin):
+            open(self.chemin, 'a', encoding='utf-8').close()
+
+    def ajouter(self, enregistrements):
+        """Ajouter un ou plusieurs enregistrements au journal et les rendre durables"""
+        lignes = ''.join(json.dumps(enregistrement, ensure_ascii=False, default=str) + '\n'
+                         for enregistrement in enregistrements)
+        if not self._termine_par_fin_de_ligne():
+            # Isoler le reste d'une écriture interrompue sur sa propre ligne
+            lignes = '\n' + lignes
+        with open(self.chemin, 'a', encoding='utf-8') as fichier:
+            fichier.write(lignes)
+            fichier.flush()
+            os.fsync(fichier.fileno())
+
+    def _termine_par_fin_de_ligne(self):
+        """Vérifier que la dernière écriture du journal est complète"""
+        try:
+            with open(self.chemin, 'rb') as fichier:
+                fichier.seek(0, os.SEEK_END)
+                if fichier.tell() == 0:
+                    return True
+                fichier.seek(-1, os.SEEK_END)
+                return fichier.read(1) == b'\n'
+        except FileNotFoundError:
+            return True
+
+    def lire(self):
+        """Lire tous les enregistrements du journal.
+
+        Les lignes tronquées (arrêt brutal pendant une écriture) sont ignorées.
+        """
+        return self.lire_depuis(0)[0]
+
+    def lire_depuis(self, position):
+        """Enregistrements écrits après `position` (en octets), et position de fin de la dernière ligne complète"""
+        try:
+            with open(self.chemin, 'rb') as fichier:
+                fichier.seek(position)
+                contenu = fichier.read()
+        except FileNotFoundError:
+            return [], 0
+        # Une dernière ligne sans fin de ligne est en cours d'écriture (ou tronquée) : relue plus tard
+        fin = contenu.rfind(b'\n') + 1
+        enregistrements = []
+        for ligne in contenu[:fin].splitlines():
+            try:
+                enregistrements.append(json.loads(ligne))
+            except ValueError:
+                continue
+        return enregistrements, position + fin
+
+    def taille(self):
+        """Taille du journal en octets (0 s'il n'existe pas)"""
+        try:
+            return os.path.getsize(self.chemin)
+        except FileNotFoundError:
+            return 0
+
+    def est_vide(self):
+        """Vérifier si le journal ne contient aucun enregistrement"""
+        return self.taille() == 0
+
+    def vider(self):
+        """Vider le journal une fois son contenu replié dans l'instantané"""
+        with open(self.chemin, 'w', encoding='utf-8') as fichier:
+            fichier.flush()
+            os.fsync(fichier.fileno())
+
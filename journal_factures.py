@@ -0,0 +1,9 @@
+"""Compaction des journaux (Factures.journal.jsonl, Clients.journal.jsonl...) dans leurs classeurs.
+
+Usage : python journal_factures.py
+"""
+if __name__ == "__main__":
+    from data_manager import DataManager
+
+    nombre = DataManager().compacter_factures()
+    print(f"Journaux compactés : {nombre} ligne(s) repliée(s) dans les classeurs")
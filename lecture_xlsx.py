@@ -0,0 +1,116 @@
+import posixpath
+import re
+import zipfile
+from xml.etree.ElementTree import iterparse, parse
+
+NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+NS_RELATIONS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+NS_PAQUET = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+class ChainesPartagees:
+    """Chaînes partagées d'un classeur, lues au fur et à mesure des besoins.
+
+    Les premières lignes d'une feuille n'utilisent que les premières
+    chaînes : inutile de lire tout sharedStrings.xml pour les afficher.
+    """
+
+    def __init__(self, archive):
+        self.chaines = []
+        try:
+            self._elements = iterparse(archive.open('xl/sharedStrings.xml'))
+        except KeyError:
+            self._elements = iter(())
+
+    def __getitem__(self, indice):
+        while len(self.chaines) <= indice:
+            try:
+                _, element = next(self._elements)
+            except StopIteration:
+                raise IndexError(indice) from None
+            if element.tag == NS + 'si':
+                self.chaines.append(_texte(element))
+                element.clear()
+        return self.chaines[indice]
+
+
+def _texte(element):
+    """Texte d'une chaîne (<si>) ou d'une cellule en ligne (<is>), simple ou enrichi, sans la phonétique"""
+    morceaux = [element.findtext(NS + 't') or '']
+    morceaux += [r.findtext(NS + 't') or '' for r in element.iterfind(NS + 'r')]
+    return ''.join(morceaux)
+
+
+def _chemin_premiere_feuille(archive):
+    """Chemin dans l'archive de la première feuille du classeur"""
+    classeur = parse(archive.open('xl/workbook.xml')).getroot()
+    feuille = classeur.find(f'{NS}sheets/{NS}sheet')
+    relation = feuille.get(NS_RELATIONS + 'id')
+    for cible in parse(archive.open('xl/_rels/workbook.xml.rels')).getroot().iter(NS_PAQUET + 'Relationship'):
+        if cible.get('Id') == relation:
+            chemin = cible.get('Target')
+            return chemin.lstrip('/') if chemin.startswith('/') else posixpath.normpath(posixpath.join('xl', chemin))
+    return 'xl/worksheets/sheet1.xml'
+
+
+def _colonne(reference):
+    """Indice (à partir de 0) de la colonne d'une référence de cellule ("C12" -> 2)"""
+    indice = 0
+    for lettre in re.match(r'[A-Z]+', reference).group():
+        indice = indice * 26 + ord(lettre) - 64
+    return indice - 1
+
+
+def _nombre(texte):
+    return int(texte) if re.fullmatch(r'-?\d+', texte) else float(texte)
+
+
+def lire_lignes_xlsx(chemin):
+    """Lignes (tuples de valeurs) de la première feuille d'un classeur, lues au fil du fichier.
+
+    Les lignes lues ne restent pas en mémoire ; seules les chaînes
+    partagées déjà rencontrées sont gardées. Les dates ne sont pas
+    converties (numéros de série Excel) : les tables parcourues ainsi
+    n'en contiennent pas. Excel n'écrit pas les cellules vides de fin de
+    ligne : chaque ligne est complétée par None jusqu'à la largeur de la
+    première (l'en-tête).
+    """
+    with zipfile.ZipFile(chemin) as archive:
+        chaines = ChainesPartagees(archive)
+        donnees = None
+        largeur = None
+        for evenement, element in iterparse(archive.open(_chemin_premiere_feuille(archive)), ('start', 'end')):
+            if evenement == 'start':
+                if element.tag == NS + 'sheetData':
+                    donnees = element
+                continue
+            if element.tag != NS + 'row':
+                continue
+            valeurs = []
+            for cellule in element.iterfind(NS + 'c'):
+                reference = cellule.get('r')
+                if reference is not None:
+                    valeurs.extend([None] * (_colonne(reference) - len(valeurs)))
+                type_cellule = cellule.get('t', 'n')
+                texte = cellule.findtext(NS + 'v')
+                if type_cellule == 'inlineStr':
+                    valeur = _texte(cellule.find(NS + 'is'))
+                elif texte is None:
+                    valeur = None
+                elif type_cellule == 's':
+                    valeur = chaines[int(texte)]
+                elif type_cellule == 'b':
+                    valeur = texte == '1'
+                elif type_cellule in ('str', 'e'):
+                    valeur = texte
+                else:
+                    valeur = _nombre(texte)
+                valeurs.append(valeur)
+            # Les lignes lues sont retirées de l'arbre : la mémoire reste constante
+            if donnees is not None:
+                donnees.clear()
+            if largeur is None:
+                largeur = len(valeurs)
+            else:
+                valeurs.extend([None] * (largeur - len(valeurs)))
+            yield tuple(valeurs)
@@ -3,15 +3,72 @@
 
 import os
 import sys
-import webbrowser
-from data_manager import DataManager
-from facture_generator import FactureGenerator
-import re
+import threading
+from file_rendu import FilePleine, FileRendu
+from instrumentation import VARIABLE_ACTIVATION, activer_si_demande, mesures
+from tables import FICHIER_SQLITE, TRIS_NUMERIQUES
+from tarification import ReglesTarification, calculer_totaux, libelle_tva, ligne_facture, lire_paliers
+from datetime import datetime
+from itertools import islice
+
+# pandas et ReportLab ne sont importés qu'au premier usage (data_manager, facture_generator) :
+# le menu s'affiche sans attendre. Les définitions des tables viennent de tables.py, sans pandas.
+
+# Modules lourds chargés en arrière-plan pendant que le menu est affiché
+MODULES_LOURDS = ['data_manager', 'facture_generator']
+
+# Lignes par page dans la consultation des tables
+TAILLE_PAGE = 20
+
+# Au-delà, le catalogue n'est plus listé : le produit se retrouve par recherche
+CATALOGUE_AFFICHE_MAX = 30
+
+
+def formater_prix(valeur):
+    """Prix avec deux décimales ; « - » s'il manque ou n'est pas un nombre (cellule vide, texte)"""
+    try:
+        prix = float(valeur)
+    except (TypeError, ValueError):
+        return '-'
+    if prix != prix:
+        return '-'
+    return f"{prix:.2f}"
+
+
+def precharger_modules():
+    """Importer les modules lourds (pandas, ReportLab) sans rien construire"""
+    for module in MODULES_LOURDS:
+        __import__(module)
+
 
 class ApplicationFacturation:
     def __init__(self):
-        self.data_manager = DataManager()
-        self.facture_generator = FactureGenerator()
+        activer_si_demande()
+        self._data_manager = None
+        self._facture_generator = None
+        self.file_rendu = FileRendu()
+        self._prechargement = None
+    
+    @property
+    def data_manager(self):
+        """Gestionnaire de données, créé au premier usage"""
+        if self._data_manager is None:
+            from data_manager import DataManager
+            self._data_manager = DataManager()
+        return self._data_manager
+    
+    @property
+    def facture_generator(self):
+        """Générateur PDF, créé au premier usage"""
+        if self._facture_generator is None:
+            from facture_generator import FactureGenerator
+            self._facture_generator = FactureGenerator()
+        return self._facture_generator
+    
+    def precharger(self):
+        """Lancer l'import des modules lourds en arrière-plan"""
+        self._prechargement = threading.Thread(target=precharger_modules, daemon=True)
+        self._prechargement.start()
         
     def afficher_menu_principal(self):
         """Afficher le menu principal"""
@@ -22,7 +79,8 @@ class ApplicationFacturation:
         print("2. Générer une facture")
         print("3. Ajouter un produit")
         print("4. Statistiques de ventes")
-        print("5. Quitter l'application")
+        print("5. Suivi des rendus PDF")
+        print("6. Quitter l'application")
         print("="*60)
     
     def afficher_menu_consultation(self):
@@ -55,66 +113,109 @@ class ApplicationFacturation:
     
     def afficher_clients(self):
         """Afficher la liste des clients"""
-        print("\n" + "="*80)
-        print("                                    CLIENTS")
-        print("="*80)
-        
-        df_clients = self.data_manager.charger_clients()
-        
-        if df_clients.empty:
-            print("Aucun client trouvé.")
-            return
-        
-        print(f"{'Code':<10} {'Nom':<30} {'Contact':<25} {'IFU':<15}")
-        print("-" * 80)
-        
-        for _, client in df_clients.iterrows():
-            print(f"{client['code_client']:<10} {client['nom']:<30} {client['contact']:<25} {client['IFU']:<15}")
-        
-        print("="*80)
-        input("Appuyez sur Entrée pour continuer...")
+        self.afficher_table(
+            'clients', "CLIENTS", 80,
+            f"{'Code':<10} {'Nom':<30} {'Contact':<25} {'IFU':<15}",
+            lambda client: f"{client['code_client']:<10} {str(client['nom']):<30} "
+                           f"{str(client['contact']):<25} {str(client['IFU']):<15}",
+            {'code_client': "code", 'nom': "nom"},
+            "Aucun client trouvé."
+        )
     
     def afficher_produits(self):
         """Afficher la liste des produits"""
-        print("\n" + "="*70)
-        print("                                PRODUITS")
-        print("="*70)
-        
-        df_produits = self.data_manager.charger_produits()
-        
-        if df_produits.empty:
-            print("Aucun produit trouvé.")
-            return
-        
-        print(f"{'Code':<10} {'Libellé':<35} {'Prix Unitaire':<15}")
-        print("-" * 70)
-        
-        for _, produit in df_produits.iterrows():
-            print(f"{produit['code_produit']:<10} {produit['libelle']:<35} {produit['prix_unitaire']:<15.2f}")
-        
-        print("="*70)
-        input("Appuyez sur Entrée pour continuer...")
+        self.afficher_table(
+            'produits', "PRODUITS", 70,
+            f"{'Code':<10} {'Libellé':<35} {'Prix Unitaire':<15}",
+            lambda produit: f"{produit['code_produit']:<10} {str(produit['libelle']):<35} "
+                            f"{formater_prix(produit['prix_unitaire']):<15}",
+            {'code_produit': "code", 'libelle': "libellé", 'prix_unitaire': "prix"},
+            "Aucun produit trouvé."
+        )
     
     def afficher_cartes_reduction(self):
         """Afficher la liste des cartes de réduction"""
-        print("\n" + "="*60)
-        print("                        CARTES DE RÉDUCTION")
-        print("="*60)
-        
-        df_cartes = self.data_manager.charger_cartes()
-        
-        if df_cartes.empty:
-            print("Aucune carte de réduction trouvée.")
-            return
-        
-        print(f"{'Numéro Carte':<15} {'Code Client':<12} {'Taux Réduction':<15}")
-        print("-" * 60)
+        self.afficher_table(
+            'cartes', "CARTES DE RÉDUCTION", 60,
+            f"{'Numéro Carte':<15} {'Code Client':<12} {'Taux Réduction':<15}",
+            lambda carte: f"{carte['numero_carte']:<15} {carte['code_client']:<12} {carte['taux_reduction']:<15}%",
+            {'numero_carte': "numéro", 'code_client': "client", 'taux_reduction': "taux"},
+            "Aucune carte de réduction trouvée."
+        )
+    
+    def afficher_table(self, table, titre, largeur, entete, formater, tris, message_vide):
+        """Afficher une table page par page, lue au fil de l'eau.
         
-        for _, carte in df_cartes.iterrows():
-            print(f"{carte['numero_carte']:<15} {carte['code_client']:<12} {carte['taux_reduction']:<15}%")
+        Seules les pages déjà vues sont gardées (pour revenir en arrière) ;
+        `tris` associe les colonnes de tri proposées à leur nom à l'écran.
+        """
+        tri, prefixe, decroissant = None, None, False
+        lignes = self.data_manager.parcourir(table)
+        pages = []
+        numero = 0
         
-        print("="*60)
-        input("Appuyez sur Entrée pour continuer...")
+        while True:
+            if numero == len(pages):
+                try:
+                    page = list(islice(lignes, TAILLE_PAGE))
+                except FileNotFoundError:
+                    page = []
+                if page or not pages:
+                    pages.append(page)
+                else:
+                    print("Fin de la liste.")
+                    numero -= 1
+            page = pages[numero]
+            
+            print("\n" + "=" * largeur)
+            print(titre.center(largeur).rstrip())
+            if tri or prefixe:
+                ordre = f"tri par {tris[tri]}{' décroissant' if decroissant else ''}" if tri else "ordre d'enregistrement"
+                filtre = f", commençant par « {prefixe} »" if prefixe else ""
+                print(f"({ordre}{filtre})".center(largeur).rstrip())
+            print("=" * largeur)
+            if not page:
+                print(message_vide)
+            else:
+                print(entete)
+                print("-" * largeur)
+                for ligne in page:
+                    print(formater(ligne))
+                debut = numero * TAILLE_PAGE + 1
+                print("-" * largeur)
+                print(f"Lignes {debut} à {debut + len(page) - 1} - page {numero + 1}")
+            
+            choix = input("[Entrée] suivante  [p] précédente  [t] trier  [f] filtrer  [q] retour : ").strip().lower()
+            if choix == 'q':
+                return
+            if choix == 'p':
+                numero = max(0, numero - 1)
+                continue
+            if choix in ('t', 'f'):
+                if choix == 't':
+                    options = list(tris)
+                    for i, colonne in enumerate(options, 1):
+                        print(f"{i}. {tris[colonne].capitalize()}")
+                    saisie = input("Trier par (numéro, Entrée pour l'ordre d'enregistrement) : ").strip()
+                    if saisie.isdigit() and 1 <= int(saisie) <= len(options):
+                        tri = options[int(saisie) - 1]
+                        decroissant = input("Ordre décroissant ? (o/n) : ").strip().lower() in ['o', 'oui']
+                    else:
+                        tri, decroissant = None, False
+                    # Le filtre porte sur la colonne de tri : il ne survit pas à un changement de tri
+                    prefixe = None
+                else:
+                    colonne = tri if tri and tri not in TRIS_NUMERIQUES else next(iter(tris))
+                    prefixe = input(f"Début du {tris[colonne]} (Entrée pour tout afficher) : ").strip() or None
+                    if prefixe and colonne.startswith(('code_', 'numero_')):
+                        # Les codes et numéros sont en majuscules
+                        prefixe = prefixe.upper()
+                    tri = colonne if prefixe else tri
+                lignes = self.data_manager.parcourir(table, tri, prefixe, decroissant)
+                pages = []
+                numero = 0
+                continue
+            numero += 1
     
     def generer_facture(self):
         """Générer une nouvelle facture"""
@@ -122,6 +223,9 @@ class ApplicationFacturation:
         print("           GÉNÉRATION DE FACTURE")
         print("="*50)
         
+        # Rien n'est enregistré avant la validation de la vente
+        session = self.data_manager.session()
+        
         # Demander si nouveau client ou client existant
         print("1. Client existant")
         print("2. Nouveau client")
@@ -129,7 +233,7 @@ class ApplicationFacturation:
         
         if choix_client == "2":
             # Créer un nouveau client
-            client_info = self.creer_nouveau_client()
+            client_info = self.creer_nouveau_client(session)
             if not client_info:
                 return
         else:
@@ -141,101 +245,76 @@ class ApplicationFacturation:
         # Saisir les produits
         produits_factures = self.saisir_produits()
         if not produits_factures:
+            session.annuler()
             return
         
-        # Calculer les totaux
-        total_ht = sum(prod['total_ht'] for prod in produits_factures)
-        
         # Vérifier s'il y a une carte de réduction
-        carte_client = self.data_manager.obtenir_carte_client(client_info['code_client'])
-        remise = 0
+        carte_client = session.obtenir_carte_client(client_info['code_client'])
+        taux_reduction = carte_client['taux_reduction'] if carte_client else 0
+        
+        # Calculer les totaux
+        totaux = calculer_totaux(produits_factures, taux_reduction, self.data_manager.regles)
+        total_ht = totaux['total_ht']
+        remise = totaux['remise']
+        total_ht_remise = totaux['total_ht_remise']
+        tva = totaux['tva']
+        total_ttc = totaux['total_ttc']
         
         if carte_client:
-            remise = total_ht * (carte_client['taux_reduction'] / 100)
             print(f"\nCarte de réduction appliquée : {carte_client['taux_reduction']}%")
             print(f"Montant de la remise : {remise:.2f} FCFA")
         
-        total_ht_remise = total_ht - remise
-        tva = total_ht_remise * 0.18
-        total_ttc = total_ht_remise + tva
-        
         # Afficher le récapitulatif
         self.afficher_recapitulatif_facture(client_info, produits_factures, total_ht, remise, total_ht_remise, tva, total_ttc)
         
-        # Générer la facture automatiquement
-        numero_facture = self.data_manager.obtenir_prochain_numero_facture()
+        session.enregistrer_facture(client_info['code_client'], total_ht, remise, total_ht_remise, tva, total_ttc,
+                                    produits_factures)
+        # Créer une carte de réduction si nécessaire
+        if not carte_client and total_ttc >= self.data_manager.regles.seuil_carte:
+            session.creer_carte_reduction(client_info['code_client'], total_ttc)
         
         try:
-            filename = self.facture_generator.generer_facture(
-                numero_facture, client_info, produits_factures,
-                total_ht, remise, total_ht_remise, tva, total_ttc
-            )
-            
-            # Enregistrer la facture dans la base
-            self.data_manager.enregistrer_facture(
-                numero_facture, client_info['code_client'],
-                total_ht, remise, total_ht_remise, tva, total_ttc
-            )
-            
-            # Créer une carte de réduction si nécessaire
-            if not carte_client and total_ttc >= 2000:
-                nouvelle_carte = self.data_manager.creer_carte_reduction(client_info['code_client'], total_ttc)
-                if nouvelle_carte:
-                    print(f"\n🎉 Une carte de réduction de {nouvelle_carte['taux_reduction']}% a été créée pour ce client !")
-                    # Générer la carte PDF et l'ouvrir
-                    carte_pdf = self.facture_generator.generer_carte_reduction(client_info, nouvelle_carte)
-                    print(f"✅ Carte PDF générée : {carte_pdf}")
-                    try:
-                        webbrowser.open(f'file:///{os.path.abspath(carte_pdf)}')
-                        print("🌐 Ouverture de la carte dans le navigateur...")
-                    except Exception as e:
-                        print(f"⚠️ Impossible d'ouvrir automatiquement la carte : {e}")
-                        print(f"📁 Vous pouvez l'ouvrir manuellement : {carte_pdf}")
-            
-            print(f"\n✅ Facture générée avec succès : {filename}")
-            
-            # Ouvrir le fichier PDF dans le navigateur web
-            try:
-                webbrowser.open(f'file:///{os.path.abspath(filename)}')
-                print("🌐 Ouverture de la facture dans le navigateur...")
-            except Exception as e:
-                print(f"⚠️ Impossible d'ouvrir automatiquement la facture : {e}")
-                print(f"📁 Vous pouvez l'ouvrir manuellement : {filename}")
-            
+            # Client, facture, lignes, carte et rendus PDF enregistrés ensemble, ou pas du tout
+            vente = session.valider(self.file_rendu)
         except Exception as e:
             print(f"❌ Erreur lors de la génération de la facture : {e}")
+            print("Aucune donnée n'a été enregistrée pour cette vente.")
+            return
+        
+        print(f"\n✅ Facture {vente['numero_facture']} enregistrée.")
+        if vente['carte']:
+            print(f"🎉 Une carte de réduction de {vente['carte']['taux_reduction']}% a été créée pour ce client !")
+        
+        # Les PDF sont rendus en arrière-plan et s'ouvrent dans le navigateur une fois prêts
+        try:
+            self.file_rendu.lancer(vente['travaux'])
+            print("🖨️  Génération du PDF en arrière-plan (menu 5 pour le suivi).")
+        except FilePleine as e:
+            print(f"⚠️ {e} : le PDF sera généré dès que possible (menu 5 pour relancer).")
     
-    def creer_nouveau_client(self):
-        """Créer un nouveau client"""
+    def creer_nouveau_client(self, session):
+        """Saisir un nouveau client, enregistré avec la facture de la session"""
         print("\n--- Création d'un nouveau client ---")
         
         code_client = input("Code client : ").strip()
         nom = input("Nom : ").strip()
         while True:
             contact = input("Contact (email/téléphone) : ").strip()
-            if '@' in contact:
-                # Vérification email stricte : uniquement gmail.com
-                if re.match(r"^[a-zA-Z0-9_.+-]+@gmail\.com$", contact):
-                    break
-                else:
-                    print("❌ L'email doit être au format nom@gmail.com (Gmail uniquement)")
-            else:
-                # Vérification numéro
-                if contact.isdigit() and len(contact) >= 8:
-                    break
-                else:
-                    print("❌ Le numéro doit contenir uniquement des chiffres (au moins 8)")
+            valide, message = self.data_manager.verifier_contact(contact)
+            if valide:
+                break
+            print(f"❌ {message}")
         ifu = input("IFU (13 caractères) : ").strip()
         
         if not all([code_client, nom, contact, ifu]):
             print("❌ Tous les champs sont obligatoires.")
             return None
         
-        success, message = self.data_manager.ajouter_client(code_client, nom, contact, ifu)
+        success, message = session.ajouter_client(code_client, nom, contact, ifu)
         
         if success:
             print(f"✅ {message}")
-            return self.data_manager.obtenir_client(code_client)
+            return session.obtenir_client(code_client)
         else:
             print(f"❌ {message}")
             return None
@@ -272,18 +351,22 @@ class ApplicationFacturation:
             print("❌ Aucun produit disponible.")
             return None
         
-        print("\n--- Produits disponibles ---")
-        for _, produit in df_produits.iterrows():
-            print(f"{produit['code_produit']} - {produit['libelle']} - {produit['prix_unitaire']:.2f} FCFA")
+        if len(df_produits) <= CATALOGUE_AFFICHE_MAX:
+            print("\n--- Produits disponibles ---")
+            for _, produit in df_produits.iterrows():
+                print(f"{produit['code_produit']} - {produit['libelle']} - {formater_prix(produit['prix_unitaire'])} FCFA")
+        else:
+            print(f"\n{len(df_produits)} produits au catalogue : tapez un code ou le début d'un libellé.")
         
         print("\n--- Saisie des produits ---")
         
         while True:
-            code_produit = input("\nCode produit : ").strip().upper()
+            saisie = input("\nCode produit ou recherche : ").strip()
+            if not saisie:
+                continue
             
-            produit = self.data_manager.obtenir_produit(code_produit)
+            produit = self.data_manager.obtenir_produit(saisie.upper()) or self.choisir_produit(saisie)
             if not produit:
-                print("❌ Produit non trouvé.")
                 continue
             
             # Boucle pour la saisie de la quantité
@@ -298,15 +381,8 @@ class ApplicationFacturation:
                     print("❌ Veuillez entrer un nombre valide.")
                     continue  # Redemander la quantité pour le même produit
             
-            total_ht = produit['prix_unitaire'] * quantite
-            
-            produit_facture = {
-                'code_produit': produit['code_produit'],
-                'libelle': produit['libelle'],
-                'prix_unitaire': produit['prix_unitaire'],
-                'quantite': quantite,
-                'total_ht': total_ht
-            }
+            produit_facture = ligne_facture(produit, quantite)
+            total_ht = produit_facture['total_ht']
             
             produits_factures.append(produit_facture)
             print(f"✅ Ajouté : {quantite}x {produit['libelle']} = {total_ht:.2f} FCFA")
@@ -327,6 +403,21 @@ class ApplicationFacturation:
         
         return produits_factures
     
+    def choisir_produit(self, saisie):
+        """Proposer les produits correspondant à une saisie partielle et faire choisir"""
+        resultats = self.data_manager.rechercher_produits(saisie)
+        if not resultats:
+            print("❌ Produit non trouvé.")
+            return None
+        
+        for i, produit in enumerate(resultats, 1):
+            print(f"  {i:>2}. {produit['code_produit']} - {produit['libelle']} - "
+                  f"{formater_prix(produit['prix_unitaire'])} FCFA")
+        choix = input("Numéro du produit (Entrée pour une autre recherche) : ").strip()
+        if choix.isdigit() and 1 <= int(choix) <= len(resultats):
+            return resultats[int(choix) - 1]
+        return None
+    
     def afficher_recapitulatif_facture(self, client_info, produits_factures, total_ht, remise, total_ht_remise, tva, total_ttc):
         """Afficher le récapitulatif de la facture"""
         print("\n" + "="*60)
@@ -347,7 +438,7 @@ class ApplicationFacturation:
         print(f"{'Total HT':<45} {total_ht:<12.2f}")
         print(f"{'Remise':<45} {remise:<12.2f}")
         print(f"{'THT remise':<45} {total_ht_remise:<12.2f}")
-        print(f"{'TVA (18%)':<45} {tva:<12.2f}")
+        print(f"{libelle_tva(self.data_manager.regles.taux_tva):<45} {tva:<12.2f}")
         print(f"{'Total TTC':<45} {total_ttc:<12.2f}")
         print("="*60)
     
@@ -389,17 +480,151 @@ class ApplicationFacturation:
         print(f"Moyenne par facture : {stats['moyenne_facture']:.2f} FCFA")
         print(f"Facture la plus élevée : {stats['facture_plus_elevee']:.2f} FCFA")
         
-        # Statistiques par client
-        df_factures = self.data_manager.charger_factures()
-        df_clients = self.data_manager.charger_clients()
+        # Rapports détaillés, éventuellement limités à une période
+        periode = input("\nPériode (AAAA-MM-JJ AAAA-MM-JJ, Entrée pour tout l'historique) : ").strip()
+        debut = fin = None
+        if periode:
+            try:
+                debut, fin = (datetime.strptime(date, '%Y-%m-%d') for date in periode.split())
+            except ValueError:
+                print("❌ Période invalide, rapport sur tout l'historique.")
+                debut = fin = None
+        rapport = self.data_manager.rapport_ventes(debut, fin)
+        
+        if debut is not None:
+            resume = rapport.resume()
+            print(f"\n--- Du {debut:%d/%m/%Y} au {fin:%d/%m/%Y} ---")
+            print(f"Nombre de factures : {resume['total_factures']}")
+            print(f"Chiffre d'affaires : {resume['chiffre_affaires_total']:.2f} FCFA")
+        
+        print("\n--- Chiffre d'affaires par client (10 premiers) ---")
+        for client in rapport.top_clients(10).itertuples():
+            nom = client.nom if isinstance(client.nom, str) else client.code_client
+            print(f"{nom} : {client.total_ttc:.2f} FCFA")
+        
+        print("\n--- Chiffre d'affaires par mois ---")
+        for mois in rapport.par_mois().itertuples():
+            print(f"{mois.mois} : {mois.total_ttc:.2f} FCFA ({mois.nombre_factures} factures)")
+        
+        print("\n--- Chiffre d'affaires par taux de remise ---")
+        for tranche in rapport.par_tranche_remise().itertuples():
+            print(f"{tranche.taux_remise}% : {tranche.total_ttc:.2f} FCFA ({tranche.nombre_factures} factures)")
+        
+        analyse = self.data_manager.analyse_produits(debut, fin)
+        top_produits = analyse.top_produits(5)
+        if not top_produits.empty:
+            print("\n--- Produits les plus vendus (5 premiers) ---")
+            for produit in top_produits.itertuples():
+                print(f"{produit.libelle} : {produit.quantite} unité(s), {produit.total_ht:.2f} FCFA HT")
+        
+        if input("\nExporter le rapport complet en Excel ? (o/n) : ").lower().strip() in ['o', 'oui', 'y', 'yes']:
+            if not os.path.exists('rapports'):
+                os.makedirs('rapports')
+            chemin = rapport.exporter(os.path.join('rapports', f"Rapport_ventes_{datetime.now():%Y%m%d_%H%M%S}.xlsx"))
+            print(f"✅ Rapport exporté : {chemin}")
+            chemin = analyse.exporter(os.path.join('rapports', f"Analyse_produits_{datetime.now():%Y%m%d_%H%M%S}.xlsx"))
+            print(f"✅ Analyse des produits exportée : {chemin}")
+        
+        if input("\nSimuler d'autres règles de tarification ? (o/n) : ").lower().strip() in ['o', 'oui', 'y', 'yes']:
+            self.simuler_tarification()
         
-        if not df_factures.empty and not df_clients.empty:
-            print("\n--- Chiffre d'affaires par client ---")
-            for _, client in df_clients.iterrows():
-                client_factures = df_factures[df_factures['code_client'] == client['code_client']]
-                if not client_factures.empty:
-                    total_client = client_factures['total_ttc'].sum()
-                    print(f"{client['nom']} : {total_client:.2f} FCFA")
+        input("\nAppuyez sur Entrée pour continuer...")
+    
+    def simuler_tarification(self):
+        """Recalculer tout l'historique avec un autre taux de TVA ou d'autres paliers de cartes"""
+        regles = self.data_manager.regles
+        print(f"\nRègles en vigueur : {regles}")
+        try:
+            tva = input(f"Taux de TVA (Entrée pour {regles.taux_tva}) : ").strip()
+            paliers = input("Paliers des cartes, montant TTC:taux (ex. 2000:5,5000:10,10000:15, "
+                            "Entrée pour les garder) : ").strip()
+            autres_regles = ReglesTarification(float(tva) if tva else regles.taux_tva,
+                                               lire_paliers(paliers) if paliers else regles.paliers)
+        except ValueError as erreur:
+            print(f"❌ {erreur}")
+            return
+        
+        simulation = self.data_manager.simuler_tarification(autres_regles)
+        resume = simulation.resume()
+        print(f"\n--- Simulation : {autres_regles} ---")
+        print(f"Chiffre d'affaires : {resume['total_ttc_reel']:.2f} -> {resume['total_ttc_simule']:.2f} FCFA "
+              f"({resume['ecart_ttc']:+.2f} FCFA, {resume['ecart_ttc_pct']:+.2f} %)")
+        print(f"Remises accordées : {resume['remise_reelle']:.2f} -> {resume['remise_simulee']:.2f} FCFA "
+              f"({resume['ecart_remise']:+.2f} FCFA)")
+        print(f"Cartes de réduction : {resume['cartes_reelles']} -> {resume['cartes_simulees']}")
+        
+        print("\n--- Clients les plus touchés (10 premiers) ---")
+        for client in simulation.par_client().head(10).itertuples():
+            nom = client.nom if isinstance(client.nom, str) else client.code_client
+            print(f"{nom} : {client.ecart_ttc:+.2f} FCFA (carte {client.taux_carte_reel}% -> {client.taux_carte_simule}%)")
+        
+        print("\n--- Écart par mois ---")
+        for mois in simulation.par_mois().itertuples():
+            print(f"{mois.mois} : {mois.ecart_ttc:+.2f} FCFA (remise {mois.ecart_remise:+.2f} FCFA)")
+        
+        if input("\nExporter la simulation en Excel ? (o/n) : ").lower().strip() in ['o', 'oui', 'y', 'yes']:
+            if not os.path.exists('rapports'):
+                os.makedirs('rapports')
+            chemin = simulation.exporter(os.path.join('rapports', f"Simulation_tarification_{datetime.now():%Y%m%d_%H%M%S}.xlsx"))
+            print(f"✅ Simulation exportée : {chemin}")
+    
+    def afficher_rendus(self):
+        """Afficher l'état des rendus PDF en arrière-plan"""
+        print("\n" + "="*70)
+        print("                        SUIVI DES RENDUS PDF")
+        print("="*70)
+        
+        travaux = self.file_rendu.etat()
+        if not travaux:
+            print("Aucun rendu depuis le démarrage.")
+        else:
+            print(f"{'Travail':<25} {'Statut':<12} {'Essais':<7} {'Fichier / erreur':<25}")
+            print("-" * 70)
+            for travail in travaux:
+                detail = travail['fichier'] or travail['erreur'] or ''
+                print(f"{travail['id']:<25} {travail['statut']:<12} {travail['tentatives']:<7} {detail}")
+        
+        if any(travail['statut'] in ('échec', 'reporté') for travail in travaux):
+            if input("\nRelancer les rendus en échec ? (o/n) : ").lower().strip() in ['o', 'oui', 'y', 'yes']:
+                print(f"🔁 {self.file_rendu.relancer()} rendu(s) relancé(s).")
+        
+        input("\nAppuyez sur Entrée pour continuer...")
+    
+    def afficher_mesures(self):
+        """Afficher les mesures de performance (menu caché « m »)"""
+        print("\n" + "="*70)
+        print("                      MESURES DE PERFORMANCE")
+        print("="*70)
+        
+        if not mesures.active:
+            print(f"Mesures désactivées. Relancez l'application avec {VARIABLE_ACTIVATION}=1 pour les activer.")
+            input("\nAppuyez sur Entrée pour continuer...")
+            return
+        
+        instantane = mesures.instantane()
+        print(f"{'Opération':<48} {'Appels':>7} {'Moy. ms':>8} {'p95 ms':>8} {'Max ms':>8}")
+        print("-" * 83)
+        for nom, h in instantane['histogrammes'].items():
+            if nom.startswith('operation_secondes'):
+                operation = nom[len('operation_secondes{'):-1]
+                print(f"{operation:<48} {h['nombre']:>7} {h['moyenne'] * 1000:>8.2f} "
+                      f"{h['p95'] * 1000:>8.2f} {h['maximum'] * 1000:>8.2f}")
+        print("\nCompteurs :")
+        for nom, valeur in instantane['compteurs'].items():
+            print(f"  {nom:<45} {valeur:>12}")
+        verrous = instantane['verrous']
+        print(f"\nVerrous : {verrous['acquisitions']} acquisition(s), {verrous['attentes']} attente(s) "
+              f"({verrous['taux_contention']:.0%}), {verrous['duree_attente_s'] * 1000:.0f} ms d'attente au total")
+        
+        choix = input("\nExporter (j = JSON, p = Prometheus, Entrée pour revenir) : ").lower().strip()
+        if choix in ('j', 'p'):
+            os.makedirs('mesures', exist_ok=True)
+            horodatage = datetime.now().strftime('%Y%m%d_%H%M%S')
+            if choix == 'j':
+                chemin = mesures.exporter_json(os.path.join('mesures', f"mesures_{horodatage}.json"))
+            else:
+                chemin = mesures.exporter_prometheus(os.path.join('mesures', f"mesures_{horodatage}.prom"))
+            print(f"✅ Mesures exportées : {chemin}")
         
         input("\nAppuyez sur Entrée pour continuer...")
     
@@ -414,14 +639,23 @@ class ApplicationFacturation:
         if not os.path.exists('data'):
             print("❌ Le dossier 'data' est introuvable. Merci de placer vos fichiers Excel dans ce dossier.")
             return
-        if not os.path.exists(os.path.join('data', 'Clients.xlsx')) or not os.path.exists(os.path.join('data', 'Produits.xlsx')):
+        base_sqlite = os.path.exists(os.path.join('data', FICHIER_SQLITE))
+        if not base_sqlite and (not os.path.exists(os.path.join('data', 'Clients.xlsx')) or not os.path.exists(os.path.join('data', 'Produits.xlsx'))):
             print("❌ Les fichiers 'Clients.xlsx' et/ou 'Produits.xlsx' sont manquants dans le dossier 'data'.")
             print("Merci de placer les fichiers fournis par le professeur dans le dossier 'data'.")
             return
         
+        # Reprendre les rendus PDF interrompus lors de la dernière session
+        repris = self.file_rendu.demarrer()
+        if repris:
+            print(f"🖨️  {repris} rendu(s) PDF en attente repris en arrière-plan.")
+        
+        # Pendant que l'utilisateur lit le menu
+        self.precharger()
+        
         while True:
             self.afficher_menu_principal()
-            choix = input("Votre choix (1-5) : ")
+            choix = input("Votre choix (1-6) : ")
             
             if choix == '1':
                 self.consulter_fichier()
@@ -432,6 +666,18 @@ class ApplicationFacturation:
             elif choix == '4':
                 self.afficher_statistiques()
             elif choix == '5':
+                self.afficher_rendus()
+            elif choix.lower().strip() == 'm':
+                self.afficher_mesures()
+            elif choix == '6':
+                if self.file_rendu.en_attente():
+                    print("⏳ Fin des rendus PDF en cours...")
+                self.file_rendu.arreter()
+                # Replier les journaux des tables dans leurs classeurs avant de quitter
+                # (rien à replier si aucune donnée n'a été ouverte pendant la session)
+                if self._data_manager is not None:
+                    self._data_manager.compacter_factures()
+                self._prechargement.join()
                 print("\n👋 Merci d'avoir utilisé l'Application de Facturation !")
                 break
             else:
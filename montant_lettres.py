@@ -0,0 +1,87 @@
+"""Montants en toutes lettres (français) pour le bas des factures.
+
+Les 1000 premiers nombres sont écrits une fois pour toutes au chargement
+du module ; un montant se compose ensuite de ces groupes de trois
+chiffres. Les montants déjà convertis sont gardés en cache.
+"""
+from functools import lru_cache
+
+UNITES = ["", "un", "deux", "trois", "quatre", "cinq", "six", "sept", "huit", "neuf"]
+DIX_A_DIX_NEUF = ["dix", "onze", "douze", "treize", "quatorze", "quinze", "seize", "dix-sept", "dix-huit", "dix-neuf"]
+DIZAINES = ["", "dix", "vingt", "trente", "quarante", "cinquante", "soixante", "soixante-dix", "quatre-vingt",
+            "quatre-vingt-dix"]
+
+
+def _ecrire_centaine(n):
+    """Écrire un nombre de 0 à 999 ("" pour 0)"""
+    if n == 0:
+        return ""
+    if n < 10:
+        return UNITES[n]
+    if n < 20:
+        return DIX_A_DIX_NEUF[n - 10]
+    if n < 100:
+        d, u = divmod(n, 10)
+        sep = " et " if u == 1 and d != 8 else "-" if u > 0 else ""
+        if d == 7 or d == 9:
+            return DIZAINES[d - 1] + sep + DIX_A_DIX_NEUF[u]
+        return DIZAINES[d] + (sep + UNITES[u] if u else "")
+    c, r = divmod(n, 100)
+    cent = "cent" if c == 1 else UNITES[c] + " cent"
+    if r == 0:
+        return cent + ("s" if c > 1 else "")
+    return cent + " " + _ecrire_centaine(r)
+
+
+# Table de 0 à 999, calculée une seule fois
+CENTAINES = [_ecrire_centaine(n) for n in range(1000)]
+
+
+def _ecrire(n):
+    """Écrire un entier positif, sans l'unité monétaire"""
+    if n < 1000:
+        return CENTAINES[n]
+    if n < 1000000:
+        mille, r = divmod(n, 1000)
+        prefixe = "mille" if mille == 1 else CENTAINES[mille] + " mille"
+    elif n < 1000000000:
+        million, r = divmod(n, 1000000)
+        prefixe = "un million" if million == 1 else CENTAINES[million] + " millions"
+    else:
+        milliard, r = divmod(n, 1000000000)
+        prefixe = "un milliard" if milliard == 1 else _ecrire(milliard) + " milliards"
+    return prefixe if r == 0 else prefixe + " " + _ecrire(r)
+
+
+@lru_cache(maxsize=65536)
+def _en_lettres(n):
+    if n == 0:
+        return "zéro franc CFA"
+    return _ecrire(n) + " francs CFA"
+
+
+def nombre_en_lettres(nombre):
+    """Convertit un montant entier en lettres (français, jusqu'à plusieurs milliards)"""
+    n = int(nombre)
+    if n < 0:
+        raise ValueError(f"Montant négatif : {nombre}")
+    return _en_lettres(n)
+
+
+def nombres_en_lettres(montants):
+    """Convertit toute une colonne de montants ; chaque valeur distincte n'est écrite qu'une fois.
+
+    Retourne une Series alignée si `montants` est une Series pandas, une liste sinon.
+    """
+    if hasattr(montants, 'astype') and hasattr(montants, 'map'):
+        entiers = montants.astype('int64')
+        return entiers.map({n: nombre_en_lettres(n) for n in entiers.unique()})
+    entiers = [int(montant) for montant in montants]
+    lettres = {n: nombre_en_lettres(n) for n in set(entiers)}
+    return [lettres[n] for n in entiers]
+
+
+def statistiques_cache():
+    """Succès et échecs du cache des montants convertis"""
+    info = _en_lettres.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'taille': info.currsize}
@@ -0,0 +1,61 @@
+import re
+from datetime import datetime
+
+# Format historique des numéros : FACT001, FACT002, ...
+PREFIXE_FACTURE = 'FACT'
+LARGEUR_NUMERO = 3
+
+
+class NumeroteurFactures:
+    """Allocation des numéros de facture à partir d'une séquence persistante.
+
+    Le dernier numéro attribué de chaque série est conservé par le stockage
+    et incrémenté sous verrou : l'allocation coûte le même temps quelle que
+    soit la taille de l'historique, et deux terminaux ne reçoivent jamais le
+    même numéro. À la première utilisation d'une série, la séquence part du
+    plus grand numéro déjà présent dans les factures.
+
+    Les numéros d'une vente dont l'enregistrement échoue sont rendus à la
+    séquence (voir Stockage.incrementer_sequence) ; s'il est trop tard, parce
+    qu'un autre terminal a tiré un numéro entre-temps, ils ne sont pas
+    réutilisés et la numérotation présente un trou.
+    """
+
+    def __init__(self, stockage, prefixe=PREFIXE_FACTURE, largeur=LARGEUR_NUMERO, par_annee=False):
+        self.stockage = stockage
+        self.prefixe = prefixe
+        self.largeur = largeur
+        self.par_annee = par_annee
+
+    def serie(self, date=None):
+        """Préfixe de la série : FACT, ou FACT2025- avec une série par année"""
+        if not self.par_annee:
+            return self.prefixe
+        return f"{self.prefixe}{(date or datetime.now()).year}-"
+
+    def formater(self, serie, valeur):
+        """Numéro de facture pour une valeur de la séquence"""
+        return f"{serie}{valeur:0{self.largeur}d}"
+
+    def allouer(self, nombre=1, date=None):
+        """Réserver `nombre` numéros consécutifs et les retourner"""
+        serie = self.serie(date)
+        premier = self.stockage.incrementer_sequence(
+            f"factures:{serie}", nombre, lambda: self._plus_grand_existant(serie)
+        )
+        return [self.formater(serie, valeur) for valeur in range(premier, premier + nombre)]
+
+    def _plus_grand_existant(self, serie):
+        """Plus grande valeur déjà utilisée dans la série (0 si aucune)"""
+        try:
+            df_factures = self.stockage.charger('factures')
+        except FileNotFoundError:
+            return 0
+        if df_factures.empty:
+            return 0
+        valeurs = df_factures['numero_facture'].astype(str).str.extract(
+            f"^{re.escape(serie)}(\\d+)$", expand=False
+        ).dropna()
+        if valeurs.empty:
+            return 0
+        return int(valeurs.astype(int).max())
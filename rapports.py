@@ -0,0 +1,92 @@
+import pandas as pd
+
+
+class RapportVentes:
+    """Rapports de chiffre d'affaires sur une période, calculés par groupby.
+
+    Chaque rapport est un DataFrame prêt à afficher ou à exporter ; aucun ne
+    parcourt les factures ligne par ligne.
+    """
+
+    def __init__(self, df_factures, df_clients=None, debut=None, fin=None):
+        df = df_factures.copy() if not df_factures.empty else pd.DataFrame(
+            columns=['numero_facture', 'code_client', 'date_facture', 'total_ht', 'remise', 'total_ttc'])
+        df['date'] = pd.to_datetime(df['date_facture'], errors='coerce')
+        if debut is not None:
+            df = df[df['date'] >= pd.Timestamp(debut)]
+        if fin is not None:
+            df = df[df['date'] <= pd.Timestamp(fin)]
+        for colonne in ('total_ht', 'remise', 'total_ttc'):
+            df[colonne] = pd.to_numeric(df[colonne], errors='coerce').fillna(0.0)
+        self.factures = df
+        self.clients = df_clients if df_clients is not None else pd.DataFrame(columns=['code_client', 'nom'])
+        self.debut = debut
+        self.fin = fin
+
+    def resume(self):
+        """Totaux de la période"""
+        nombre = len(self.factures)
+        total = float(self.factures['total_ttc'].sum())
+        return {
+            'total_factures': nombre,
+            'chiffre_affaires_total': total,
+            'moyenne_facture': total / nombre if nombre else 0,
+            'facture_plus_elevee': float(self.factures['total_ttc'].max()) if nombre else 0
+        }
+
+    def par_client(self):
+        """Chiffre d'affaires par client, du plus gros au plus petit"""
+        df = self.factures.groupby('code_client', sort=False).agg(
+            nombre_factures=('numero_facture', 'size'),
+            total_ht=('total_ht', 'sum'),
+            remise=('remise', 'sum'),
+            total_ttc=('total_ttc', 'sum')
+        ).reset_index()
+        if not self.clients.empty:
+            noms = self.clients[['code_client', 'nom']].drop_duplicates('code_client')
+            df = df.merge(noms, on='code_client', how='left')
+        else:
+            df['nom'] = None
+        df = df[['code_client', 'nom', 'nombre_factures', 'total_ht', 'remise', 'total_ttc']]
+        return df.sort_values('total_ttc', ascending=False, ignore_index=True)
+
+    def top_clients(self, n=10):
+        """Les `n` clients au plus gros chiffre d'affaires"""
+        return self.par_client().head(n)
+
+    def par_mois(self):
+        """Chiffre d'affaires par mois (AAAA-MM)"""
+        mois = self.factures['date'].dt.strftime('%Y-%m').rename('mois')
+        df = self.factures.groupby(mois).agg(
+            nombre_factures=('numero_facture', 'size'),
+            remise=('remise', 'sum'),
+            total_ttc=('total_ttc', 'sum')
+        ).reset_index()
+        return df.sort_values('mois', ignore_index=True)
+
+    def par_tranche_remise(self):
+        """Chiffre d'affaires par taux de remise appliqué (0, 5, 10, 15 %)"""
+        taux = (self.factures['remise'] / self.factures['total_ht'].where(self.factures['total_ht'] != 0)
+                * 100).fillna(0).round().astype(int).rename('taux_remise')
+        df = self.factures.groupby(taux).agg(
+            nombre_factures=('numero_facture', 'size'),
+            remise=('remise', 'sum'),
+            total_ttc=('total_ttc', 'sum')
+        ).reset_index()
+        return df.sort_values('taux_remise', ignore_index=True)
+
+    def client_par_mois(self):
+        """Tableau croisé du chiffre d'affaires : un client par ligne, un mois par colonne"""
+        return self.factures.assign(mois=self.factures['date'].dt.strftime('%Y-%m')).pivot_table(
+            index='code_client', columns='mois', values='total_ttc', aggfunc='sum', fill_value=0.0
+        )
+
+    def exporter(self, chemin):
+        """Écrire tous les rapports dans un classeur Excel, une feuille par rapport"""
+        with pd.ExcelWriter(chemin) as classeur:
+            pd.DataFrame([self.resume()]).to_excel(classeur, sheet_name='Resume', index=False)
+            self.par_client().to_excel(classeur, sheet_name='Par client', index=False)
+            self.par_mois().to_excel(classeur, sheet_name='Par mois', index=False)
+            self.par_tranche_remise().to_excel(classeur, sheet_name='Par remise', index=False)
+            self.client_par_mois().to_excel(classeur, sheet_name='Client x mois')
+        return chemin
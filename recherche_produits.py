@@ -0,0 +1,239 @@
+import heapq
+import re
+import unicodedata
+from collections import Counter, deque
+from itertools import islice
+
+# Au-delà de ce nombre de produits, un préfixe filtre les candidats des autres termes au lieu de les fournir
+LIMITE_CANDIDATS = 20000
+
+# Nombre de préfixes dont les produits restent en mémoire d'une recherche à l'autre
+PREFIXES_MEMORISES = 64
+
+# Produits classés pour une saisie d'une ou deux lettres, trop courante pour être parcourue en entier
+TAILLE_ECHANTILLON = 1000
+
+# Bits bas de la clé de classement d'un produit : son identifiant
+CLE_IDENTIFIANT = (1 << 32) - 1
+
+# Similarité minimale (Dice sur les trigrammes) pour une correspondance approchée
+SIMILARITE_MINIMALE = 0.5
+
+
+def normaliser(texte):
+    """Texte en minuscules et sans accents ("Câble" -> "cable")"""
+    texte = unicodedata.normalize('NFKD', str(texte))
+    return ''.join(c for c in texte if not unicodedata.combining(c)).lower()
+
+
+def mots(texte):
+    """Mots normalisés d'un texte (lettres et chiffres)"""
+    return re.findall(r'[a-z0-9]+', normaliser(texte))
+
+
+def texte_libelle(libelle):
+    """Libellé d'un produit en texte ; vide s'il manque (cellule vide lue NaN, NULL en SQLite)"""
+    if libelle is None or (isinstance(libelle, float) and libelle != libelle):
+        return ''
+    return str(libelle)
+
+
+def trigrammes(mot):
+    mot = f" {mot} "
+    return {mot[i:i + 3] for i in range(len(mot) - 2)}
+
+
+class NoeudTrie:
+    __slots__ = ('enfants', 'mot')
+
+    def __init__(self):
+        self.enfants = {}
+        self.mot = None
+
+
+class IndexProduits:
+    """Index de recherche des produits sur le code et le libellé.
+
+    Les mots normalisés (code, mots du libellé) forment un trie : une saisie
+    partielle retrouve les produits dont un mot commence par chacun des
+    termes tapés, par intersection des produits de chaque terme. Un terme
+    qu'aucun mot ne commence (faute de frappe) est rapproché des mots de
+    l'index par leurs trigrammes. Les produits sont ajoutés au fil de
+    l'eau, sans reconstruire l'index.
+    """
+
+    def __init__(self, produits=()):
+        self.racine = NoeudTrie()
+        self.produits = []
+        self.mots_produits = []
+        # Clé de classement à score égal, libellés courts d'abord puis ordre du catalogue : un entier
+        # (longueur du libellé, identifiant) dont l'identifiant se relit par CLE_IDENTIFIANT
+        self.cles = []
+        self.index_mots = {}
+        self.index_trigrammes = {}
+        self.codes = {}
+        # Produits des derniers préfixes cherchés : la saisie suivante reprend les mêmes termes
+        self._prefixes = {}
+        # Préfixes de plus de LIMITE_CANDIDATS produits (ils le restent quand le catalogue grandit)
+        self._prefixes_courants = set()
+        self.ajouter(produits)
+
+    def __len__(self):
+        return len(self.produits)
+
+    def ajouter(self, produits):
+        """Indexer des produits (DataFrame ou dicts) ; les codes déjà indexés sont ignorés"""
+        if hasattr(produits, 'to_dict'):
+            produits = produits.to_dict('records')
+        self._prefixes.clear()
+        for produit in produits:
+            code = normaliser(produit['code_produit'])
+            if code in self.codes:
+                continue
+            identifiant = len(self.produits)
+            self.codes[code] = identifiant
+            self.produits.append(produit)
+            libelle = texte_libelle(produit['libelle'])
+            self.cles.append(len(libelle) << 32 | identifiant)
+            mots_produit = tuple(dict.fromkeys(mots(code) + mots(libelle)))
+            self.mots_produits.append(mots_produit)
+            for mot in mots_produit:
+                identifiants = self.index_mots.get(mot)
+                if identifiants is None:
+                    identifiants = self.index_mots[mot] = []
+                    self._inserer_mot(mot)
+                identifiants.append(identifiant)
+
+    def _inserer_mot(self, mot):
+        noeud = self.racine
+        for caractere in mot:
+            suivant = noeud.enfants.get(caractere)
+            if suivant is None:
+                suivant = noeud.enfants[caractere] = NoeudTrie()
+            noeud = suivant
+        noeud.mot = mot
+        # Pas de rapprochement sur les nombres et les codes : une faute y désigne un autre produit
+        if mot.isalpha():
+            for trigramme in trigrammes(mot):
+                self.index_trigrammes.setdefault(trigramme, set()).add(mot)
+
+    def _ids_prefixe(self, prefixe, limite=LIMITE_CANDIDATS):
+        """Produits dont un mot commence par `prefixe` ; None au-delà de `limite` produits"""
+        noeud = self.racine
+        for caractere in prefixe:
+            noeud = noeud.enfants.get(caractere)
+            if noeud is None:
+                return set()
+        identifiants = set()
+        pile = [noeud]
+        while pile:
+            noeud = pile.pop()
+            if noeud.mot is not None:
+                identifiants.update(self.index_mots[noeud.mot])
+                if len(identifiants) > limite:
+                    return None
+            pile.extend(noeud.enfants.values())
+        return identifiants
+
+    def _echantillon_prefixe(self, prefixe):
+        """Jusqu'à TAILLE_ECHANTILLON produits dont un mot commence par `prefixe`, mots les plus courts d'abord"""
+        noeud = self.racine
+        for caractere in prefixe:
+            noeud = noeud.enfants[caractere]
+        identifiants = set()
+        file = deque([noeud])
+        while file and len(identifiants) < TAILLE_ECHANTILLON:
+            noeud = file.popleft()
+            if noeud.mot is not None:
+                identifiants.update(self.index_mots[noeud.mot])
+            file.extend(noeud.enfants.values())
+        return identifiants
+
+    def mots_approches(self, terme, nombre=20):
+        """Mots de l'index proches de `terme` (trigrammes communs), du plus proche au moins proche"""
+        trigrammes_terme = trigrammes(terme)
+        communs = Counter()
+        for trigramme in trigrammes_terme:
+            communs.update(self.index_trigrammes.get(trigramme, ()))
+        similarites = []
+        for mot, nombre_communs in communs.items():
+            similarite = 2 * nombre_communs / (len(trigrammes_terme) + len(mot))
+            if similarite >= SIMILARITE_MINIMALE:
+                similarites.append((similarite, mot))
+        return [mot for _, mot in heapq.nlargest(nombre, similarites)]
+
+    def rechercher(self, requete, nombre=10):
+        """Les `nombre` produits qui correspondent le mieux à la saisie (code ou mots du libellé)"""
+        termes = sorted(set(mots(requete)), key=len, reverse=True)
+        if not termes:
+            return []
+
+        # Produits de chaque terme ; None pour un préfixe trop courant, vérifié ensuite mot à mot
+        ensembles = []
+        courants = []
+        for terme in termes:
+            if terme in self._prefixes_courants:
+                courants.append(terme)
+                continue
+            if terme not in self._prefixes:
+                if len(self._prefixes) >= PREFIXES_MEMORISES:
+                    del self._prefixes[next(iter(self._prefixes))]
+                self._prefixes[terme] = self._ids_prefixe(terme)
+            identifiants = self._prefixes[terme]
+            if identifiants is None:
+                self._prefixes_courants.add(terme)
+                courants.append(terme)
+                continue
+            if not identifiants:
+                # Un terme que rien ne rapproche n'élimine pas les produits des autres termes
+                identifiants = {i for mot in self.mots_approches(terme) for i in self.index_mots[mot]}
+                if not identifiants:
+                    continue
+            ensembles.append(identifiants)
+
+        if ensembles:
+            ensembles.sort(key=len)
+            candidats = ensembles[0].intersection(*ensembles[1:])
+        elif courants:
+            # Uniquement des préfixes très courants (une ou deux lettres) : classement sur un échantillon
+            candidats = self._echantillon_prefixe(courants.pop(0))
+        else:
+            return []
+
+        # Score : termes qui sont un mot entier du produit, et le code exact en tête
+        scores = Counter()
+        for terme in termes:
+            exacts = self.index_mots.get(terme)
+            if exacts:
+                communs = candidats.intersection(exacts)
+                # Un mot commun à tous les candidats ne les départage pas
+                if len(communs) < len(candidats):
+                    scores.update(communs)
+        code = self.codes.get(normaliser(requete).strip())
+        if code in candidats:
+            scores[code] += len(termes) + 1
+
+        classes = self._classer(candidats, scores, nombre)
+        if courants:
+            # Préfixes courants vérifiés sur les mieux classés seulement, jusqu'à en avoir `nombre`
+            classes = (i for i in classes
+                       if all(any(mot.startswith(terme) for mot in self.mots_produits[i]) for terme in courants))
+        return [dict(self.produits[i]) for i in islice(classes, nombre)]
+
+    def _classer(self, candidats, scores, nombre):
+        """Candidats du meilleur au moins bon : score décroissant, puis libellé court.
+
+        Seuls les `nombre` premiers de chaque score sont triés d'emblée ; le
+        reste ne l'est que si l'appelant va plus loin.
+        """
+        par_score = {}
+        for i, score in scores.items():
+            par_score.setdefault(score, []).append(i)
+        groupes = [par_score[score] for score in sorted(par_score, reverse=True)]
+        groupes.append([i for i in candidats if i not in scores] if scores else candidats)
+        for groupe in groupes:
+            premiers = heapq.nsmallest(nombre, map(self.cles.__getitem__, groupe))
+            yield from (cle & CLE_IDENTIFIANT for cle in premiers)
+            if len(groupe) > nombre:
+                suivants = sorted(map(self.cles.__getitem__, groupe))[nombre:]
+                yield from (cle & CLE_IDENTIFIANT for cle in suivants)
@@ -0,0 +1,297 @@
+"""Service HTTP local de facturation, pour la boutique en ligne et les caisses mobiles.
+
+Les tables restent en mémoire (cache du stockage, préchargé au démarrage)
+et les PDF sont rendus par la file de rendu en arrière-plan. Quand trop de
+requêtes sont en cours ou que la file de rendu est pleine, le service
+répond 503 avec un en-tête Retry-After au lieu de s'engorger.
+
+Points d'accès (JSON) :
+- GET  /sante
+- GET  /clients/<code>             client et carte de réduction
+- POST /clients                    {"code_client", "nom", "contact", "IFU"}
+- GET  /produits/<code>
+- POST /factures                   {"code_client", "produits": [{"code_produit", "quantite"}],
+                                    "client": {"nom", "contact", "IFU"} pour un nouveau client}
+- GET  /factures/<numero>/pdf      PDF de la facture (202 tant qu'il n'est pas rendu)
+- GET  /statistiques
+
+Usage : python service_http.py [--port 8080] [--requetes-max 32] [--workers-pdf 2] [--file-max 100]
+"""
+import argparse
+import json
+import os
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from data_manager import DataManager
+from file_rendu import FilePleine, FileRendu, valeur_json
+from tarification import calculer_totaux, ligne_facture
+
+
+class ErreurRequete(Exception):
+    """Requête refusée : statut HTTP et message renvoyés au client"""
+
+    def __init__(self, statut, message):
+        super().__init__(message)
+        self.statut = statut
+
+
+class ServiceFacturation:
+    """Opérations du service, partagées par les threads de requêtes.
+
+    Au plus `requetes_max` requêtes sont traitées en même temps ; au-delà,
+    la requête est refusée immédiatement (503). Une facture n'est créée que
+    si la file de rendu peut encore recevoir son PDF.
+    """
+
+    def __init__(self, data_manager=None, file_rendu=None, requetes_max=32):
+        self.data_manager = data_manager if data_manager is not None else DataManager()
+        self.file_rendu = file_rendu if file_rendu is not None else FileRendu(ouvrir=False)
+        self._places = threading.BoundedSemaphore(requetes_max)
+        self.refus = 0
+
+    def demarrer(self):
+        """Lancer la file de rendu et charger les tables en mémoire"""
+        os.makedirs('factures', exist_ok=True)
+        os.makedirs('cartes', exist_ok=True)
+        self.file_rendu.demarrer()
+        self.data_manager.charger_clients()
+        self.data_manager.charger_produits()
+        self.data_manager.charger_cartes()
+        self.data_manager.charger_factures()
+
+    def arreter(self):
+        """Terminer les rendus en cours et replier les journaux des tables"""
+        self.file_rendu.arreter()
+        self.data_manager.compacter_factures()
+
+    def entrer(self):
+        """Réserver une place de traitement ; ErreurRequete 503 si le service est saturé"""
+        if not self._places.acquire(blocking=False):
+            self.refus += 1
+            raise ErreurRequete(503, "Service saturé, réessayer plus tard")
+
+    def sortir(self):
+        self._places.release()
+
+    def sante(self):
+        return {'statut': 'ok', 'rendus_en_attente': self.file_rendu.en_attente(),
+                'file_rendu_pleine': self.file_rendu.est_pleine(), 'requetes_refusees': self.refus}
+
+    def client(self, code_client):
+        client = self.data_manager.obtenir_client(code_client)
+        if client is None:
+            raise ErreurRequete(404, f"Client {code_client} introuvable")
+        return dict(client, carte=self.data_manager.obtenir_carte_client(code_client))
+
+    def creer_client(self, corps):
+        code_client = _champ(corps, 'code_client')
+        valide, message = self.data_manager.ajouter_client(
+            code_client, _champ(corps, 'nom'), _champ(corps, 'contact'), _champ(corps, 'IFU'))
+        if not valide:
+            raise ErreurRequete(409, message)
+        return self.data_manager.obtenir_client(code_client)
+
+    def produit(self, code_produit):
+        produit = self.data_manager.obtenir_produit(code_produit)
+        if produit is None:
+            raise ErreurRequete(404, f"Produit {code_produit} introuvable")
+        return produit
+
+    def creer_facture(self, corps):
+        """Enregistrer une vente (client, facture, lignes, carte) et demander son PDF"""
+        code_client = _champ(corps, 'code_client')
+        commande = corps.get('produits')
+        if not isinstance(commande, list) or not commande:
+            raise ErreurRequete(400, "La facture doit contenir au moins un produit")
+        session = self.data_manager.session()
+        if corps.get('client'):
+            nouveau = corps['client']
+            valide, message = session.ajouter_client(code_client, _champ(nouveau, 'nom'),
+                                                     _champ(nouveau, 'contact'), _champ(nouveau, 'IFU'))
+            if not valide:
+                raise ErreurRequete(409, message)
+        client_info = session.obtenir_client(code_client)
+        if client_info is None:
+            raise ErreurRequete(404, f"Client {code_client} introuvable")
+
+        produits_factures = []
+        for article in commande:
+            produit = self.produit(_champ(article, 'code_produit'))
+            try:
+                quantite = int(article.get('quantite', 0))
+            except (TypeError, ValueError):
+                quantite = 0
+            if quantite <= 0:
+                raise ErreurRequete(400, f"Quantité invalide pour {produit['code_produit']}")
+            produits_factures.append(ligne_facture(produit, quantite))
+
+        carte_client = session.obtenir_carte_client(code_client)
+        totaux = calculer_totaux(produits_factures, carte_client['taux_reduction'] if carte_client else 0,
+                                 self.data_manager.regles)
+        session.enregistrer_facture(code_client, totaux['total_ht'], totaux['remise'], totaux['total_ht_remise'],
+                                    totaux['tva'], totaux['total_ttc'], produits_factures)
+        if not carte_client and totaux['total_ttc'] >= self.data_manager.regles.seuil_carte:
+            session.creer_carte_reduction(code_client, totaux['total_ttc'])
+
+        # Contre-pression : pas de nouvelle vente si son PDF ne peut pas être mis en file
+        if self.file_rendu.est_pleine():
+            session.annuler()
+            raise ErreurRequete(503, "File de rendu PDF pleine, réessayer plus tard")
+        try:
+            vente = session.valider(self.file_rendu)
+        except ValueError as e:
+            raise ErreurRequete(409, str(e))
+        try:
+            self.file_rendu.lancer(vente['travaux'])
+            rendu = 'en attente'
+        except FilePleine:
+            # Enregistré sur disque : rendu au prochain démarrage ou à la relance
+            rendu = 'reporté'
+        numero_facture = vente['numero_facture']
+        return dict(totaux, numero_facture=numero_facture, code_client=code_client, carte=vente['carte'],
+                    rendu=rendu, pdf=f"/factures/{numero_facture}/pdf")
+
+    def pdf_facture(self, numero_facture):
+        """Chemin du PDF rendu ; ErreurRequete 202 s'il est en cours, 404 s'il est inconnu"""
+        travail = self.file_rendu.travail(f"facture_{numero_facture}")
+        if travail is not None and travail['statut'] != 'terminé':
+            if travail['statut'] == 'échec':
+                raise ErreurRequete(500, f"Échec du rendu : {travail['erreur']}")
+            raise ErreurRequete(202, f"Rendu {travail['statut']}")
+        chemin = os.path.join('factures', f"Facture_{numero_facture}.pdf")
+        if not os.path.exists(chemin):
+            raise ErreurRequete(404, f"Facture {numero_facture} introuvable")
+        return chemin
+
+    def statistiques(self):
+        return self.data_manager.obtenir_statistiques_ventes()
+
+
+def _champ(corps, nom):
+    """Champ texte obligatoire d'un corps JSON"""
+    valeur = corps.get(nom) if isinstance(corps, dict) else None
+    if valeur is None or str(valeur).strip() == '':
+        raise ErreurRequete(400, f"Champ obligatoire manquant : {nom}")
+    return str(valeur).strip()
+
+
+class GestionnaireRequetes(BaseHTTPRequestHandler):
+    """Traduction HTTP <-> ServiceFacturation (une instance par requête)"""
+
+    protocol_version = 'HTTP/1.1'
+    # En-têtes et corps partent sans attendre l'accusé de réception (algorithme de Nagle)
+    disable_nagle_algorithm = True
+    service = None
+
+    def log_message(self, format, *args):
+        # Pas de journal par requête sur la console
+        pass
+
+    def do_GET(self):
+        self._traiter('GET')
+
+    def do_POST(self):
+        self._traiter('POST')
+
+    def _traiter(self, methode):
+        morceaux = [m for m in urlsplit(self.path).path.split('/') if m]
+        try:
+            corps = self._lire_corps() if methode == 'POST' else None
+            self.service.entrer()
+            try:
+                self._router(methode, morceaux, corps)
+            finally:
+                self.service.sortir()
+        except ErreurRequete as e:
+            self._repondre(e.statut, {'erreur': str(e)})
+        except Exception as e:
+            self._repondre(500, {'erreur': f"Erreur interne : {e}"})
+
+    def _router(self, methode, morceaux, corps):
+        service = self.service
+        route = (methode, morceaux[0] if morceaux else '', len(morceaux))
+        if route == ('GET', 'sante', 1):
+            self._repondre(200, service.sante())
+        elif route == ('GET', 'clients', 2):
+            self._repondre(200, service.client(morceaux[1]))
+        elif route == ('POST', 'clients', 1):
+            self._repondre(201, service.creer_client(corps))
+        elif route == ('GET', 'produits', 2):
+            self._repondre(200, service.produit(morceaux[1]))
+        elif route == ('POST', 'factures', 1):
+            self._repondre(201, service.creer_facture(corps))
+        elif route == ('GET', 'factures', 3) and morceaux[2] == 'pdf':
+            self._envoyer_fichier(service.pdf_facture(morceaux[1]))
+        elif route == ('GET', 'statistiques', 1):
+            self._repondre(200, service.statistiques())
+        else:
+            raise ErreurRequete(404, f"Route inconnue : {methode} {self.path}")
+
+    def _lire_corps(self):
+        longueur = int(self.headers.get('Content-Length') or 0)
+        try:
+            return json.loads(self.rfile.read(longueur) or b'{}')
+        except json.JSONDecodeError:
+            raise ErreurRequete(400, "Corps JSON invalide")
+
+    def _repondre(self, statut, donnees):
+        contenu = json.dumps(donnees, ensure_ascii=False, default=valeur_json).encode('utf-8')
+        self.send_response(statut)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(contenu)))
+        if statut in (202, 503):
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(contenu)
+
+    def _envoyer_fichier(self, chemin):
+        with open(chemin, 'rb') as fichier:
+            contenu = fichier.read()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(contenu)))
+        self.end_headers()
+        self.wfile.write(contenu)
+
+
+def creer_serveur(service, hote='127.0.0.1', port=8080):
+    """Serveur HTTP (un thread par connexion) adossé à `service` ; port 0 pour un port libre"""
+    gestionnaire = type('Gestionnaire', (GestionnaireRequetes,), {'service': service})
+    serveur = ThreadingHTTPServer((hote, port), gestionnaire)
+    serveur.daemon_threads = True
+    return serveur
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hote', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--requetes-max', type=int, default=32, help="requêtes traitées en même temps")
+    parser.add_argument('--workers-pdf', type=int, default=2, help="threads de rendu PDF")
+    parser.add_argument('--file-max', type=int, default=100, help="capacité de la file de rendu PDF")
+    args = parser.parse_args()
+
+    service = ServiceFacturation(file_rendu=FileRendu(nb_workers=args.workers_pdf, taille_max=args.file_max,
+                                                      ouvrir=False),
+                                 requetes_max=args.requetes_max)
+    service.demarrer()
+    serveur = creer_serveur(service, args.hote, args.port)
+    # Arrêt propre aussi sur SIGTERM (service lancé en arrière-plan)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print(f"🚀 Service de facturation sur http://{args.hote}:{serveur.server_address[1]} (Ctrl+C pour arrêter)")
+    try:
+        serveur.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        serveur.server_close()
+        print("⏳ Fin des rendus PDF en cours...")
+        service.arreter()
+        print("👋 Service arrêté.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+class SessionVente:
+    """Unité de travail d'une vente.
+
+    Le nouveau client, la facture et la carte de réduction sont d'abord
+    préparés en mémoire, pendant la saisie, sans rien écrire. valider() les
+    enregistre ensuite dans une seule transaction du stockage (une lecture
+    et une écriture par table), avec le numéro de facture et, si une file
+    de rendu est fournie, les travaux PDF correspondants. Si une étape
+    échoue, rien n'est enregistré ; annuler() abandonne la vente.
+    """
+
+    def __init__(self, data_manager):
+        self.data_manager = data_manager
+        self.client = None
+        self.facture = None
+        self.carte = None
+        self.etat = 'ouverte'
+        self._cartes = {}
+
+    def _verifier_ouverte(self):
+        if self.etat != 'ouverte':
+            raise RuntimeError(f"Session de vente {self.etat}")
+
+    def ajouter_client(self, code_client, nom, contact, ifu):
+        """Préparer un nouveau client, enregistré avec la facture"""
+        self._verifier_ouverte()
+        valide, message = self.data_manager.verifier_client(code_client, ifu)
+        if not valide:
+            return False, message
+        self.client = {'code_client': code_client, 'nom': nom, 'contact': contact, 'IFU': ifu}
+        return True, "Client prêt (enregistré avec la facture)"
+
+    def obtenir_client(self, code_client):
+        """Client préparé dans la session ou client existant"""
+        if self.client is not None and self.client['code_client'] == code_client:
+            return dict(self.client)
+        return self.data_manager.obtenir_client(code_client)
+
+    def obtenir_carte_client(self, code_client):
+        """Carte existante du client (lue une seule fois par session)"""
+        if self.client is not None and self.client['code_client'] == code_client:
+            return None
+        if code_client not in self._cartes:
+            self._cartes[code_client] = self.data_manager.obtenir_carte_client(code_client)
+        return self._cartes[code_client]
+
+    def enregistrer_facture(self, code_client, total_ht, remise, total_ht_remise, tva, total_ttc,
+                            produits_factures=None):
+        """Préparer la facture ; son numéro est attribué à la validation"""
+        self._verifier_ouverte()
+        self.facture = {
+            'code_client': code_client,
+            'total_ht': total_ht,
+            'remise': remise,
+            'total_ht_remise': total_ht_remise,
+            'tva': tva,
+            'total_ttc': total_ttc,
+            'produits_factures': produits_factures
+        }
+
+    def creer_carte_reduction(self, code_client, total_facture):
+        """Préparer la carte de réduction due pour ce montant ; retourne son taux, ou None"""
+        self._verifier_ouverte()
+        taux = self.data_manager.regles.taux_reduction_pour(total_facture)
+        if taux is None or self.obtenir_carte_client(code_client) is not None:
+            return None
+        self.carte = (code_client, total_facture)
+        return taux
+
+    def valider(self, file_rendu=None):
+        """Enregistrer client, facture, lignes et carte ensemble.
+
+        Avec `file_rendu`, les rendus PDF sont préparés sur disque dans la
+        même unité de travail ; ils sont à lancer ensuite avec
+        file_rendu.lancer(resultat['travaux']). Retourne un dict avec
+        'numero_facture', 'carte' (la carte créée ou None) et 'travaux'.
+        """
+        self._verifier_ouverte()
+        data_manager = self.data_manager
+        numero_facture = None
+        nouvelle_carte = None
+        travaux = []
+        try:
+            with data_manager.transaction():
+                if self.client is not None:
+                    client = self.client
+                    valide, message = data_manager.ajouter_client(
+                        client['code_client'], client['nom'], client['contact'], client['IFU'])
+                    if not valide:
+                        # Un autre terminal a pu créer ce client pendant la saisie
+                        raise ValueError(message)
+                if self.facture is not None:
+                    facture = self.facture
+                    numero_facture = data_manager.obtenir_prochain_numero_facture()
+                    data_manager.enregistrer_facture(
+                        numero_facture, facture['code_client'], facture['total_ht'], facture['remise'],
+                        facture['total_ht_remise'], facture['tva'], facture['total_ttc'],
+                        facture['produits_factures'])
+                if self.carte is not None:
+                    nouvelle_carte = data_manager.creer_carte_reduction(*self.carte)
+                if file_rendu is not None and self.facture is not None:
+                    client_info = self.obtenir_client(facture['code_client'])
+                    travaux.append(file_rendu.preparer_facture(
+                        numero_facture, client_info, facture['produits_factures'], facture['total_ht'],
+                        facture['remise'], facture['total_ht_remise'], facture['tva'], facture['total_ttc'],
+                        data_manager.regles.taux_tva))
+                    if nouvelle_carte:
+                        travaux.append(file_rendu.preparer_carte(client_info, nouvelle_carte))
+        except BaseException:
+            if file_rendu is not None:
+                file_rendu.abandonner(travaux)
+            self.etat = 'annulée'
+            raise
+        self.etat = 'validée'
+        return {'numero_facture': numero_facture, 'carte': nouvelle_carte, 'travaux': travaux}
+
+    def annuler(self):
+        """Abandonner la vente : rien de ce qui a été préparé n'est enregistré"""
+        if self.etat == 'ouverte':
+            self.etat = 'annulée'
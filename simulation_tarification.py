@@ -0,0 +1,170 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+
+class SimulationTarification:
+    """Historique des factures recalculé avec d'autres règles de tarification (voir tarification.py).
+
+    Les factures sont rejouées dans leur ordre d'enregistrement : un client
+    reçoit la carte du palier atteint par sa première facture au-dessus du
+    seuil, et la remise de sa carte s'applique aux factures suivantes. Tout
+    se calcule en une passe vectorisée (première facture éligible par
+    minimum.at, palier par searchsorted, sommes par bincount par client et
+    par mois), sans boucle sur les factures. Les montants réels sont ceux
+    enregistrés ; avec les règles en vigueur, la simulation les retrouve à
+    l'identique. Pour comparer plusieurs jeux de règles, avec_regles reprend
+    les factures déjà préparées (codes et mois indexés) : seul le calcul est
+    refait.
+    """
+
+    def __init__(self, df_factures, regles, df_clients=None, df_cartes=None):
+        self.regles = regles
+        self.clients = df_clients if df_clients is not None else pd.DataFrame(columns=['code_client', 'nom'])
+        self.cartes = df_cartes if df_cartes is not None else pd.DataFrame(columns=['code_client', 'taux_reduction'])
+        if df_factures.empty:
+            df_factures = pd.DataFrame(columns=['numero_facture', 'code_client', 'date_facture', 'total_ht',
+                                                'remise', 'tva', 'total_ttc'])
+        self.numeros = df_factures['numero_facture'].to_numpy()
+        self.id_client, self.codes_clients = pd.factorize(df_factures['code_client'], use_na_sentinel=False)
+        self.id_mois, self.mois = self._mois(df_factures['date_facture'])
+        self.total_ht = self._montants(df_factures['total_ht'])
+        self.remise_reelle = self._montants(df_factures['remise'])
+        self.tva_reelle = self._montants(df_factures['tva'])
+        self.ttc_reel = self._montants(df_factures['total_ttc'])
+        self._simuler()
+
+    @staticmethod
+    def _montants(colonne):
+        return pd.to_numeric(colonne, errors='coerce').to_numpy(dtype=np.float64, na_value=0.0)
+
+    @staticmethod
+    def _mois(dates):
+        """Indice du mois (AAAA-MM) de chaque facture ; les dates distinctes sont peu nombreuses"""
+        id_date, dates_distinctes = pd.factorize(dates, use_na_sentinel=False)
+        mois_dates = pd.to_datetime(pd.Series(dates_distinctes), errors='coerce').dt.strftime('%Y-%m').fillna('')
+        id_mois_date, mois = pd.factorize(mois_dates, sort=True)
+        return id_mois_date[id_date] if len(id_date) else id_date, list(mois)
+
+    def _simuler(self):
+        taux_tva = self.regles.taux_tva
+        seuils = np.array([seuil for seuil, _ in reversed(self.regles.paliers)])
+        taux_paliers = np.array([taux for _, taux in reversed(self.regles.paliers)])
+
+        ht = self.total_ht
+        # Montant TTC sans remise : celui qui décide de la carte (mêmes opérations que calculer_totaux)
+        ttc_sans_remise = ht + ht * taux_tva
+        eligibles = np.flatnonzero(ttc_sans_remise >= seuils[0])
+
+        # Première facture éligible de chaque client, dans l'ordre d'enregistrement : elle crée sa carte
+        aucune = len(ht)
+        premiere = np.full(len(self.codes_clients), aucune, dtype=np.int64)
+        np.minimum.at(premiere, self.id_client[eligibles], eligibles)
+        avec_carte = premiere < aucune
+        factures_carte = premiere[avec_carte]
+        palier = np.searchsorted(seuils, ttc_sans_remise[factures_carte], side='right') - 1
+        taux_client = np.zeros(len(self.codes_clients), dtype=np.int64)
+        taux_client[avec_carte] = taux_paliers[palier]
+
+        # La remise de la carte s'applique aux factures suivantes du client
+        remisees = np.arange(len(ht)) > premiere[self.id_client]
+        taux = np.where(remisees, taux_client[self.id_client], 0)
+        remise = ht * (taux / 100)
+        ht_remise = ht - remise
+        tva = ht_remise * taux_tva
+
+        self.taux_simule = taux
+        self.remise_simulee = remise
+        self.tva_simulee = tva
+        self.ttc_simule = ht_remise + tva
+        self.carte_simulee = np.zeros(len(ht), dtype=bool)
+        self.carte_simulee[factures_carte] = True
+        self.taux_carte_simule = taux_client
+
+    def avec_regles(self, regles):
+        """Le même historique simulé avec d'autres règles"""
+        simulation = copy.copy(self)
+        simulation.regles = regles
+        simulation._simuler()
+        return simulation
+
+    def _par(self, indices, nombre):
+        """Sommes réelles, simulées et écarts par groupe (client ou mois)"""
+        def somme(valeurs):
+            return np.bincount(indices, weights=valeurs, minlength=nombre)
+
+        df = pd.DataFrame({
+            'nombre_factures': np.bincount(indices, minlength=nombre),
+            'total_ttc_reel': somme(self.ttc_reel),
+            'total_ttc_simule': somme(self.ttc_simule),
+            'remise_reelle': somme(self.remise_reelle),
+            'remise_simulee': somme(self.remise_simulee),
+        })
+        df['ecart_ttc'] = df['total_ttc_simule'] - df['total_ttc_reel']
+        df['ecart_remise'] = df['remise_simulee'] - df['remise_reelle']
+        return df
+
+    def resume(self):
+        """Totaux réels et simulés de tout l'historique"""
+        ttc_reel = float(self.ttc_reel.sum())
+        ttc_simule = float(self.ttc_simule.sum())
+        return {
+            'regles': repr(self.regles),
+            'nombre_factures': len(self.ttc_reel),
+            'total_ttc_reel': ttc_reel,
+            'total_ttc_simule': ttc_simule,
+            'ecart_ttc': ttc_simule - ttc_reel,
+            'ecart_ttc_pct': (ttc_simule - ttc_reel) / ttc_reel * 100 if ttc_reel else 0,
+            'remise_reelle': float(self.remise_reelle.sum()),
+            'remise_simulee': float(self.remise_simulee.sum()),
+            'ecart_remise': float(self.remise_simulee.sum() - self.remise_reelle.sum()),
+            'tva_reelle': float(self.tva_reelle.sum()),
+            'tva_simulee': float(self.tva_simulee.sum()),
+            'cartes_reelles': int(self.cartes['code_client'].nunique()),
+            'cartes_simulees': int(np.count_nonzero(self.taux_carte_simule))
+        }
+
+    def par_client(self):
+        """Écarts par client, des plus touchés aux moins touchés"""
+        df = self._par(self.id_client, len(self.codes_clients))
+        df.insert(0, 'code_client', self.codes_clients)
+        taux_reels = self.cartes.drop_duplicates('code_client').set_index('code_client')['taux_reduction']
+        df['taux_carte_reel'] = df['code_client'].map(taux_reels).fillna(0).astype(int)
+        df['taux_carte_simule'] = self.taux_carte_simule
+        if not self.clients.empty:
+            noms = self.clients[['code_client', 'nom']].drop_duplicates('code_client')
+            df = df.merge(noms, on='code_client', how='left')
+        else:
+            df['nom'] = None
+        df = df[['code_client', 'nom', 'nombre_factures', 'taux_carte_reel', 'taux_carte_simule',
+                 'total_ttc_reel', 'total_ttc_simule', 'ecart_ttc', 'remise_reelle', 'remise_simulee',
+                 'ecart_remise']]
+        return df.sort_values('ecart_ttc', key=abs, ascending=False, kind='stable', ignore_index=True)
+
+    def par_mois(self):
+        """Écarts par mois (AAAA-MM)"""
+        df = self._par(self.id_mois, len(self.mois))
+        df.insert(0, 'mois', self.mois)
+        df.insert(2, 'cartes_simulees', np.bincount(self.id_mois, weights=self.carte_simulee,
+                                                    minlength=len(self.mois)).astype(int))
+        return df
+
+    def factures(self):
+        """Détail par facture : taux de remise et montants simulés"""
+        return pd.DataFrame({
+            'numero_facture': self.numeros,
+            'code_client': self.codes_clients.take(self.id_client),
+            'taux_remise_simule': self.taux_simule,
+            'remise_simulee': self.remise_simulee,
+            'total_ttc_reel': self.ttc_reel,
+            'total_ttc_simule': self.ttc_simule,
+        })
+
+    def exporter(self, chemin):
+        """Écrire le résumé et les écarts dans un classeur Excel, une feuille par rapport"""
+        with pd.ExcelWriter(chemin) as classeur:
+            pd.DataFrame([self.resume()]).to_excel(classeur, sheet_name='Resume', index=False)
+            self.par_client().to_excel(classeur, sheet_name='Par client', index=False)
+            self.par_mois().to_excel(classeur, sheet_name='Par mois', index=False)
+        return chemin
@@ -0,0 +1,767 @@
+import json
+import os
+import threading
+from contextlib import ExitStack, contextmanager
+
+import numpy as np
+import pandas as pd
+
+import agregats_ventes
+from cache_persistant import CachePersistant
+from journal_ajouts import JournalAjouts
+from lecture_xlsx import lire_lignes_xlsx
+from tables import FICHIER_SQLITE, TABLES, TRIS_NUMERIQUES
+from verrou import VerrouFichier, ecrire_atomiquement, remplacer_atomiquement, statistiques_verrous
+
+# Tables dont la colonne de recherche désigne une seule ligne : un doublon est refusé à l'écriture
+TABLES_CLE_UNIQUE = ('clients', 'produits', 'factures', 'cartes')
+
+# Types des colonnes des lignes de facture, pour une lecture CSV rapide
+TYPES_LIGNES_FACTURES = {
+    'numero_facture': str, 'date_facture': str, 'code_client': str, 'code_produit': str,
+    'libelle': str, 'prix_unitaire': float, 'quantite': 'int64', 'total_ht': float
+}
+
+# Borne supérieure des valeurs qui commencent par un préfixe donné
+FIN_PREFIXE = '\U0010ffff'
+
+# Lignes lues à la fois par parcourir()
+TAILLE_PAQUET = 500
+
+
+class EntreeCache:
+    """Table en cache avec ses index de clés construits à la demande"""
+
+    def __init__(self, signature, df):
+        self.signature = signature
+        self.df = df
+        self.index = {}
+        self.lignes = {}
+        self.ordres = {}
+
+    def index_colonne(self, colonne):
+        """Index clé -> position de la première ligne portant cette clé"""
+        index = self.index.get(colonne)
+        if index is None:
+            if colonne in self.df.columns:
+                valeurs = self.df[colonne].tolist()
+                # Parcours à l'envers : la première occurrence l'emporte, comme iloc[0]
+                index = dict(zip(reversed(valeurs), range(len(valeurs) - 1, -1, -1)))
+            else:
+                index = {}
+            self.index[colonne] = index
+        return index
+
+    def ordre(self, colonne):
+        """Positions des lignes triées sur `colonne`, et valeurs de la colonne dans cet ordre"""
+        ordre = self.ordres.get(colonne)
+        if ordre is None:
+            serie = self.df[colonne]
+            # Texte (object, ou str depuis pandas 3) : les cellules vides se trient en tête, comme NULL en SQLite
+            if not pd.api.types.is_numeric_dtype(serie):
+                serie = serie.fillna('').astype(str)
+            valeurs = serie.to_numpy()
+            positions = valeurs.argsort(kind='stable')
+            ordre = (positions, valeurs[positions])
+            self.ordres[colonne] = ordre
+        return ordre
+
+    def positions(self, colonne=None, prefixe=None, decroissant=False):
+        """Positions des lignes dans l'ordre de `colonne` (ordre de la table si None).
+
+        Avec `prefixe`, seules les lignes dont la valeur commence par `prefixe`
+        sont retenues, par recherche dichotomique dans les valeurs triées.
+        """
+        if colonne is None:
+            positions = np.arange(len(self.df))
+        else:
+            positions, valeurs = self.ordre(colonne)
+            if prefixe:
+                debut = valeurs.searchsorted(prefixe)
+                fin = valeurs.searchsorted(prefixe + FIN_PREFIXE)
+                positions = positions[debut:fin]
+        return positions[::-1] if decroissant else positions
+
+    def ligne(self, colonne, cle):
+        """Ligne (dict) correspondant à la clé, ou None"""
+        position = self.index_colonne(colonne).get(cle)
+        if position is None:
+            return None
+        lignes = self.lignes.setdefault(colonne, {})
+        ligne = lignes.get(position)
+        if ligne is None:
+            ligne = self.df.iloc[position].to_dict()
+            lignes[position] = ligne
+        return dict(ligne)
+
+    def prolonger(self, signature, df):
+        """Nouvelle entrée pour `df` qui prolonge self.df, en reprenant les index existants"""
+        entree = EntreeCache(signature, df)
+        debut = len(self.df)
+        for colonne, index in self.index.items():
+            index = dict(index)
+            if colonne in df.columns:
+                for position, cle in enumerate(df[colonne].iloc[debut:].tolist(), debut):
+                    index.setdefault(cle, position)
+            entree.index[colonne] = index
+        entree.lignes = {colonne: dict(lignes) for colonne, lignes in self.lignes.items()}
+        return entree
+
+
+class CacheTables:
+    """Cache des tables Excel partagé par tout le processus.
+
+    Chaque entrée garde le DataFrame lu ainsi que la signature du fichier
+    (mtime, taille) au moment de la lecture. Une modification du fichier,
+    par ce processus ou par un autre, invalide l'entrée au prochain accès.
+    """
+
+    def __init__(self):
+        self._entrees = {}
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def signature(chemin, dependances=()):
+        """Signature (mtime, taille) d'un fichier, None s'il n'existe pas.
+
+        Avec des `dependances`, la signature couvre aussi ces fichiers.
+        """
+        signatures = []
+        for fichier in (chemin,) + tuple(dependances):
+            try:
+                st = os.stat(fichier)
+            except FileNotFoundError:
+                return None
+            signatures.append((st.st_mtime_ns, st.st_size))
+        return signatures[0] if len(signatures) == 1 else tuple(signatures)
+
+    def entree(self, chemin, lecteur, dependances=()):
+        """Retourner l'entrée en cache ou relire la table avec `lecteur` si elle est périmée"""
+        cle = os.path.abspath(chemin)
+        signature = self.signature(chemin, dependances)
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if signature is not None and entree is not None and entree.signature == signature:
+                self.hits += 1
+                return entree
+            self.misses += 1
+        df = lecteur(chemin)
+        return self.memoriser(chemin, df, signature)
+
+    def entree_fraiche(self, chemin, dependances=()):
+        """Entrée en cache si elle est encore à jour, None sinon (sans lecture)"""
+        signature = self.signature(chemin, dependances)
+        with self._verrou:
+            entree = self._entrees.get(os.path.abspath(chemin))
+            if signature is not None and entree is not None and entree.signature == signature:
+                return entree
+        return None
+
+    def obtenir(self, chemin, lecteur, dependances=()):
+        """Retourner la table en cache ou la relire avec `lecteur` si elle est périmée"""
+        return self.entree(chemin, lecteur, dependances).df
+
+    def memoriser(self, chemin, df, signature=None, base=None, dependances=()):
+        """Mettre à jour le cache après une écriture faite par ce processus.
+
+        Si `base` est la table en cache et que `df` n'en est qu'un ajout de
+        lignes, les index existants sont prolongés au lieu d'être reconstruits.
+        """
+        if signature is None:
+            signature = self.signature(chemin, dependances)
+        cle = os.path.abspath(chemin)
+        with self._verrou:
+            precedente = self._entrees.get(cle)
+            if base is not None and precedente is not None and precedente.df is base:
+                entree = precedente.prolonger(signature, df)
+            else:
+                entree = EntreeCache(signature, df)
+            self._entrees[cle] = entree
+        return entree
+
+    def invalider(self, chemin=None):
+        """Oublier une table (ou toutes si `chemin` est None)"""
+        with self._verrou:
+            if chemin is None:
+                self._entrees.clear()
+            else:
+                self._entrees.pop(os.path.abspath(chemin), None)
+
+    def statistiques(self):
+        """Compteurs de hits/misses du cache"""
+        with self._verrou:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'taux_hits': self.hits / total if total else 0,
+                'tables_en_cache': len(self._entrees)
+            }
+
+
+# Cache unique pour le processus : plusieurs DataManager partagent les mêmes tables
+_cache_tables = CacheTables()
+
+
+class Stockage:
+    """Interface commune des stockages de DataManager.
+
+    Les tables sont désignées par leur nom dans TABLES et les lignes sont
+    échangées sous forme de dict. Les lectures retournent des DataFrames
+    partagés qui ne doivent pas être modifiés sur place.
+    """
+
+    nom = None
+    # Dossier des données (classeurs, base SQLite, fichiers annexes comme tarification.json)
+    data_folder = 'data'
+
+    def initialiser(self):
+        """Créer les tables obligatoires si elles n'existent pas"""
+        raise NotImplementedError
+
+    def creer(self, table):
+        """Créer une table vide si elle n'existe pas"""
+        raise NotImplementedError
+
+    def charger(self, table):
+        """Charger toute une table (FileNotFoundError si elle n'existe pas)"""
+        raise NotImplementedError
+
+    def obtenir(self, table, cle):
+        """Ligne dont la colonne de recherche vaut `cle`, ou None"""
+        raise NotImplementedError
+
+    def existe(self, table, cle):
+        """Vérifier si une ligne porte la clé `cle`"""
+        raise NotImplementedError
+
+    def parcourir(self, table, tri=None, prefixe=None, decroissant=False):
+        """Lignes enregistrées d'une table, une à une, sans charger toute la table.
+
+        `tri` est l'une des colonnes de TABLES[table]['tris'] (ordre
+        d'enregistrement si None) ; `prefixe` ne garde que les lignes dont
+        cette colonne (la colonne de recherche sans tri) commence par lui.
+        """
+        raise NotImplementedError
+
+    def compter(self, table):
+        """Nombre de lignes d'une table"""
+        raise NotImplementedError
+
+    def ajouter(self, table, lignes):
+        """Ajouter des lignes à une table"""
+        raise NotImplementedError
+
+    def transaction(self):
+        """Contexte dans lequel les ajouts sont validés ensemble ou pas du tout"""
+        raise NotImplementedError
+
+    def incrementer_sequence(self, nom, nombre, valeur_initiale):
+        """Avancer une séquence persistante de `nombre` et retourner la première valeur réservée.
+
+        `valeur_initiale()` donne la dernière valeur déjà utilisée quand la
+        séquence n'existe pas encore. L'opération est atomique entre terminaux.
+        Dans une transaction qui échoue avant toute écriture, les valeurs
+        réservées sont rendues à la séquence, sauf si un autre terminal en a
+        réservé depuis : elles restent alors inutilisées.
+        """
+        raise NotImplementedError
+
+    def lire_agregats(self, details=True):
+        """Agrégats des ventes persistés (voir agregats_ventes.py), None s'ils n'ont jamais été calculés.
+
+        Sans `details`, les totaux par client et par jour peuvent être omis.
+        """
+        raise NotImplementedError
+
+    def reconstruire_agregats(self):
+        """Recalculer les agrégats persistés depuis tout l'historique des factures et les retourner.
+
+        Les factures sont lues et les agrégats remplacés sans qu'aucune
+        facture ne puisse être écrite entre-temps : aucune vente n'est perdue.
+        """
+        raise NotImplementedError
+
+    def compacter(self):
+        """Opération de maintenance propre au stockage ; retourne un nombre de lignes traitées"""
+        return 0
+
+    def statistiques_cache(self):
+        """Compteurs du cache de lecture"""
+        return {}
+
+
+class StockageExcel(Stockage):
+    """Stockage historique : un classeur Excel par table.
+
+    Les lectures passent par le cache du processus et ses index de clés.
+    Les ajouts aux classeurs (clients, produits, factures, cartes) vont dans
+    un journal par table, replié dans le classeur par compacter() ; de même,
+    les agrégats des ventes de chaque écriture sont
+    ajoutés à un journal, replié dans agregats_ventes.json (totaux) et
+    agregats_ventes.details.json (par client et par jour). Les lignes de facture, trop nombreuses pour un classeur,
+    sont ajoutées en bloc à un fichier CSV. Dans une transaction, les ajouts sont gardés en attente
+    (et visibles des lectures du même thread) puis écrits à la sortie,
+    une seule fois par table ; l'écriture de plusieurs classeurs n'est pas
+    atomique au sens strict, contrairement au stockage SQLite.
+
+    Plusieurs terminaux peuvent partager le même dossier : chaque écriture
+    se fait sous le verrou de fichier de la table (voir _valider), le temps
+    d'un ajout en fin de journal ; un classeur n'est réécrit, dans un
+    fichier temporaire puis renommé, qu'à la compaction.
+    """
+
+    nom = 'excel'
+
+    def __init__(self, data_folder='data', cache=None, cache_persistant=True):
+        self.data_folder = data_folder
+        self.fichiers = {table: os.path.join(data_folder, definition['fichier'])
+                         for table, definition in TABLES.items()}
+        # Un journal par classeur (Clients.journal.jsonl, Factures.journal.jsonl...), replié par compacter()
+        self.journaux = {table: JournalAjouts(os.path.splitext(chemin)[0] + '.journal.jsonl')
+                         for table, chemin in self.fichiers.items() if not _est_csv(chemin)}
+        self.fichier_sequences = os.path.join(data_folder, 'sequences.json')
+        self.fichier_agregats = os.path.join(data_folder, 'agregats_ventes.json')
+        self.fichier_details_agregats = os.path.join(data_folder, 'agregats_ventes.details.json')
+        # Une ligne d'agrégats par écriture de factures
+        self.journal_agregats = JournalAjouts(os.path.join(data_folder, 'agregats_ventes.journal.jsonl'))
+        # Agrégats déjà lus, avec ou sans détails : (signature des instantanés, position dans le journal, agrégats)
+        self._agregats_lus = {}
+        self.cache = cache if cache is not None else _cache_tables
+        # Copies binaires des classeurs, pour ne plus passer par openpyxl d'un lancement à l'autre
+        self.cache_persistant = CachePersistant(os.path.join(data_folder, '.cache')) if cache_persistant else None
+        self._local = threading.local()
+
+    def initialiser(self):
+        """Créer Factures.xlsx, son journal, le fichier des lignes et celui des cartes s'ils n'existent pas"""
+        self.creer('factures')
+        self.journaux['factures'].initialiser()
+        self.journal_agregats.initialiser()
+        self.creer('lignes_factures')
+        self.creer('cartes')
+
+    def creer(self, table):
+        """Créer un classeur vide pour la table s'il n'existe pas"""
+        if os.path.exists(self.fichiers[table]):
+            return
+        with VerrouFichier(self.fichiers[table]):
+            if os.path.exists(self.fichiers[table]):
+                # Créé entre-temps par un autre terminal
+                return
+            df = pd.DataFrame({colonne: [] for colonne in TABLES[table]['colonnes']})
+            if _est_csv(self.fichiers[table]):
+                df.to_csv(self.fichiers[table], index=False)
+                return
+            self._ecrire_table(self.fichiers[table], df)
+
+    def _lire_table(self, chemin):
+        """Lire une table Excel en passant par le cache du processus"""
+        return self.cache.obtenir(chemin, self._lire_excel)
+
+    def _lire_excel(self, chemin):
+        """Lire un classeur, depuis sa copie binaire si elle est à jour"""
+        if self.cache_persistant is None:
+            return pd.read_excel(chemin)
+        return self.cache_persistant.lire(chemin, pd.read_excel)
+
+    def _ecrire_table(self, chemin, df, base=None):
+        """Écrire une table Excel et mettre les caches à jour.
+
+        `base` est la table d'origine quand `df` ne fait qu'y ajouter des lignes.
+        """
+        remplacer_atomiquement(chemin, lambda fichier_temporaire: df.to_excel(fichier_temporaire, index=False))
+        self.cache.memoriser(chemin, df, base=base)
+        if self.cache_persistant is not None:
+            self.cache_persistant.enregistrer(chemin, df)
+
+    def _entree(self, table):
+        """Entrée du cache (table + index) pour une table"""
+        journal = self.journaux.get(table)
+        if journal is not None and os.path.exists(journal.chemin):
+            return self.cache.entree(journal.chemin, lambda _chemin: self._lire_avec_journal(table),
+                                     dependances=(self.fichiers[table],))
+        if _est_csv(self.fichiers[table]):
+            return self.cache.entree(self.fichiers[table], _lire_csv)
+        return self.cache.entree(self.fichiers[table], self._lire_excel)
+
+    def _lire_avec_journal(self, table):
+        """Combiner l'instantané Excel d'une table et les lignes de son journal"""
+        entree = self.cache.entree(self.fichiers[table], self._lire_excel)
+        # Une compaction interrompue peut laisser dans le journal des lignes
+        # déjà présentes dans l'instantané : elles ne sont pas dupliquées
+        cle = TABLES[table]['cle']
+        deja_presentes = entree.index_colonne(cle)
+        lignes = [ligne for ligne in self.journaux[table].lire() if ligne.get(cle) not in deja_presentes]
+        if not lignes:
+            return entree.df
+        return _concatener(entree.df, lignes, table)
+
+    def _en_attente(self, table):
+        """Lignes ajoutées dans la transaction en cours de ce thread"""
+        attente = getattr(self._local, 'attente', None)
+        if attente is None:
+            return []
+        return attente.get(table, [])
+
+    def _index_en_attente(self, table):
+        """Index clé -> ligne des ajouts en attente de ce thread"""
+        index = getattr(self._local, 'index_attente', None)
+        if index is None:
+            return {}
+        return index.get(table, {})
+
+    def charger(self, table):
+        df = self._entree(table).df
+        attente = self._en_attente(table)
+        if attente:
+            df = _concatener(df, attente, table)
+        return df
+
+    def obtenir(self, table, cle):
+        try:
+            ligne = self._entree(table).ligne(TABLES[table]['cle'], cle)
+        except FileNotFoundError:
+            ligne = None
+        if ligne is None:
+            en_attente = self._index_en_attente(table).get(cle)
+            ligne = dict(en_attente) if en_attente is not None else None
+        return ligne
+
+    def existe(self, table, cle):
+        try:
+            if cle in self._entree(table).index_colonne(TABLES[table]['cle']):
+                return True
+        except FileNotFoundError:
+            pass
+        return cle in self._index_en_attente(table)
+
+    def compter(self, table):
+        return len(self._entree(table).df) + len(self._en_attente(table))
+
+    def parcourir(self, table, tri=None, prefixe=None, decroissant=False):
+        colonne = colonne_parcours(table, tri, prefixe)
+        chemin = self.fichiers[table]
+        # Sans ajout en journal, le classeur seul fait foi
+        journal = self.journaux.get(table)
+        sans_journal = journal is None or journal.est_vide()
+        entree = None
+        if sans_journal:
+            entree = self.cache.entree_fraiche(chemin)
+        if entree is None and colonne is None and not decroissant and sans_journal and not _est_csv(chemin):
+            # Table pas encore en mémoire : le classeur est lu au fil de l'eau
+            lignes = lire_lignes_xlsx(chemin)
+            en_tete = next(lignes, ())
+            for ligne in lignes:
+                yield dict(zip(en_tete, ligne))
+            return
+        if entree is None:
+            # Tri ou filtre : la table (copie binaire à jour le plus souvent) et son index de tri
+            entree = self._entree(table)
+        positions = entree.positions(colonne, prefixe, decroissant)
+        for debut in range(0, len(positions), TAILLE_PAQUET):
+            yield from entree.df.iloc[positions[debut:debut + TAILLE_PAQUET]].to_dict('records')
+
+    def ajouter(self, table, lignes):
+        lignes = list(lignes)
+        attente = getattr(self._local, 'attente', None)
+        if attente is not None:
+            attente.setdefault(table, []).extend(lignes)
+            index = self._local.index_attente.setdefault(table, {})
+            for ligne in lignes:
+                index.setdefault(ligne.get(TABLES[table]['cle']), ligne)
+            return
+        self._valider({table: lignes})
+
+    def _valider(self, attente, reservations=()):
+        """Écrire les ajouts de plusieurs tables ({table: lignes}) sous les verrous de ces tables.
+
+        Les verrous ne sont pris que le temps de l'écriture, toujours dans
+        l'ordre de TABLES pour que deux terminaux ne s'interbloquent pas.
+        Sous verrou, les tables sont relues si un autre terminal les a
+        modifiées, et une clé apparue entre-temps fait échouer l'ensemble
+        (ValueError) avant toute écriture ; les `reservations` de séquence
+        de la transaction sont alors rendues.
+        """
+        tables = [table for table in TABLES if attente.get(table)]
+        with ExitStack() as verrous:
+            for table in tables:
+                verrous.enter_context(VerrouFichier(self.fichiers[table]))
+            try:
+                for table in tables:
+                    self._verifier_doublons(table, attente[table])
+            except ValueError:
+                self._rendre_sequences(reservations)
+                raise
+            for table in tables:
+                self._ecrire_ajout(table, attente[table])
+
+    def _verifier_doublons(self, table, lignes):
+        """Refuser des lignes dont la clé est déjà présente dans une table à clé unique"""
+        if table not in TABLES_CLE_UNIQUE:
+            return
+        colonne = TABLES[table]['cle']
+        try:
+            index = self._entree(table).index_colonne(colonne)
+        except FileNotFoundError:
+            return
+        for ligne in lignes:
+            if ligne.get(colonne) in index:
+                raise ValueError(f"{colonne} {ligne.get(colonne)} existe déjà dans {TABLES[table]['fichier']} "
+                                 f"(ajouté depuis un autre terminal)")
+
+    def _ecrire_ajout(self, table, lignes):
+        """Écrire des lignes ajoutées à une table (sous le verrou de la table)"""
+        if not lignes:
+            return
+        journal = self.journaux.get(table)
+        if journal is not None and os.path.exists(self.fichiers[table]):
+            # Ajout en fin de journal : le classeur n'est ni relu ni réécrit sous le verrou
+            df = self._entree(table).df
+            journal.ajouter(lignes)
+            # Mettre à jour la vue combinée en cache sans relire le journal
+            self.cache.memoriser(journal.chemin, _concatener(df, lignes, table), base=df,
+                                 dependances=(self.fichiers[table],))
+        elif _est_csv(self.fichiers[table]):
+            self._ajouter_csv(table, lignes)
+        else:
+            # Classeur pas encore créé : il l'est avec ces lignes
+            try:
+                df = self._lire_table(self.fichiers[table])
+            except FileNotFoundError:
+                df = pd.DataFrame(columns=TABLES[table]['colonnes'])
+            self._ecrire_table(self.fichiers[table], _concatener(df, lignes, table), base=df)
+        if table == 'factures':
+            self._maj_agregats(lignes)
+
+    def _ajouter_csv(self, table, lignes):
+        """Ajouter des lignes en fin de fichier CSV, sans relire le fichier"""
+        chemin = self.fichiers[table]
+        # La table n'est prolongée en cache que si elle y est déjà
+        entree = self.cache.entree_fraiche(chemin)
+        df_lignes = pd.DataFrame(lignes, columns=TABLES[table]['colonnes'])
+        en_tete = not os.path.exists(chemin) or os.path.getsize(chemin) == 0
+        with open(chemin, 'a', encoding='utf-8', newline='') as fichier:
+            df_lignes.to_csv(fichier, header=en_tete, index=False)
+            fichier.flush()
+            os.fsync(fichier.fileno())
+        if entree is not None:
+            self.cache.memoriser(chemin, _concatener(entree.df, lignes, table), base=entree.df)
+
+    @contextmanager
+    def transaction(self):
+        if getattr(self._local, 'attente', None) is not None:
+            # Transaction imbriquée : rattachée à la transaction englobante
+            yield
+            return
+        self._local.attente = {}
+        self._local.index_attente = {}
+        reservations = self._local.reservations = []
+        try:
+            yield
+            attente = self._local.attente
+        except BaseException:
+            self._rendre_sequences(reservations)
+            raise
+        finally:
+            self._local.attente = None
+            self._local.index_attente = None
+            self._local.reservations = None
+        self._valider(attente, reservations)
+
+    def incrementer_sequence(self, nom, nombre, valeur_initiale):
+        # Un numéro réservé l'est immédiatement pour les autres terminaux ; dans une transaction,
+        # il est noté pour être rendu si elle échoue
+        with VerrouFichier(self.fichier_sequences):
+            try:
+                with open(self.fichier_sequences, 'r', encoding='utf-8') as fichier:
+                    sequences = json.load(fichier)
+            except FileNotFoundError:
+                sequences = {}
+            valeur = sequences.get(nom)
+            if valeur is None:
+                valeur = valeur_initiale()
+            sequences[nom] = valeur + nombre
+            ecrire_atomiquement(self.fichier_sequences, json.dumps(sequences, indent=2))
+        reservations = getattr(self._local, 'reservations', None)
+        if reservations is not None:
+            reservations.append((nom, valeur, nombre))
+        return valeur + 1
+
+    def _rendre_sequences(self, reservations):
+        """Rendre les valeurs réservées par une transaction annulée, si aucune autre n'a été réservée depuis"""
+        if not reservations:
+            return
+        with VerrouFichier(self.fichier_sequences):
+            try:
+                sequences = _lire_json(self.fichier_sequences)
+            except FileNotFoundError:
+                return
+            rendues = False
+            for nom, valeur, nombre in reversed(reservations):
+                if sequences.get(nom) == valeur + nombre:
+                    sequences[nom] = valeur
+                    rendues = True
+            if rendues:
+                ecrire_atomiquement(self.fichier_sequences, json.dumps(sequences, indent=2))
+
+    def lire_agregats(self, details=True):
+        # Sous le verrou des agrégats : ni ajout en cours au journal, ni compaction à moitié faite
+        with VerrouFichier(self.fichier_agregats):
+            try:
+                agregats = self._agregats_a_jour(details)
+            except FileNotFoundError:
+                return None
+        # Copie figée : les agrégats gardés en mémoire continuent d'être prolongés
+        return dict(agregats, par_client=dict(agregats['par_client']), par_jour=dict(agregats['par_jour']))
+
+    def _agregats_a_jour(self, details):
+        """Agrégats gardés en mémoire, prolongés par les seules lignes du journal pas encore lues.
+
+        Les instantanés ne sont relus que s'ils ont changé (compaction,
+        reconstruction) ; à appeler sous le verrou des agrégats.
+        """
+        instantanes = (self.fichier_agregats, self.fichier_details_agregats) if details else (self.fichier_agregats,)
+        signature = tuple(CacheTables.signature(fichier) for fichier in instantanes)
+        lus = self._agregats_lus.get(details)
+        if lus is not None and lus[0] == signature and lus[1] <= self.journal_agregats.taille():
+            _, position, agregats = lus
+        else:
+            self._agregats_lus.pop(details, None)
+            position, agregats = 0, self._lire_instantanes(details)
+        ajouts, position = self.journal_agregats.lire_depuis(position)
+        for ajout in ajouts:
+            agregats_ventes.fusionner(agregats, ajout, details)
+        self._agregats_lus[details] = (signature, position, agregats)
+        return agregats
+
+    def _lire_instantanes(self, details):
+        """Agrégats des instantanés, sans le journal (FileNotFoundError s'ils n'ont jamais été calculés)"""
+        resume = _lire_json(self.fichier_agregats)
+        agregats = {cle: resume[cle] for cle in agregats_ventes.CLES_RESUME}
+        agregats['par_client'], agregats['par_jour'] = {}, {}
+        if details:
+            try:
+                detail = _lire_json(self.fichier_details_agregats)
+            except FileNotFoundError:
+                # Ancien format : détails dans agregats_ventes.json, séparés à la prochaine compaction
+                detail = resume
+            agregats['par_client'], agregats['par_jour'] = detail['par_client'], detail['par_jour']
+        return agregats
+
+    def reconstruire_agregats(self):
+        # Même ordre de verrous que l'écriture des factures (_maj_agregats) : factures puis agrégats
+        with VerrouFichier(self.fichiers['factures']), VerrouFichier(self.fichier_agregats):
+            try:
+                df_factures = self.charger('factures')
+            except FileNotFoundError:
+                df_factures = pd.DataFrame()
+            agregats = agregats_ventes.calculer(df_factures)
+            self._ecrire_agregats(agregats)
+        return agregats
+
+    def _ecrire_agregats(self, agregats):
+        """Écrire les instantanés des agrégats puis vider leur journal (sous le verrou des agrégats)"""
+        ecrire_atomiquement(self.fichier_details_agregats, json.dumps(
+            {'par_client': agregats['par_client'], 'par_jour': agregats['par_jour']}, ensure_ascii=False))
+        ecrire_atomiquement(self.fichier_agregats, json.dumps(
+            {cle: agregats[cle] for cle in agregats_ventes.CLES_RESUME}, ensure_ascii=False))
+        self.journal_agregats.vider()
+
+    def _maj_agregats(self, factures):
+        """Ajouter des factures écrites aux agrégats, s'ils ont déjà été calculés"""
+        with VerrouFichier(self.fichier_agregats):
+            if not os.path.exists(self.fichier_agregats):
+                return
+            # Une ligne en fin de journal : rien n'est relu ni réécrit, quel que soit l'historique
+            self.journal_agregats.ajouter([agregats_ventes.appliquer(agregats_ventes.agregats_vides(), factures)])
+
+    def _compacter_agregats(self):
+        """Replier le journal des agrégats dans leurs instantanés"""
+        with VerrouFichier(self.fichier_agregats):
+            if self.journal_agregats.est_vide() or not os.path.exists(self.fichier_agregats):
+                return
+            self._ecrire_agregats(self._agregats_a_jour(details=True))
+
+    def compacter(self):
+        """Replier les journaux des tables dans leurs classeurs (Factures.xlsx, Clients.xlsx...).
+
+        Chaque instantané est écrit dans un fichier temporaire puis renommé,
+        et son journal n'est vidé qu'ensuite. Le journal des agrégats est
+        replié lui aussi. Retourne le nombre de lignes repliées.
+        """
+        self._compacter_agregats()
+        return sum(self._compacter_table(table) for table in self.journaux)
+
+    def _compacter_table(self, table):
+        """Replier le journal d'une table dans son classeur ; retourne le nombre de lignes repliées"""
+        journal = self.journaux[table]
+        if journal.est_vide():
+            return 0
+        fichier = self.fichiers[table]
+        # Sous le verrou de la table : aucun terminal n'ajoute au journal pendant la compaction
+        with VerrouFichier(fichier):
+            df = self._entree(table).df
+            nombre = len(df) - len(self._lire_table(fichier))
+            if nombre == 0 and journal.est_vide():
+                return 0
+            remplacer_atomiquement(fichier, lambda fichier_temporaire: df.to_excel(fichier_temporaire, index=False))
+            journal.vider()
+            self.cache.memoriser(fichier, df)
+            if self.cache_persistant is not None:
+                self.cache_persistant.enregistrer(fichier, df)
+            self.cache.invalider(journal.chemin)
+        return nombre
+
+    def statistiques_cache(self):
+        statistiques = self.cache.statistiques()
+        if self.cache_persistant is not None:
+            statistiques.update(self.cache_persistant.statistiques())
+        statistiques['verrous'] = statistiques_verrous.en_dict()
+        return statistiques
+
+
+def colonne_parcours(table, tri, prefixe):
+    """Colonne sur laquelle parcourir() trie et filtre (ValueError si elle n'est pas proposée)"""
+    if tri is not None and tri not in TABLES[table].get('tris', ()):
+        raise ValueError(f"Tri impossible sur {tri} pour la table {table}")
+    if prefixe and tri in TRIS_NUMERIQUES:
+        raise ValueError(f"Filtre par préfixe impossible sur {tri}")
+    if tri is None and prefixe:
+        return TABLES[table]['cle']
+    return tri
+
+
+def _est_csv(chemin):
+    return chemin.endswith('.csv')
+
+
+def _lire_csv(chemin):
+    return pd.read_csv(chemin, dtype=TYPES_LIGNES_FACTURES, keep_default_na=False)
+
+
+def _lire_json(chemin):
+    with open(chemin, 'r', encoding='utf-8') as fichier:
+        return json.load(fichier)
+
+
+def _concatener(df, lignes, table):
+    """DataFrame `df` prolongé par des lignes (dict)"""
+    df_lignes = pd.DataFrame(lignes, columns=TABLES[table]['colonnes'])
+    if df.empty:
+        return df_lignes
+    return pd.concat([df, df_lignes], ignore_index=True)
+
+
+def ouvrir_stockage(data_folder='data'):
+    """Stockage à utiliser pour un dossier de données.
+
+    La base SQLite est retenue dès qu'elle existe (voir stockage_sqlite.py
+    pour la migration), sinon les classeurs Excel.
+    """
+    chemin_db = os.path.join(data_folder, FICHIER_SQLITE)
+    if os.path.exists(chemin_db):
+        from stockage_sqlite import StockageSQLite
+        return StockageSQLite(chemin_db)
+    return StockageExcel(data_folder)
@@ -0,0 +1,390 @@
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import agregats_ventes
+from stockage import TABLES, FICHIER_SQLITE, FIN_PREFIXE, TAILLE_PAQUET, Stockage, StockageExcel, colonne_parcours
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    code_client TEXT PRIMARY KEY,
+    nom TEXT,
+    contact TEXT,
+    IFU TEXT
+);
+CREATE TABLE IF NOT EXISTS produits (
+    code_produit TEXT PRIMARY KEY,
+    libelle TEXT,
+    prix_unitaire REAL
+);
+CREATE TABLE IF NOT EXISTS cartes (
+    numero_carte TEXT PRIMARY KEY,
+    code_client TEXT UNIQUE,
+    taux_reduction INTEGER
+);
+CREATE TABLE IF NOT EXISTS factures (
+    numero_facture TEXT PRIMARY KEY,
+    code_client TEXT,
+    date_facture TEXT,
+    total_ht REAL,
+    remise REAL,
+    total_ht_remise REAL,
+    tva REAL,
+    total_ttc REAL
+);
+CREATE TABLE IF NOT EXISTS lignes_factures (
+    numero_facture TEXT NOT NULL,
+    date_facture TEXT,
+    code_client TEXT,
+    code_produit TEXT,
+    libelle TEXT,
+    prix_unitaire REAL,
+    quantite INTEGER,
+    total_ht REAL
+);
+CREATE TABLE IF NOT EXISTS sequences (
+    nom TEXT PRIMARY KEY,
+    valeur INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agregats_ventes (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    nombre_factures INTEGER NOT NULL,
+    chiffre_affaires_total REAL NOT NULL,
+    facture_plus_elevee REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agregats_clients (
+    code_client TEXT PRIMARY KEY,
+    nombre INTEGER NOT NULL,
+    total REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agregats_jours (
+    jour TEXT PRIMARY KEY,
+    nombre INTEGER NOT NULL,
+    total REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_factures_client ON factures (code_client);
+CREATE INDEX IF NOT EXISTS idx_factures_date ON factures (date_facture);
+CREATE INDEX IF NOT EXISTS idx_lignes_facture ON lignes_factures (numero_facture);
+CREATE INDEX IF NOT EXISTS idx_lignes_produit ON lignes_factures (code_produit, date_facture);
+CREATE INDEX IF NOT EXISTS idx_clients_nom ON clients (nom);
+CREATE INDEX IF NOT EXISTS idx_produits_libelle ON produits (libelle);
+CREATE INDEX IF NOT EXISTS idx_produits_prix ON produits (prix_unitaire);
+CREATE INDEX IF NOT EXISTS idx_cartes_taux ON cartes (taux_reduction);
+"""
+
+
+def _valeur_sql(valeur):
+    """Convertir une valeur pandas/numpy en valeur acceptée par sqlite3"""
+    if isinstance(valeur, np.generic):
+        valeur = valeur.item()
+    if isinstance(valeur, float) and valeur != valeur:
+        return None
+    if valeur is pd.NaT:
+        return None
+    return valeur
+
+
+class StockageSQLite(Stockage):
+    """Stockage dans une base SQLite unique, tables indexées sur leurs clés.
+
+    Une seule connexion est partagée par les threads du processus, protégée
+    par un verrou. Les autres terminaux accèdent à la même base en mode WAL.
+    Les tables chargées sont mises en cache tant que la base n'a pas changé
+    (PRAGMA data_version pour les autres connexions, compteur local pour
+    les écritures de ce processus).
+    """
+
+    nom = 'sqlite'
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self.data_folder = os.path.dirname(chemin) or '.'
+        self._connexion = sqlite3.connect(chemin, timeout=30, isolation_level=None,
+                                          check_same_thread=False)
+        self._verrou = threading.RLock()
+        self._profondeur = 0
+        self._version_locale = 0
+        self._cache = {}
+        self.hits = 0
+        self.misses = 0
+        self.initialiser()
+
+    def initialiser(self):
+        with self._verrou:
+            self._connexion.execute("PRAGMA journal_mode=WAL")
+            self._connexion.executescript(SCHEMA)
+
+    def creer(self, table):
+        # Toutes les tables sont créées par initialiser()
+        pass
+
+    def _version(self):
+        """Version de la base vue par ce processus"""
+        return (self._connexion.execute("PRAGMA data_version").fetchone()[0], self._version_locale)
+
+    def charger(self, table):
+        colonnes = TABLES[table]['colonnes']
+        with self._verrou:
+            version = self._version()
+            entree = self._cache.get(table)
+            if entree is not None and entree[0] == version:
+                self.hits += 1
+                return entree[1]
+            self.misses += 1
+            df = pd.read_sql_query(f"SELECT {', '.join(colonnes)} FROM {table} ORDER BY rowid",
+                                   self._connexion)
+            self._cache[table] = (version, df)
+            return df
+
+    def obtenir(self, table, cle):
+        colonnes = TABLES[table]['colonnes']
+        with self._verrou:
+            ligne = self._connexion.execute(
+                f"SELECT {', '.join(colonnes)} FROM {table} WHERE {TABLES[table]['cle']} = ? LIMIT 1",
+                (_valeur_sql(cle),)
+            ).fetchone()
+        if ligne is None:
+            return None
+        return dict(zip(colonnes, ligne))
+
+    def existe(self, table, cle):
+        with self._verrou:
+            return self._connexion.execute(
+                f"SELECT 1 FROM {table} WHERE {TABLES[table]['cle']} = ? LIMIT 1",
+                (_valeur_sql(cle),)
+            ).fetchone() is not None
+
+    def compter(self, table):
+        with self._verrou:
+            return self._connexion.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def parcourir(self, table, tri=None, prefixe=None, decroissant=False):
+        # Pagination par clé (dernière valeur vue) : chaque paquet est une lecture d'index,
+        # sans OFFSET ni curseur gardé ouvert entre deux paquets
+        colonnes = TABLES[table]['colonnes']
+        colonne = colonne_parcours(table, tri, prefixe) or 'rowid'
+        sens, comparaison = ('DESC', '<') if decroissant else ('ASC', '>')
+        conditions, parametres = [], []
+        if prefixe:
+            conditions.append(f"{colonne} >= ? AND {colonne} < ?")
+            parametres += [prefixe, prefixe + FIN_PREFIXE]
+        # NULL ne se compare à rien : les lignes sans valeur de tri sont parcourues à part, par rowid,
+        # en tête du tri croissant et en fin du décroissant (l'ordre de ORDER BY)
+        phases = [([], f"({colonne}, rowid)")]
+        if colonne != 'rowid' and not prefixe:
+            sans_valeur = ([f"{colonne} IS NULL"], "rowid")
+            avec_valeur = ([f"{colonne} IS NOT NULL"], f"({colonne}, rowid)")
+            phases = [avec_valeur, sans_valeur] if decroissant else [sans_valeur, avec_valeur]
+        for condition_phase, cle in phases:
+            dernier = ()
+            while True:
+                suite = [f"{cle} {comparaison} ({', '.join('?' * len(dernier))})"] if dernier else []
+                clause = " AND ".join(conditions + condition_phase + suite)
+                with self._verrou:
+                    lignes = self._connexion.execute(
+                        f"SELECT {', '.join(colonnes)}, {colonne}, rowid FROM {table}"
+                        f"{' WHERE ' + clause if clause else ''} "
+                        f"ORDER BY {colonne} {sens}, rowid {sens} LIMIT ?",
+                        (*parametres, *dernier, TAILLE_PAQUET)
+                    ).fetchall()
+                for ligne in lignes:
+                    yield dict(zip(colonnes, ligne))
+                if len(lignes) < TAILLE_PAQUET:
+                    break
+                dernier = lignes[-1][-1:] if cle == 'rowid' else lignes[-1][-2:]
+
+    def ajouter(self, table, lignes):
+        colonnes = TABLES[table]['colonnes']
+        valeurs = [tuple(_valeur_sql(ligne.get(colonne)) for colonne in colonnes) for ligne in lignes]
+        if not valeurs:
+            return
+        with self.transaction():
+            self._connexion.executemany(
+                f"INSERT INTO {table} ({', '.join(colonnes)}) VALUES ({', '.join('?' * len(colonnes))})",
+                valeurs
+            )
+            if table == 'factures':
+                self._maj_agregats(lignes)
+
+    def _maj_agregats(self, factures):
+        """Ajouter des factures aux agrégats, dans la transaction qui les enregistre"""
+        totaux = [float(facture['total_ttc']) for facture in factures]
+        curseur = self._connexion.execute(
+            "UPDATE agregats_ventes SET nombre_factures = nombre_factures + ?, "
+            "chiffre_affaires_total = chiffre_affaires_total + ?, "
+            "facture_plus_elevee = MAX(facture_plus_elevee, ?) WHERE id = 1",
+            (len(totaux), sum(totaux), max(totaux))
+        )
+        if curseur.rowcount == 0:
+            # Agrégats jamais calculés : ils le seront depuis l'historique
+            return
+        for table, colonne, cle in (('agregats_clients', 'code_client', 'code_client'),
+                                    ('agregats_jours', 'jour', 'date_facture')):
+            self._connexion.executemany(
+                f"INSERT INTO {table} ({colonne}, nombre, total) VALUES (?, 1, ?) "
+                f"ON CONFLICT ({colonne}) DO UPDATE SET nombre = nombre + 1, total = total + excluded.total",
+                [(str(facture[cle]), total) for facture, total in zip(factures, totaux)]
+            )
+
+    def lire_agregats(self, details=True):
+        with self._verrou:
+            ligne = self._connexion.execute(
+                "SELECT nombre_factures, chiffre_affaires_total, facture_plus_elevee FROM agregats_ventes WHERE id = 1"
+            ).fetchone()
+            if ligne is None:
+                return None
+            agregats = {
+                'nombre_factures': ligne[0],
+                'chiffre_affaires_total': ligne[1],
+                'facture_plus_elevee': ligne[2],
+                'par_client': {},
+                'par_jour': {}
+            }
+            if details:
+                for cle, table, colonne in (('par_client', 'agregats_clients', 'code_client'),
+                                            ('par_jour', 'agregats_jours', 'jour')):
+                    agregats[cle] = {
+                        valeur: {'nombre': nombre, 'total': total}
+                        for valeur, nombre, total in self._connexion.execute(
+                            f"SELECT {colonne}, nombre, total FROM {table}")
+                    }
+            return agregats
+
+    def reconstruire_agregats(self):
+        # BEGIN IMMEDIATE : aucune facture n'est écrite entre la lecture et le remplacement
+        with self.transaction():
+            agregats = agregats_ventes.calculer(self.charger('factures'))
+            self._connexion.execute("DELETE FROM agregats_clients")
+            self._connexion.execute("DELETE FROM agregats_jours")
+            self._connexion.execute(
+                "INSERT OR REPLACE INTO agregats_ventes (id, nombre_factures, chiffre_affaires_total, "
+                "facture_plus_elevee) VALUES (1, ?, ?, ?)",
+                (agregats['nombre_factures'], agregats['chiffre_affaires_total'], agregats['facture_plus_elevee'])
+            )
+            for cle, table, colonne in (('par_client', 'agregats_clients', 'code_client'),
+                                        ('par_jour', 'agregats_jours', 'jour')):
+                self._connexion.executemany(
+                    f"INSERT INTO {table} ({colonne}, nombre, total) VALUES (?, ?, ?)",
+                    [(valeur, detail['nombre'], detail['total']) for valeur, detail in agregats[cle].items()]
+                )
+        return agregats
+
+    @contextmanager
+    def transaction(self):
+        with self._verrou:
+            if self._profondeur:
+                # Transaction imbriquée : rattachée à la transaction englobante
+                self._profondeur += 1
+                try:
+                    yield
+                finally:
+                    self._profondeur -= 1
+                return
+            self._connexion.execute("BEGIN IMMEDIATE")
+            self._profondeur = 1
+            try:
+                yield
+            except BaseException:
+                self._connexion.execute("ROLLBACK")
+                raise
+            else:
+                self._connexion.execute("COMMIT")
+            finally:
+                self._profondeur = 0
+                self._version_locale += 1
+
+    def incrementer_sequence(self, nom, nombre, valeur_initiale):
+        with self.transaction():
+            ligne = self._connexion.execute("SELECT valeur FROM sequences WHERE nom = ?", (nom,)).fetchone()
+            valeur = ligne[0] if ligne is not None else valeur_initiale()
+            self._connexion.execute("INSERT OR REPLACE INTO sequences (nom, valeur) VALUES (?, ?)",
+                                    (nom, valeur + nombre))
+        return valeur + 1
+
+    def statistiques_cache(self):
+        with self._verrou:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'taux_hits': self.hits / total if total else 0,
+                'tables_en_cache': len(self._cache)
+            }
+
+    def fermer(self):
+        """Fermer la connexion à la base"""
+        with self._verrou:
+            self._connexion.close()
+
+
+def migrer_excel_vers_sqlite(data_folder='data', chemin_db=None):
+    """Copier les classeurs Excel (et leurs journaux) dans une base SQLite neuve.
+
+    Retourne le nombre de lignes copiées par table.
+    """
+    chemin_db = chemin_db or os.path.join(data_folder, FICHIER_SQLITE)
+    if os.path.exists(chemin_db):
+        raise FileExistsError(f"La base {chemin_db} existe déjà")
+    source = StockageExcel(data_folder)
+    cible = StockageSQLite(chemin_db)
+    nombres = {}
+    try:
+        with cible.transaction():
+            for table in TABLES:
+                try:
+                    df = source.charger(table)
+                except FileNotFoundError:
+                    df = pd.DataFrame(columns=TABLES[table]['colonnes'])
+                cible.ajouter(table, df.to_dict('records'))
+                nombres[table] = len(df)
+    except Exception:
+        cible.fermer()
+        os.remove(chemin_db)
+        raise
+    cible.fermer()
+    return nombres
+
+
+def exporter_sqlite_vers_excel(chemin_db, dossier_sortie):
+    """Exporter chaque table de la base vers un classeur Excel (pour la comptabilité)"""
+    if not os.path.exists(dossier_sortie):
+        os.makedirs(dossier_sortie)
+    source = StockageSQLite(chemin_db)
+    nombres = {}
+    for table, definition in TABLES.items():
+        df = source.charger(table)
+        chemin = os.path.join(dossier_sortie, definition['fichier'])
+        if chemin.endswith('.csv'):
+            # Les lignes de facture dépassent vite la limite d'une feuille Excel
+            df.to_csv(chemin, index=False)
+        else:
+            df.to_excel(chemin, index=False)
+        nombres[table] = len(df)
+    source.fermer()
+    return nombres
+
+
+if __name__ == "__main__":
+    usage = ("Usage : python stockage_sqlite.py migrer [dossier_data]\n"
+             "        python stockage_sqlite.py exporter <dossier_sortie> [dossier_data]")
+    if len(sys.argv) < 2 or sys.argv[1] not in ('migrer', 'exporter'):
+        print(usage)
+        sys.exit(1)
+    if sys.argv[1] == 'migrer':
+        dossier = sys.argv[2] if len(sys.argv) > 2 else 'data'
+        nombres = migrer_excel_vers_sqlite(dossier)
+        print(f"Migration terminée vers {os.path.join(dossier, FICHIER_SQLITE)}")
+    else:
+        if len(sys.argv) < 3:
+            print(usage)
+            sys.exit(1)
+        dossier = sys.argv[3] if len(sys.argv) > 3 else 'data'
+        nombres = exporter_sqlite_vers_excel(os.path.join(dossier, FICHIER_SQLITE), sys.argv[2])
+        print(f"Export terminé dans {sys.argv[2]}")
+    for table, nombre in nombres.items():
+        print(f"- {table} : {nombre} ligne(s)")
@@ -0,0 +1,46 @@
+"""Définition des tables du stockage, sans dépendance lourde.
+
+main.py l'importe au démarrage sans charger pandas ; stockage.py et
+stockage_sqlite.py en tirent leurs constantes.
+"""
+
+# Tables gérées par le stockage : fichier Excel, colonne de recherche, colonnes
+# et colonnes de tri proposées à la consultation (indexées en SQLite)
+TABLES = {
+    'clients': {
+        'fichier': 'Clients.xlsx',
+        'cle': 'code_client',
+        'colonnes': ['code_client', 'nom', 'contact', 'IFU'],
+        'tris': ['code_client', 'nom']
+    },
+    'produits': {
+        'fichier': 'Produits.xlsx',
+        'cle': 'code_produit',
+        'colonnes': ['code_produit', 'libelle', 'prix_unitaire'],
+        'tris': ['code_produit', 'libelle', 'prix_unitaire']
+    },
+    'factures': {
+        'fichier': 'Factures.xlsx',
+        'cle': 'numero_facture',
+        'colonnes': ['numero_facture', 'code_client', 'date_facture', 'total_ht',
+                     'remise', 'total_ht_remise', 'tva', 'total_ttc']
+    },
+    'lignes_factures': {
+        'fichier': 'LignesFactures.csv',
+        'cle': 'numero_facture',
+        'colonnes': ['numero_facture', 'date_facture', 'code_client', 'code_produit',
+                     'libelle', 'prix_unitaire', 'quantite', 'total_ht']
+    },
+    'cartes': {
+        'fichier': 'CartesReduction.xlsx',
+        'cle': 'code_client',
+        'colonnes': ['numero_carte', 'code_client', 'taux_reduction'],
+        'tris': ['numero_carte', 'code_client', 'taux_reduction']
+    }
+}
+
+# Colonnes de tri numériques : triées par valeur, sans filtre par préfixe
+TRIS_NUMERIQUES = ('prix_unitaire', 'taux_reduction')
+
+# Base SQLite utilisée à la place des classeurs dès qu'elle existe dans le dossier data
+FICHIER_SQLITE = 'facturation.db'
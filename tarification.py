@@ -0,0 +1,146 @@
+"""Règles de calcul des factures : lignes, remise, TVA et cartes de réduction.
+
+Les règles par défaut ci-dessous peuvent être remplacées par celles du
+fichier data/tarification.json (voir charger_regles) :
+    python tarification.py --tva 0.18 --paliers 2000:5,5000:10,10000:15
+"""
+import json
+import os
+
+TAUX_TVA = 0.18
+
+# Paliers de création des cartes de réduction : (montant TTC minimal, taux en %)
+PALIERS_REDUCTION = [(10000, 15), (5000, 10), (2000, 5)]
+
+# Fichier des règles, dans le dossier de données
+FICHIER_REGLES = 'tarification.json'
+
+
+class ReglesTarification:
+    """Taux de TVA et paliers des cartes de réduction"""
+
+    def __init__(self, taux_tva=TAUX_TVA, paliers=PALIERS_REDUCTION):
+        paliers = sorted(((float(seuil), int(taux)) for seuil, taux in paliers), reverse=True)
+        if not 0 <= float(taux_tva) < 1:
+            raise ValueError(f"Taux de TVA invalide : {taux_tva} (0.18 pour 18 %)")
+        if not paliers:
+            raise ValueError("Au moins un palier de réduction est nécessaire")
+        for seuil, taux in paliers:
+            if seuil <= 0 or not 0 < taux <= 100:
+                raise ValueError(f"Palier invalide : {seuil:g} -> {taux} %")
+        self.taux_tva = float(taux_tva)
+        self.paliers = tuple(paliers)
+
+    @property
+    def seuil_carte(self):
+        """Montant TTC en dessous duquel aucune carte n'est créée"""
+        return self.paliers[-1][0]
+
+    def taux_reduction_pour(self, total_facture):
+        """Taux de la carte de réduction accordée pour un montant, None sous le premier palier"""
+        for seuil, taux in self.paliers:
+            if total_facture >= seuil:
+                return taux
+        return None
+
+    def en_dict(self):
+        return {'taux_tva': self.taux_tva, 'paliers_reduction': [[seuil, taux] for seuil, taux in self.paliers]}
+
+    @classmethod
+    def depuis_dict(cls, donnees):
+        return cls(donnees.get('taux_tva', TAUX_TVA), donnees.get('paliers_reduction', PALIERS_REDUCTION))
+
+    def __eq__(self, autre):
+        return isinstance(autre, ReglesTarification) and self.en_dict() == autre.en_dict()
+
+    def __repr__(self):
+        paliers = ', '.join(f"{seuil:g} -> {taux} %" for seuil, taux in reversed(self.paliers))
+        return f"TVA {self.taux_tva:.0%}, cartes : {paliers}"
+
+
+# Règles sans fichier tarification.json ; chaque DataManager lit celles de son dossier
+REGLES_DEFAUT = ReglesTarification()
+
+
+def charger_regles(data_folder='data'):
+    """Règles de data_folder/tarification.json (les règles par défaut s'il n'existe pas)"""
+    try:
+        with open(os.path.join(data_folder, FICHIER_REGLES), 'r', encoding='utf-8') as fichier:
+            return ReglesTarification.depuis_dict(json.load(fichier))
+    except FileNotFoundError:
+        return REGLES_DEFAUT
+
+
+def enregistrer_regles(regles, data_folder='data'):
+    """Écrire les règles dans data_folder/tarification.json (lues par les DataManager créés ensuite)"""
+    from verrou import ecrire_atomiquement
+
+    ecrire_atomiquement(os.path.join(data_folder, FICHIER_REGLES), json.dumps(regles.en_dict(), indent=2))
+    return regles
+
+
+def libelle_tva(taux_tva):
+    """Libellé de la ligne de TVA ("TVA (18%)", "TVA (19.25%)")"""
+    return f"TVA ({round(taux_tva * 100, 2):g}%)"
+
+
+def ligne_facture(produit, quantite):
+    """Ligne de facture pour un produit du catalogue et une quantité"""
+    return {
+        'code_produit': produit['code_produit'],
+        'libelle': produit['libelle'],
+        'prix_unitaire': produit['prix_unitaire'],
+        'quantite': quantite,
+        'total_ht': produit['prix_unitaire'] * quantite
+    }
+
+
+def calculer_totaux(produits_factures, taux_reduction=0, regles=REGLES_DEFAUT):
+    """Totaux d'une facture, avec la remise de la carte du client s'il en a une"""
+    total_ht = sum(prod['total_ht'] for prod in produits_factures)
+    remise = total_ht * (taux_reduction / 100) if taux_reduction else 0
+    total_ht_remise = total_ht - remise
+    tva = total_ht_remise * regles.taux_tva
+    total_ttc = total_ht_remise + tva
+    return {
+        'total_ht': total_ht,
+        'remise': remise,
+        'total_ht_remise': total_ht_remise,
+        'tva': tva,
+        'total_ttc': total_ttc
+    }
+
+
+def lire_paliers(texte):
+    """Paliers saisis sous la forme "2000:5,5000:10,10000:15" (montant TTC:taux en %)"""
+    try:
+        return [(float(seuil), int(taux)) for seuil, taux in (palier.split(':') for palier in texte.split(','))]
+    except ValueError:
+        raise ValueError(f"Paliers invalides : {texte} (attendu : 2000:5,5000:10,10000:15)") from None
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Afficher ou modifier les règles de tarification")
+    parser.add_argument('--tva', type=float, help="taux de TVA (0.18 pour 18 %%)")
+    parser.add_argument('--paliers', help="paliers des cartes, montant TTC:taux (2000:5,5000:10,10000:15)")
+    parser.add_argument('--dossier', default='data', help="dossier de données")
+    args = parser.parse_args()
+
+    regles = charger_regles(args.dossier)
+    if args.tva is not None or args.paliers:
+        try:
+            regles = ReglesTarification(regles.taux_tva if args.tva is None else args.tva,
+                                        lire_paliers(args.paliers) if args.paliers else regles.paliers)
+        except ValueError as erreur:
+            parser.error(str(erreur))
+        enregistrer_regles(regles, args.dossier)
+        print(f"✅ Règles enregistrées dans {os.path.join(args.dossier, FICHIER_REGLES)}")
+    print(f"TVA : {regles.taux_tva:.0%}")
+    for seuil, taux in reversed(regles.paliers):
+        print(f"Carte {taux} % à partir de {seuil:.2f} FCFA TTC")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class StatistiquesVerrous:
+    """Contention des verrous de fichiers du processus : acquisitions, attentes et temps d'attente"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self.vider()
+
+    def vider(self):
+        with self._verrou:
+            self.acquisitions = 0
+            self.attentes = 0
+            self.duree_attente = 0.0
+            self.attente_max = 0.0
+
+    def enregistrer(self, attente):
+        """Compter une acquisition ; `attente` (s) est None si le verrou était libre"""
+        with self._verrou:
+            self.acquisitions += 1
+            if attente is not None:
+                self.attentes += 1
+                self.duree_attente += attente
+                self.attente_max = max(self.attente_max, attente)
+
+    def en_dict(self):
+        with self._verrou:
+            return {
+                'acquisitions': self.acquisitions,
+                'attentes': self.attentes,
+                'taux_contention': self.attentes / self.acquisitions if self.acquisitions else 0,
+                'duree_attente_s': self.duree_attente,
+                'attente_max_s': self.attente_max
+            }
+
+
+# Statistiques uniques pour le processus
+statistiques_verrous = StatistiquesVerrous()
+
+
+class VerrouFichier:
+    """Verrou consultatif inter-processus posé sur un fichier `<chemin>.lock`.
+
+    Sert à plusieurs terminaux qui partagent le même dossier data. Chaque
+    acquisition ouvre son propre descripteur, le verrou exclut donc aussi
+    les threads d'un même processus (et un même fichier ne doit pas être
+    verrouillé deux fois par le même thread). Les attentes sont comptées
+    dans `statistiques_verrous`.
+    """
+
+    def __init__(self, chemin):
+        self.chemin = chemin + '.lock'
+        self._fichier = None
+
+    def acquerir(self):
+        """Attendre et prendre le verrou"""
+        self._fichier = open(self.chemin, 'a+')
+        if self._essayer():
+            statistiques_verrous.enregistrer(None)
+            return
+        debut = time.perf_counter()
+        if fcntl is not None:
+            fcntl.flock(self._fichier.fileno(), fcntl.LOCK_EX)
+        else:
+            while not self._essayer():
+                time.sleep(0.01)
+        statistiques_verrous.enregistrer(time.perf_counter() - debut)
+
+    def essayer(self):
+        """Prendre le verrou s'il est libre, sans attendre ; retourne True s'il a été pris"""
+        self._fichier = open(self.chemin, 'a+')
+        if self._essayer():
+            statistiques_verrous.enregistrer(None)
+            return True
+        self._fichier.close()
+        self._fichier = None
+        return False
+
+    def _essayer(self):
+        """Prendre le verrou s'il est libre, sans attendre"""
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fichier.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                self._fichier.seek(0)
+                msvcrt.locking(self._fichier.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def liberer(self):
+        """Rendre le verrou"""
+        if self._fichier is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fichier.fileno(), fcntl.LOCK_UN)
+            else:
+                self._fichier.seek(0)
+                msvcrt.locking(self._fichier.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._fichier.close()
+            self._fichier = None
+
+    def __enter__(self):
+        self.acquerir()
+        return self
+
+    def __exit__(self, *exc):
+        self.liberer()
+        return False
+
+
+def ecrire_atomiquement(chemin, contenu):
+    """Écrire un fichier texte via un fichier temporaire renommé, après fsync"""
+    fichier_temporaire = f"{chemin}.{os.getpid()}.tmp"
+    with open(fichier_temporaire, 'w', encoding='utf-8') as fichier:
+        fichier.write(contenu)
+        fichier.flush()
+        os.fsync(fichier.fileno())
+    os.replace(fichier_temporaire, chemin)
+
+
+def remplacer_atomiquement(chemin, ecrire):
+    """Produire un fichier avec ecrire(chemin_temporaire) puis le mettre en place par renommage.
+
+    Le fichier temporaire garde l'extension de `chemin` (pandas en déduit
+    le format) ; il est synchronisé sur disque avant le renommage. Un
+    lecteur voit donc l'ancien ou le nouveau fichier, jamais un fichier à
+    moitié écrit.
+    """
+    base, extension = os.path.splitext(chemin)
+    fichier_temporaire = f"{base}.{os.getpid()}.{threading.get_ident()}.tmp{extension}"
+    try:
+        ecrire(fichier_temporaire)
+        with open(fichier_temporaire, 'rb+') as fichier:
+            os.fsync(fichier.fileno())
+        os.replace(fichier_temporaire, chemin)
+    except BaseException:
+        try:
+            os.remove(fichier_temporaire)
+        except FileNotFoundError:
+            pass
+        raise